@@ -0,0 +1,306 @@
+"""Mergeable sufficient statistics of the deviance metrics.
+
+lost_deviance.py and multi_cluster_deviance.py need the whole dataset in
+memory. The deviance metrics only depend on count, mean and sum of squared
+deviations (M2) per feature and per cluster, so they can be accumulated
+chunk by chunk and file by file, and accumulators built separately (e.g. by
+worker processes or on other machines) merge exactly:
+
+- a chunk is summarized with NumPy and folded in with Chan's formula, which
+  for a single row is Welford's update;
+- merge: n = na + nb, d = mean_b - mean_a, mean = mean_a + d * nb / n,
+  M2 = M2_a + M2_b + d^2 * na * nb / n.
+
+Z-score normalization is affine per feature, so the SST of normalized
+features is M2 / variance, computed from the merged statistics at the end.
+
+Usage:
+    python deviance_stats.py csv/6_componenti_13_cluster.csv
+    python deviance_stats.py big_1.csv big_2.csv --chunksize 200000 --workers 4
+"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from jmp_csv import iter_jmp_csv
+from lost_deviance import PCA_COLS, UNUSED_COLS
+
+
+def _chan_merge(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Chan's parallel combination of (count, mean, M2), elementwise."""
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    with np.errstate(invalid="ignore", divide="ignore"):
+        share = np.where(n > 0, n_b / n, 0.0)
+        mean = np.where(n_b > 0, mean_a + delta * share, mean_a)
+        m2 = m2_a + m2_b + np.where((n_a > 0) & (n_b > 0), delta ** 2 * n_a * share, 0.0)
+    return n, mean, m2
+
+
+def _chunk_stats(values, codes=None, k=0):
+    """
+    (count, mean, M2) per column of a chunk, NaN values skipped; with codes,
+    per cluster as well (k x p arrays, rows with a negative code left out).
+    """
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    counts = valid.sum(axis=0).astype(float)
+    means = np.divide(filled.sum(axis=0), counts, out=np.zeros(values.shape[1]), where=counts > 0)
+    m2 = np.where(valid, (values - means) ** 2, 0.0).sum(axis=0)
+    if codes is None:
+        return (counts, means, m2), None
+
+    keep = codes >= 0
+    codes, valid, filled, values = codes[keep], valid[keep], filled[keep], values[keep]
+    shape = (k, values.shape[1])
+    c_counts, c_means, c_m2 = np.zeros(shape), np.zeros(shape), np.zeros(shape)
+    for j in range(values.shape[1]):
+        c_counts[:, j] = np.bincount(codes, weights=valid[:, j], minlength=k)
+        sums = np.bincount(codes, weights=filled[:, j], minlength=k)
+        c_means[:, j] = np.divide(sums, c_counts[:, j], out=np.zeros(k), where=c_counts[:, j] > 0)
+        sq = np.where(valid[:, j], (values[:, j] - c_means[codes, j]) ** 2, 0.0)
+        c_m2[:, j] = np.bincount(codes, weights=sq, minlength=k)
+    return (counts, means, m2), (c_counts, c_means, c_m2)
+
+
+class DevianceAccumulator:
+    """
+    Count, mean and M2 of every feature, overall and per cluster.
+
+    Rows with a missing (NaN or blank) label only count in the overall
+    statistics; NaN feature values are skipped per column, as pandas does.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.count = np.zeros(p)
+        self.mean = np.zeros(p)
+        self.m2 = np.zeros(p)
+        self.labels = []
+        self.cluster_count = np.zeros((0, p))
+        self.cluster_mean = np.zeros((0, p))
+        self.cluster_m2 = np.zeros((0, p))
+        self._label_index = {}
+
+    def _cluster_rows(self, labels):
+        """Row of each label in the cluster arrays, added when new."""
+        rows = []
+        for label in labels:
+            if label not in self._label_index:
+                self._label_index[label] = len(self.labels)
+                self.labels.append(label)
+            rows.append(self._label_index[label])
+        grow = len(self.labels) - len(self.cluster_count)
+        if grow > 0:
+            pad = np.zeros((grow, len(self.columns)))
+            self.cluster_count = np.vstack([self.cluster_count, pad])
+            self.cluster_mean = np.vstack([self.cluster_mean, pad])
+            self.cluster_m2 = np.vstack([self.cluster_m2, pad])
+        return np.asarray(rows, dtype=np.intp)
+
+    def _fold(self, overall, clusters=None, rows=None):
+        self.count, self.mean, self.m2 = _chan_merge(self.count, self.mean, self.m2, *overall)
+        if clusters is not None and len(rows):
+            merged = _chan_merge(self.cluster_count[rows], self.cluster_mean[rows], self.cluster_m2[rows], *clusters)
+            self.cluster_count[rows], self.cluster_mean[rows], self.cluster_m2[rows] = merged
+
+    def update(self, values, labels=None):
+        """
+        Adds a chunk of rows (n x p, or a single row of p values).
+
+        Args:
+            values (array or DataFrame): Feature values, columns in the order
+                                         of `columns` (a DataFrame is selected
+                                         by name)
+            labels (array): Cluster label of every row (None: no clusters)
+
+        Returns:
+            DevianceAccumulator: self
+        """
+        if isinstance(values, pd.DataFrame):
+            values = values[self.columns]
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[None, :]
+        if values.shape[1] != len(self.columns):
+            raise ValueError(f"Expected {len(self.columns)} columns, got {values.shape[1]}.")
+        if labels is None:
+            self._fold(_chunk_stats(values)[0])
+            return self
+
+        codes, uniques = pd.factorize(pd.Series(np.asarray(labels, dtype=object).ravel()))
+        if len(codes) != len(values):
+            raise ValueError(f"Incompatible lengths ! ({len(values)}<>{len(codes)})")
+        # Blank text labels are missing labels, as in lost_deviance.py; the
+        # last entry of remap maps the NaN code -1 to -1 as well
+        present = np.flatnonzero([str(u).strip() != "" for u in uniques])
+        remap = np.full(len(uniques) + 1, -1, dtype=np.intp)
+        remap[present] = np.arange(len(present))
+        codes = remap[codes]
+
+        overall, clusters = _chunk_stats(values, codes, len(present))
+        self._fold(overall, clusters, self._cluster_rows(uniques[present]))
+        return self
+
+    def merge(self, other):
+        """Folds in the statistics of another accumulator (same columns); returns self."""
+        if other.columns != self.columns:
+            raise ValueError(f"Different columns: {self.columns} <> {other.columns}")
+        rows = self._cluster_rows(other.labels)
+        self._fold((other.count, other.mean, other.m2),
+                   (other.cluster_count, other.cluster_mean, other.cluster_m2), rows)
+        return self
+
+    def _indices(self, columns):
+        if columns is None:
+            return np.arange(len(self.columns))
+        return np.array([self.columns.index(c) for c in columns], dtype=np.intp)
+
+    def sst(self, columns=None):
+        """Per-column sum of squared deviations (not normalized)."""
+        return self.m2[self._indices(columns)]
+
+    def deviance(self, columns=None, normalized=False):
+        """
+        Total SST of the columns. Normalized (z-scored) columns have unit
+        variance, hence SST equal to their count; constant columns count zero,
+        as in `DevianceDataset.original_deviance`.
+        """
+        idx = self._indices(columns)
+        if normalized:
+            return float(np.where(self.m2[idx] > 0, self.count[idx], 0).sum())
+        return float(self.m2[idx].sum())
+
+    def deviance_lost_after_pca(self, pca_cols, original_cols):
+        """
+        Returns:
+            deviance_lost, deviance_retained (as DevianceDataset.deviance_lost_after_pca)
+        """
+        dev_original = self.deviance(original_cols, normalized=True)
+        if dev_original == 0:
+            raise ValueError("Original features have zero total deviance after normalization; cannot compute deviance ratio.")
+        deviance_retained = self.deviance(pca_cols) / dev_original
+        return 1 - deviance_retained, deviance_retained
+
+    def intracluster_deviance(self, columns=None, normalized=False):
+        """
+        Per-cluster SST of the columns.
+
+        Args:
+            columns (list): Feature columns (default: all)
+            normalized (bool): SST of the z-scored features, normalized with
+                               the rows that have a label (as
+                               multi_cluster_deviance.intracluster_deviance)
+
+        Returns:
+            dict: Mapping from cluster label to its deviance (SST) value. The key
+                  "total" contains the sum of all cluster deviances.
+        """
+        if not self.labels:
+            raise ValueError("No clustered rows were accumulated.")
+        idx = self._indices(columns)
+        m2 = self.cluster_m2[:, idx]
+        if normalized:
+            # Pooled statistics of the clustered rows give their variance
+            n, mean, pooled = self.cluster_count[0, idx], self.cluster_mean[0, idx], m2[0]
+            for c in range(1, len(self.labels)):
+                n, mean, pooled = _chan_merge(n, mean, pooled, self.cluster_count[c, idx],
+                                              self.cluster_mean[c, idx], m2[c])
+            with np.errstate(invalid="ignore", divide="ignore"):
+                m2 = m2 / (pooled / n)
+        deviances = m2.sum(axis=1)
+
+        try:
+            order = sorted(range(len(self.labels)), key=lambda c: self.labels[c])
+        except TypeError:
+            order = range(len(self.labels))
+        results = {"total": float(deviances.sum())}
+        for c in order:
+            results[str(self.labels[c])] = deviances[c]
+        return results
+
+
+def iter_chunks(csv_path, chunksize=100000):
+    """Reads a JMP export in chunks of rows, with the format sniffed once."""
+    for chunk in iter_jmp_csv(csv_path, chunksize):
+        chunk.columns = chunk.columns.str.strip().str.replace("'", "")
+        yield chunk
+
+
+def accumulate_csv(csv_path, columns, cluster_col=None, chunksize=100000):
+    """
+    Accumulator of one file read in chunks. With a cluster column, rows
+    without a cluster are dropped first, as DevianceDataset does.
+    """
+    acc = DevianceAccumulator(columns)
+    float_labels = False
+    for chunk in iter_chunks(csv_path, chunksize):
+        labels = None
+        if cluster_col is not None:
+            float_labels |= chunk[cluster_col].dtype.kind == "f"
+            chunk = chunk[chunk[cluster_col].notna() & (chunk[cluster_col].astype(str).str.strip() != '')]
+            labels = chunk[cluster_col].to_numpy()
+        acc.update(chunk[columns].to_numpy(dtype=float), labels)
+
+    if float_labels:
+        # Chunks without blank labels parse them as integers, while the whole
+        # file parses as float (1.0, 2.0, ...): same labels as read_jmp_csv
+        acc.labels = [float(label) for label in acc.labels]
+        acc._label_index = {label: c for c, label in enumerate(acc.labels)}
+    return acc
+
+
+def accumulate_files(csv_paths, columns, cluster_col=None, chunksize=100000, workers=None):
+    """Accumulators of several files (one task per file) merged into one."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(csv_paths)))
+    if workers == 1:
+        parts = [accumulate_csv(p, columns, cluster_col, chunksize) for p in csv_paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(accumulate_csv, p, columns, cluster_col, chunksize) for p in csv_paths]
+            parts = [f.result() for f in futures]
+
+    total = DevianceAccumulator(columns)
+    for part in parts:
+        total.merge(part)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Out-of-core deviance metrics of one or more PCA + clustering exports")
+    parser.add_argument("csv", nargs="+", help="CSV exports with the same columns")
+    parser.add_argument("--cluster", default="Cluster", help="Cluster column (default: Cluster, if present)")
+    parser.add_argument("--chunksize", type=int, default=100000, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    # Columns as in DevianceDataset, from the first chunk of the first file
+    head = next(iter_chunks(args.csv[0], 1000))
+    numeric_cols = head.select_dtypes(include=["number"]).columns
+    pca_cols = [c for c in PCA_COLS if c in numeric_cols]
+    original_cols = [c for c in numeric_cols if c not in pca_cols and c not in UNUSED_COLS]
+    cluster_col = args.cluster if args.cluster in head.columns else None
+
+    acc = accumulate_files(args.csv, pca_cols + original_cols, cluster_col, args.chunksize, args.workers)
+
+    print(f"Rows: {int(acc.count.max())}, files: {len(args.csv)}")
+    print(f"Total deviance (z-scored original features): {acc.deviance(original_cols, normalized=True):.6f}")
+    if pca_cols:
+        lost, retained = acc.deviance_lost_after_pca(pca_cols, original_cols)
+        print(f"PCA {pca_cols}: retained={retained:.6f}, lost={lost:.6f}")
+    if cluster_col is not None:
+        intra = acc.intracluster_deviance(pca_cols or original_cols)["total"]
+        print(f"Intra-cluster deviance ({len(acc.labels)} clusters): {intra:.6f}")
+        if pca_cols:
+            print(f"total_dev_lost={lost + intra / acc.deviance(pca_cols) * retained:.6f}")
+
+
+if __name__ == "__main__":
+    main()
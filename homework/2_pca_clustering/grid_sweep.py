@@ -0,0 +1,226 @@
+"""PCA components x k-means clusters grid, straight to the total_dev_lost table.
+
+Each file in csv/ is one (components, clusters) combination clustered by hand
+in JMP, and results_summary.csv is built from them afterwards. Here the raw
+workload is decomposed once (pca_deviance.py), the scores of every component
+count are clustered with k-means for every cluster count, and the rows of
+results_summary.csv are computed directly.
+
+Cluster counts are swept in increasing order, each k-means warm-started from
+the centers of the previous k plus k-means++ seeds for the new clusters, so
+most runs converge in a few iterations. The grid is split into tasks
+(a component count and a run of cluster counts) spread over a process pool.
+
+Usage:
+    python grid_sweep.py raw/homework_2_workload.csv
+    python grid_sweep.py raw/homework_2_workload.csv --components 2 3 5 6 --clusters 8 13 20 33
+    python grid_sweep.py raw/homework_2_workload.csv --components 1-13 --clusters 2-40 --out sweep.csv
+"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pca_deviance import PcaDecomposition, load_workload, UNUSED_COLS
+
+# Rows per block in the distance computations (keeps the n x k temporaries in cache)
+_BLOCK = 4096
+
+
+def _assign(X, x_sq, centers):
+    """Nearest center and squared distance of every row."""
+    c_sq = (centers ** 2).sum(axis=1)
+    labels = np.empty(len(X), dtype=np.intp)
+    dist = np.empty(len(X))
+    for s in range(0, len(X), _BLOCK):
+        d = X[s:s + _BLOCK] @ centers.T
+        d *= -2
+        d += c_sq
+        nearest = d.argmin(axis=1)
+        labels[s:s + _BLOCK] = nearest
+        dist[s:s + _BLOCK] = np.take_along_axis(d, nearest[:, None], axis=1)[:, 0] + x_sq[s:s + _BLOCK]
+    return labels, np.maximum(dist, 0, out=dist)
+
+
+def _centers(X, labels, k):
+    counts = np.bincount(labels, minlength=k)
+    sums = np.column_stack([np.bincount(labels, weights=X[:, j], minlength=k) for j in range(X.shape[1])])
+    return sums / np.maximum(counts, 1)[:, None], counts
+
+
+def _seed_centers(X, x_sq, centers, k, rng):
+    """Adds k-means++ seeds (D^2 sampling) to `centers` up to k of them."""
+    if len(centers) == 0:
+        centers = X[[rng.integers(len(X))]]
+    _, dist = _assign(X, x_sq, centers)
+    new = [centers]
+    while sum(len(c) for c in new) < k:
+        total = dist.sum()
+        i = rng.choice(len(X), p=dist / total) if total > 0 else rng.integers(len(X))
+        c = X[i][None, :]
+        new.append(c)
+        np.minimum(dist, ((X - c) ** 2).sum(axis=1), out=dist)
+    return np.vstack(new)
+
+
+def kmeans(X, k, init=None, rng=None, max_iter=300, tol=1e-4, x_sq=None):
+    """
+    Lloyd's k-means.
+
+    Args:
+        X (array): n x d data
+        k (int): Number of clusters
+        init (array): Initial centers (fewer than k are completed with k-means++
+                      seeds, None seeds all of them)
+        rng (Generator): Random generator of the seeding
+        max_iter (int): Maximum Lloyd iterations
+        tol (float): Stop when the within-cluster SST improves less than this
+                     relative amount
+
+    Returns:
+        tuple: (centers, labels, within-cluster SST, iterations)
+    """
+    rng = rng or np.random.default_rng(0)
+    if x_sq is None:
+        x_sq = (X ** 2).sum(axis=1)
+    k = min(k, len(X))
+    centers = np.empty((0, X.shape[1])) if init is None else np.asarray(init, dtype=float)[:k]
+    if len(centers) < k:
+        centers = _seed_centers(X, x_sq, centers, k, rng)
+
+    previous = np.inf
+    for iteration in range(1, max_iter + 1):
+        labels, dist = _assign(X, x_sq, centers)
+        centers, counts = _centers(X, labels, k)
+        # An empty cluster restarts from the point farthest from its center
+        for c in np.flatnonzero(counts == 0):
+            far = int(dist.argmax())
+            centers[c] = X[far]
+            dist[far] = 0
+        inertia = dist.sum()
+        if previous - inertia <= tol * inertia:
+            break
+        previous = inertia
+
+    labels, _ = _assign(X, x_sq, centers)
+    centers, _ = _centers(X, labels, k)
+    within = _within_ss(X, labels, centers)
+    return centers, labels, within, iteration
+
+
+def _within_ss(X, labels, centers):
+    # Exact SST around the cluster means, as intracluster_deviance computes it
+    total = 0.0
+    for s in range(0, len(X), _BLOCK):
+        total += float(((X[s:s + _BLOCK] - centers[labels[s:s + _BLOCK]]) ** 2).sum())
+    return total
+
+
+def _sweep_task(scores, clusters, seed, n_init):
+    # Runs in the worker: increasing cluster counts on the same scores
+    rng = np.random.default_rng(seed)
+    x_sq = (scores ** 2).sum(axis=1)
+    rows = []
+    centers = None
+    for k in clusters:
+        if centers is None:
+            # Cold start: best of n_init k-means++ seedings
+            runs = [kmeans(scores, k, None, rng, x_sq=x_sq) for _ in range(n_init)]
+            centers, _, within, iterations = min(runs, key=lambda r: r[2])
+        else:
+            centers, _, within, iterations = kmeans(scores, k, centers, rng, x_sq=x_sq)
+        rows.append((k, within, iterations))
+    return rows
+
+
+def sweep_grid(pca, components, clusters, workers=None, seed=0, n_init=3):
+    """
+    Deviance lost for every (components, clusters) cell of the grid.
+
+    Args:
+        pca (PcaDecomposition): Decomposition of the workload
+        components (list): Component counts
+        clusters (list): Cluster counts
+        workers (int): Number of worker processes (default: one per CPU)
+        seed (int): Seed of the k-means++ seeding
+        n_init (int): Seedings tried for the first (cold started) k of a task
+
+    Returns:
+        DataFrame: Rows in the results_summary.csv format (PCA, Cluster,
+                   deviance_retained, deviance_lost, intra_cluster_total,
+                   total_dev_lost, error) plus the k-means iterations
+    """
+    components = sorted(set(int(c) for c in components if 1 <= c <= pca.n_features))
+    clusters = sorted(set(int(k) for k in clusters if k >= 1))
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # Contiguous runs of cluster counts, so that every task still warm-starts
+    n_runs = max(1, min(len(clusters), -(-workers // max(len(components), 1))))
+    runs = [list(r) for r in np.array_split(clusters, n_runs) if len(r)]
+    tasks = [(c, run) for c in components for run in runs]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        outputs = [_sweep_task(pca.scores(c), run, s, n_init) for (c, run), s in zip(tasks, seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_sweep_task, pca.scores(c), run, s, n_init) for (c, run), s in zip(tasks, seeds)]
+            outputs = [f.result() for f in futures]
+
+    rows = []
+    for (c, _), output in zip(tasks, outputs):
+        retained = pca.deviance_retained(c)
+        lost = 1 - retained
+        # SST of the scores, the normalization used by lost_deviance.py
+        pca_sst = (pca.n - pca.ddof) * float(pca.eigenvalues[:c].sum())
+        for k, within, iterations in output:
+            rows.append({
+                "PCA": c,
+                "Cluster": k,
+                "deviance_retained": retained,
+                "deviance_lost": lost,
+                "intra_cluster_total": within,
+                "total_dev_lost": lost + within / pca_sst * retained if pca_sst > 0 else np.nan,
+                "error": "",
+                "iterations": iterations
+            })
+    return pd.DataFrame(rows).sort_values(["PCA", "Cluster"]).reset_index(drop=True)
+
+
+def _int_list(values):
+    """Parses counts given as numbers or ranges, e.g. 2 3 5-8."""
+    out = []
+    for v in values:
+        lo, _, hi = str(v).partition("-")
+        out.extend(range(int(lo), int(hi or lo) + 1))
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PCA x k-means grid of the deviance lost")
+    parser.add_argument("workload", help="Raw workload (CSV/JTL export or vmstat capture)")
+    parser.add_argument("--components", nargs="+", default=["2", "3", "5", "6"], help="Component counts (e.g. 2 3 5-8)")
+    parser.add_argument("--clusters", nargs="+", default=["8", "13", "20", "33"], help="Cluster counts (e.g. 8 13 20-40)")
+    parser.add_argument("--drop", nargs="*", default=UNUSED_COLS, help="Columns to leave out")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the k-means++ seeding")
+    parser.add_argument("--out", default=None, help="Output CSV (default: sweep_results_summary.csv here)")
+    args = parser.parse_args(argv)
+
+    pca = PcaDecomposition(load_workload(args.workload, args.drop))
+    table = sweep_grid(pca, _int_list(args.components), _int_list(args.clusters), args.workers, args.seed)
+
+    print(table.drop(columns=["error"]).to_string(index=False, float_format=lambda v: f"{v:.6f}"))
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    out_path = args.out or os.path.join(script_dir, "sweep_results_summary.csv")
+    table.drop(columns=["iterations"]).to_csv(out_path, index=False, float_format="%.6f")
+    print(f"Saved to: {out_path} (plot it with: python plot_lost_deviance.py --csv {out_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Bytes read from the head of the file to detect its format
+SAMPLE_SIZE = 64 * 1024
+
+_DELIMITERS = [",", ";", "\t"]
+_QUOTED = re.compile(r'"[^"]*"')
+_QUOTED_DECIMAL_COMMA = re.compile(r'"\s*[-+]?\d*,\d+\s*"')
+_DECIMAL_COMMA = re.compile(r'(?<![\d,])[-+]?\d+,\d+(?![\d,])')
+
+
+def sniff_format(csv_path, sample_size=SAMPLE_SIZE):
+    """
+    Detects field delimiter and decimal separator of a CSV exported by JMP
+    (or by a spreadsheet) from a sample of its first bytes.
+
+    The delimiter is the candidate occurring most often in the header line,
+    outside quotes. The decimal separator is a comma when numbers like
+    "2,3401" appear quoted (comma-delimited files) or bare (other delimiters).
+
+    Returns:
+        tuple: (delimiter, decimal)
+    """
+    with open(csv_path, "r", encoding="utf-8-sig", errors="replace") as f:
+        sample = f.read(sample_size)
+
+    lines = sample.splitlines()
+    header = _QUOTED.sub("", lines[0]) if lines else ""
+    delimiter = max(_DELIMITERS, key=header.count)
+    if header.count(delimiter) == 0:
+        delimiter = ","
+
+    body = "\n".join(lines[1:])
+    if delimiter == ",":
+        decimal = "," if _QUOTED_DECIMAL_COMMA.search(body) else "."
+    else:
+        decimal = "," if _DECIMAL_COMMA.search(_QUOTED.sub("", body)) or _QUOTED_DECIMAL_COMMA.search(body) else "."
+
+    return delimiter, decimal
+
+
+def _coerce_numeric(df, decimal):
+    """
+    Converts in bulk the text columns that actually hold numbers (e.g. values
+    quoted in a way the C parser did not apply the decimal separator to).
+    All the candidate cells are normalized and parsed in a single pass.
+    """
+    obj_cols = [c for c in df.columns
+                if not (pd.api.types.is_numeric_dtype(df[c]) or pd.api.types.is_datetime64_any_dtype(df[c]))]
+    if not obj_cols or df.empty:
+        return df
+
+    cells = df[obj_cols].to_numpy().ravel(order="F")
+    text = pd.Series(cells, dtype=object).astype(str).str.strip().str.strip("\"'")
+    if decimal == ",":
+        text = text.str.replace(",", ".", regex=False)
+    values = pd.to_numeric(text, errors="coerce").to_numpy(dtype=float).reshape(len(df), len(obj_cols), order="F")
+
+    present = pd.notna(df[obj_cols]).to_numpy() & (text.to_numpy().reshape(len(df), len(obj_cols), order="F") != "")
+    # A column is numeric only if every non-empty cell parsed as a number
+    numeric = ~(present & np.isnan(values)).any(axis=0)
+    for j, col in enumerate(obj_cols):
+        if numeric[j] and present[:, j].any():
+            df[col] = values[:, j]
+    return df
+
+
+def read_jmp_csv(csv_path, sample_size=SAMPLE_SIZE):
+    """
+    Reads a JMP export straight into float64 columns.
+
+    Delimiter and decimal convention are sniffed once from a sample, then the
+    file is parsed by the pandas C engine with that decimal separator. Text
+    columns that still hold numbers are converted all together afterwards.
+
+    Args:
+        csv_path (str): Path to the CSV file
+        sample_size (int): Number of bytes used to detect the format
+
+    Returns:
+        DataFrame: Parsed dataset
+    """
+    delimiter, decimal = sniff_format(csv_path, sample_size)
+    df = pd.read_csv(csv_path, sep=delimiter, quotechar='"', decimal=decimal,
+                     skipinitialspace=True, engine="c", encoding="utf-8-sig")
+    return _coerce_numeric(df, decimal)
+
+
+def iter_jmp_csv(csv_path, chunksize=100000, sample_size=SAMPLE_SIZE):
+    """
+    Reads a JMP export in chunks of `chunksize` rows, as read_jmp_csv does:
+    the format is sniffed once and the text columns holding numbers of every
+    chunk are converted.
+
+    Yields:
+        DataFrame: Parsed chunk
+    """
+    delimiter, decimal = sniff_format(csv_path, sample_size)
+    reader = pd.read_csv(csv_path, sep=delimiter, quotechar='"', decimal=decimal, skipinitialspace=True,
+                         engine="c", encoding="utf-8-sig", chunksize=chunksize)
+    for chunk in reader:
+        yield _coerce_numeric(chunk, decimal)
@@ -2,72 +2,134 @@ import os
 import re
 import pandas as pd
 import numpy as np
+from jmp_csv import read_jmp_csv
 
 
 PCA_COLS = ["Principale1", "Principale2", "Principale3", "Principale4", "Principale5", "Principale6"]
 UNUSED_COLS = ["swpd", "si", "so", "st", "Cluster", "time"]
 
+class DevianceDataset:
+    """
+    PCA + clustering export parsed, cleaned and filtered once.
+
+    The CSV is read a single time; column names are cleaned and rows without a
+    cluster are dropped before anything else, so PCA deviance, original
+    deviance and intra-cluster deviance are all computed on the same rows.
+    Column means and sums of squared deviations are computed once and shared.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+
+        # Delimiter and decimal convention (e.g. comma decimal inside quoted
+        # fields) are detected once, numeric columns are converted in bulk
+        df = read_jmp_csv(csv_path)
+
+        # Clean column names (strip whitespace and remove stray apostrophes)
+        df.columns = df.columns.str.strip().str.replace("'", "")
+
+        # If a Cluster column exists, drop rows without a cluster (NaN or empty string)
+        if 'Cluster' in df.columns:
+            df = df[df['Cluster'].notna() & (df['Cluster'].astype(str).str.strip() != '')]
+            if df.empty:
+                raise ValueError("No rows with a valid 'Cluster' found after filtering.")
+
+        numeric_cols = df.select_dtypes(include=["number"]).columns
+        self.pca_cols = [col for col in PCA_COLS if col in numeric_cols]
+        self.original_cols = [col for col in numeric_cols if col not in self.pca_cols and col not in UNUSED_COLS]
+        self.clusters = df['Cluster'].to_numpy() if 'Cluster' in df.columns else None
+
+        self.pca = df[self.pca_cols].to_numpy(dtype=float)
+        self.original = df[self.original_cols].to_numpy(dtype=float)
+
+        # Shared per-column statistics (NaN values are skipped, as pandas does)
+        self.pca_means, self.pca_ss, _ = self._column_stats(self.pca)
+        self.original_means, self.original_ss, self.original_counts = self._column_stats(self.original)
+
+    @staticmethod
+    def _column_stats(values):
+        """Per-column means, sums of squared deviations (SST) and counts."""
+        valid = ~np.isnan(values)
+        counts = valid.sum(axis=0)
+        sums = np.where(valid, values, 0).sum(axis=0)
+        means = np.divide(sums, counts, out=np.full(values.shape[1], np.nan), where=counts > 0)
+        ss = np.where(valid, (values - means) ** 2, 0).sum(axis=0)
+        return means, ss, counts
+
+    def pca_deviance(self):
+        """SST of the principal components (not normalized)."""
+        return float(self.pca_ss.sum())
+
+    def original_deviance(self):
+        """
+        SST of the Z-score normalized original features. A normalized column
+        has unit variance, hence its SST equals its number of values (zero for
+        constant columns, which cannot be normalized).
+        """
+        return float(np.where(self.original_ss > 0, self.original_counts, 0).sum())
+
+    def deviance_lost_after_pca(self):
+        """
+        Returns:
+            deviance_lost, deviance_retained
+        """
+        print("PCA", self.pca_cols)
+        print("NORMAL", self.original_cols)
+
+        if not self.pca_cols:
+            raise ValueError("No PCA columns detected. Check PCA_COLS list vs actual CSV columns.")
+        if not self.original_cols:
+            raise ValueError("No original columns detected. Check UNUSED_COLS list vs actual CSV columns.")
+
+        dev_original = self.original_deviance()
+        if dev_original == 0:
+            raise ValueError("Original features have zero total deviance after normalization; cannot compute deviance ratio.")
+
+        deviance_retained = self.pca_deviance() / dev_original
+        deviance_lost = 1 - deviance_retained
+
+        return deviance_lost, deviance_retained
+
+    def intracluster_deviance(self):
+        """
+        Per-cluster SST (sum of squared distances to the cluster mean) of the
+        principal components.
+
+        Returns:
+            dict: Mapping from cluster label to its deviance (SST) value. The key
+                  "total" contains the sum of all cluster deviances.
+        """
+        if self.clusters is None:
+            raise ValueError("CSV must contain a 'Cluster' column.")
+        if not self.pca_cols:
+            raise ValueError(f"No PCA feature columns found in CSV. Expected one of: {PCA_COLS}")
+
+        codes, labels = pd.factorize(self.clusters, sort=True)
+        k = len(labels)
+
+        valid = ~np.isnan(self.pca)
+        values = np.where(valid, self.pca, 0)
+        means = np.empty((k, values.shape[1]))
+        for j in range(values.shape[1]):
+            counts = np.bincount(codes, weights=valid[:, j], minlength=k)
+            sums = np.bincount(codes, weights=values[:, j], minlength=k)
+            means[:, j] = np.divide(sums, counts, out=np.zeros(k), where=counts > 0)
+
+        sq_dists = np.where(valid, (self.pca - means[codes]) ** 2, 0).sum(axis=1)
+        deviances = np.bincount(codes, weights=sq_dists, minlength=k)
+
+        results = {"total": float(deviances.sum())}
+        for label, deviance_cluster in zip(labels, deviances):
+            results[str(label)] = deviance_cluster
+        return results
+
+
 def deviance_lost_after_pca(csv_path):
     """
     Returns:
         deviance_lost, deviance_retained
     """
-    # Try to read CSV using comma as field separator and comma as decimal
-    # inside quoted numeric fields (European format). Use skipinitialspace
-    # to tolerate a space after delimiters.
-    df = pd.read_csv(csv_path, sep=',', quotechar='"', decimal=',', skipinitialspace=True, engine='c')
-
-    # If a Cluster column exists, drop rows without a cluster (NaN or empty string)
-    if 'Cluster' in df.columns:
-        df = df[df['Cluster'].notna() & (df['Cluster'].astype(str).str.strip() != '')]
-        if df.empty:
-            raise ValueError("No rows with a valid 'Cluster' found after filtering.")
-
-    # Clean column names (strip whitespace and remove stray apostrophes)
-    df.columns = df.columns.str.strip().str.replace("'", "")
-
-    # Ensure PCA columns are numeric; some imports may still produce strings
-    # (if quoting/decimal detection failed). Coerce explicitly as a fallback.
-    for col in PCA_COLS:
-        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
-            # Remove surrounding quotes, convert decimal comma to dot and coerce
-            s = df[col].astype(str).str.strip().str.replace('"', '').str.replace("'", "")
-            s = s.str.replace(',', '.', regex=False)
-            df[col] = pd.to_numeric(s, errors='coerce')
-
-    # Select numeric columns after coercion
-    numeric_cols = df.select_dtypes(include=["number"]).columns
-
-    # Keep only valid PCA numeric ones
-    pca_cols = [col for col in PCA_COLS if col in numeric_cols]
-    print("PCA", pca_cols)
-    
-    original_cols = [col for col in numeric_cols if col not in pca_cols and col not in UNUSED_COLS]
-    print("NORMAL", original_cols)
-    
-    if not pca_cols:
-        raise ValueError("No PCA columns detected. Check PCA_COLS list vs actual CSV columns.")
-    if not original_cols:
-        raise ValueError("No original columns detected. Check UNUSED_COLS list vs actual CSV columns.")
-
-    # --- Z-SCORE normalization on original features to correctly compare with principal components ---
-    df_norm = df[original_cols].apply(lambda x: (x - x.mean()) / x.std(ddof=0))
-
-    # Deviance = total sum of squared deviations (SST) across rows and features.
-    # Compute explicitly as sum((x - mean(x))**2) for clarity and to avoid
-    # relying on variance * n. This matches the definition of deviance (SST).
-    dev_original = ((df_norm - df_norm.mean()) ** 2).sum().sum()
-
-    # For PCA components, compute SST from their means (not normalized here).
-    dev_pca = ((df[pca_cols] - df[pca_cols].mean()) ** 2).sum().sum()
-
-    if dev_original == 0:
-        raise ValueError("Original features have zero total deviance after normalization; cannot compute deviance ratio.")
-
-    deviance_retained = dev_pca / dev_original
-    deviance_lost = 1 - deviance_retained
-
-    return deviance_lost, deviance_retained
+    return DevianceDataset(csv_path).deviance_lost_after_pca()
 
 
 def intracluster_deviance(csv_path: str):
@@ -83,37 +145,7 @@ def intracluster_deviance(csv_path: str):
         dict: Mapping from cluster label to its deviance (SST) value. The key
               "total" contains the sum of all cluster deviances.
     """
-
-    # Load dataset. Expect comma-separated fields and comma decimal inside
-    # quoted numeric fields. Use skipinitialspace to tolerate spaces after commas.
-    df = pd.read_csv(csv_path, sep=',', quotechar='"', decimal=',', skipinitialspace=True, engine='c')
-
-    # Ensure "Cluster" column exists
-    if "Cluster" not in df.columns:
-        raise ValueError("CSV must contain a 'Cluster' column.")
-
-    # Drop rows without a cluster (NaN or empty string)
-    df = df[df['Cluster'].notna() & (df['Cluster'].astype(str).str.strip() != '')]
-    if df.empty:
-        raise ValueError("No rows with a valid 'Cluster' found after filtering.")
-
-    # Get feature columns regarding clustering (all principal components)
-    feature_cols = [col for col in df.columns if col in PCA_COLS]
-    if not feature_cols:
-        raise ValueError(f"No PCA feature columns found in CSV. Expected one of: {PCA_COLS}")
-
-    results = {"total": 0}
-    for cluster, group in df.groupby("Cluster"):
-        # Compute mean vector of the cluster
-        mean_vector = group[feature_cols].mean().values
-        # Compute squared distances to mean for each row
-        sq_dists = np.sum((group[feature_cols].values - mean_vector) ** 2, axis=1)
-        # Deviance (SST) for the cluster = sum of squared distances
-        deviance_cluster = np.sum(sq_dists)
-        results[str(cluster)] = deviance_cluster
-        results["total"] += deviance_cluster
-
-    return results
+    return DevianceDataset(csv_path).intracluster_deviance()
 
 
 if __name__ == "__main__":
@@ -146,36 +178,32 @@ if __name__ == "__main__":
         for csv_file in csv_files:
             processed_any = True
             error_msg = ""
+            # Parse, clean and filter the file once for all the deviance metrics
             try:
-                pca_lost, pca_retained = deviance_lost_after_pca(csv_file)
-            except Exception as e:
-                pca_lost = float('nan')
-                pca_retained = float('nan')
-                error_msg = f"deviance_lost_after_pca error: {e}"
-
-            try:
-                deviances = intracluster_deviance(csv_file)
-                intra_total = deviances.get("total", 0)
+                dataset = DevianceDataset(csv_file)
             except Exception as e:
-                intra_total = float('nan')
-                error_msg = (error_msg + "; " if error_msg else "") + f"intracluster_deviance error: {e}"
+                dataset = None
+                error_msg = f"load error: {e}"
 
-            # Compute total PCA deviance to normalize intracluster total (matching previous logic)
+            pca_lost = float('nan')
+            pca_retained = float('nan')
+            intra_total = float('nan')
             total_pca_deviance = 0
-            try:
-                df_main = pd.read_csv(csv_file, sep=',', quotechar='"', decimal=',', skipinitialspace=True, engine='c')
-                # If a Cluster column exists, drop rows without a cluster
-                if 'Cluster' in df_main.columns:
-                    df_main = df_main[df_main['Cluster'].notna() & (df_main['Cluster'].astype(str).str.strip() != '')]
-                    if df_main.empty:
-                        # No valid rows left; treat as an error for downstream steps
-                        raise ValueError("No rows with a valid 'Cluster' found after filtering in main read.")
-                pca_feature_cols = [c for c in PCA_COLS if c in df_main.columns]
-                if pca_feature_cols:
-                    total_pca_deviance = ((df_main[pca_feature_cols] - df_main[pca_feature_cols].mean()) ** 2).sum().sum()
-            except Exception as e:
-                total_pca_deviance = 0
-                error_msg = (error_msg + "; " if error_msg else "") + f"read_main error: {e}"
+
+            if dataset is not None:
+                try:
+                    pca_lost, pca_retained = dataset.deviance_lost_after_pca()
+                except Exception as e:
+                    error_msg = f"deviance_lost_after_pca error: {e}"
+
+                try:
+                    deviances = dataset.intracluster_deviance()
+                    intra_total = deviances.get("total", 0)
+                except Exception as e:
+                    error_msg = (error_msg + "; " if error_msg else "") + f"intracluster_deviance error: {e}"
+
+                # Total PCA deviance to normalize intracluster total (matching previous logic)
+                total_pca_deviance = dataset.pca_deviance()
 
             normalized_intra = (intra_total / total_pca_deviance) if (total_pca_deviance and not np.isnan(intra_total)) else 0
 
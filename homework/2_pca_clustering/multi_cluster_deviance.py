@@ -2,11 +2,15 @@ import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from jmp_csv import read_jmp_csv
 
 
 # Columns to exclude from feature analysis
 UNUSED_COLS = ["swpd", "si", "so", "st", "time"]
 
+# Cells of the joint labels of the clusterings evaluated in one pass
+_MAX_CELLS = 1 << 16
+
 
 def intracluster_deviance(df, cluster_col, feature_cols):
     """
@@ -22,33 +26,132 @@ def intracluster_deviance(df, cluster_col, feature_cols):
         dict: Mapping from cluster label to its deviance (SST) value. The key
               "total" contains the sum of all cluster deviances.
     """
-    # Filter valid cluster assignments
-    df_filtered = df[df[cluster_col].notna() & (df[cluster_col].astype(str).str.strip() != '')]
-    
-    if df_filtered.empty:
+    results = intracluster_deviance_many(df, [cluster_col], feature_cols)
+    if cluster_col not in results:
         raise ValueError(f"No rows with a valid '{cluster_col}' found after filtering.")
+    return results[cluster_col]
 
-    # Z-score normalization on features (CRITICAL for scale consistency)
-    df_norm = df_filtered[feature_cols].apply(lambda x: (x - x.mean()) / x.std(ddof=0))
-    
-    # Create a copy with normalized features for grouping
-    df_work = df_filtered.copy()
-    df_work[feature_cols] = df_norm
 
-    results = {"total": 0}
-    for cluster, group in df_work.groupby(cluster_col):
-        # Compute mean vector of the cluster (on normalized features)
-        mean_vector = group[feature_cols].mean().values
-        # Compute squared distances to mean for each row
-        sq_dists = np.sum((group[feature_cols].values - mean_vector) ** 2, axis=1)
-        # Deviance (SST) for the cluster = sum of squared distances
-        deviance_cluster = np.sum(sq_dists)
-        results[str(cluster)] = deviance_cluster
-        results["total"] += deviance_cluster
+def _valid_labels(column):
+    # Rows with a cluster assignment (not NaN and not blank)
+    valid = column.notna()
+    if not pd.api.types.is_numeric_dtype(column):
+        # Only text labels can be blank
+        valid &= column.astype(str).str.strip() != ''
+    return valid.to_numpy()
+
+
+def intracluster_deviance_many(df, cluster_cols, feature_cols):
+    """
+    Intra-cluster deviance of several clusterings of the same rows at once, with
+    the same values as `intracluster_deviance` for each column. Features are
+    Z-score normalized once and the SST of every cluster comes from np.bincount sums.
+
+    Args:
+        df (DataFrame): The dataset
+        cluster_cols (list): Names of the cluster columns
+        feature_cols (list): List of feature column names to use
+
+    Returns:
+        dict: Mapping from cluster column to the dict of `intracluster_deviance`.
+              Columns without rows with a valid label are left out.
+    """
+    # Columns sharing the same valid rows share the z-scored array
+    groups = {}
+    for col in cluster_cols:
+        mask = _valid_labels(df[col])
+        if mask.any():
+            groups.setdefault(mask.tobytes(), (mask, []))[1].append(col)
+
+    per_column = {}
+    for mask, cols in groups.values():
+        all_rows = bool(mask.all())
+        n_rows = int(mask.sum())
+
+        # Z-score normalization on the valid rows, as intracluster_deviance
+        # does, written straight into the column-major weights of the
+        # bincounts: [squared norm, z_1 .. z_d]
+        weights = np.empty((n_rows, len(feature_cols) + 1), order="F")
+        weights[:, 0] = 0
+        for j, feature in enumerate(feature_cols):
+            x = df[feature].to_numpy(dtype=float)
+            z = weights[:, j + 1]
+            z[:] = x if all_rows else x[mask]
+            mean, std = np.nanmean(z), np.nanstd(z)
+            z -= mean
+            z /= std
+            weights[:, 0] += z * z
+
+        factorized = [(col,) + _codes(df[col].to_numpy() if all_rows else df[col].to_numpy()[mask])
+                      for col in cols]
+        for batch in _joint_batches(factorized):
+            joint = np.zeros(n_rows, dtype=np.intp)
+            for _, codes, offset, labels in batch:
+                joint *= len(labels)
+                joint += codes
+                if offset:
+                    joint -= offset
+            shape = [len(labels) for _, _, _, labels in batch]
+            cells = int(np.prod(shape))
+            counts = np.bincount(joint, minlength=cells).reshape(shape)
+            sums = np.stack([np.bincount(joint, weights=weights[:, j], minlength=cells)
+                             for j in range(weights.shape[1])], axis=-1).reshape(shape + [-1])
+
+            for axis, (col, _, _, labels) in enumerate(batch):
+                others = tuple(a for a in range(len(batch)) if a != axis)
+                n = counts.sum(axis=others)
+                s = sums.sum(axis=others)
+                # Labels of the range without rows are not clusters
+                present = n > 0
+                n, s, labels = n[present], s[present], labels[present]
+                # s[:, 0] is the sum of the squared norms, s[:, 1:] the feature sums
+                deviance = np.maximum(s[:, 0] - (s[:, 1:] ** 2).sum(axis=1) / n, 0)
+                order = labels.argsort()
+                per_column[col] = (labels[order], deviance[order])
+
+    results = {}
+    for col in cluster_cols:
+        if col not in per_column:
+            continue
+        col_results = {"total": 0}
+        for label, deviance_cluster in zip(*per_column[col]):
+            col_results[str(label)] = deviance_cluster
+            col_results["total"] += deviance_cluster
+        results[col] = col_results
 
     return results
 
 
+def _codes(values):
+    """
+    (codes, offset, labels) of a cluster column: label i is the one of the
+    rows with codes - offset == i. Integer labels in a small range are their
+    own codes (every value of the range is a label, possibly without rows),
+    anything else goes through pd.factorize.
+    """
+    if values.dtype.kind in "iuf" and len(values):
+        lo, hi = values.min(), values.max()
+        if hi - lo < _MAX_CELLS and (values.dtype.kind != "f" or np.array_equal(values, np.floor(values))):
+            codes = values if values.dtype.kind == "i" else values.astype(np.intp)
+            return codes, int(lo), np.arange(int(lo), int(hi) + 1).astype(values.dtype)
+    codes, labels = pd.factorize(values)
+    return codes, 0, labels
+
+
+def _joint_batches(factorized):
+    # Consecutive columns whose joint labels have at most _MAX_CELLS cells
+    batch, cells = [], 1
+    for item in factorized:
+        k = max(len(item[-1]), 1)
+        if batch and cells * k > _MAX_CELLS:
+            yield batch
+            batch, cells = [], 1
+        batch.append(item)
+        cells *= k
+    if batch:
+        yield batch
+
+
 def calculate_total_deviance(df, feature_cols):
     """
     Calculate total deviance (SST) of features.
@@ -80,8 +183,8 @@ def process_multi_cluster_csv(csv_path):
     Returns:
         DataFrame: Results for each cluster type with deviance metrics
     """
-    # Load dataset with comma as decimal separator
-    df = pd.read_csv(csv_path, sep=',', quotechar='"', decimal=',', skipinitialspace=True, engine='c')
+    # Load dataset (delimiter and comma decimal separator are detected)
+    df = read_jmp_csv(csv_path)
     
     # Clean column names
     df.columns = df.columns.str.strip().str.replace("'", "")
@@ -108,6 +211,9 @@ def process_multi_cluster_csv(csv_path):
     total_deviance = calculate_total_deviance(df, feature_cols)
     print(f"Total deviance (no clustering): {total_deviance:.6f}")
     
+    # Intra-cluster deviance of all the cluster columns in one pass
+    all_deviances = intracluster_deviance_many(df, cluster_cols, feature_cols)
+    
     # Process each cluster column
     results = []
     
@@ -117,8 +223,10 @@ def process_multi_cluster_csv(csv_path):
         error_msg = ""
         
         try:
-            # Calculate intra-cluster deviance
-            deviances = intracluster_deviance(df, cluster_col, feature_cols)
+            # Intra-cluster deviance of this column
+            if cluster_col not in all_deviances:
+                raise ValueError(f"No rows with a valid '{cluster_col}' found after filtering.")
+            deviances = all_deviances[cluster_col]
             intra_total = deviances.get("total", 0)
             
             # Normalized intra-cluster deviance (same as original script)
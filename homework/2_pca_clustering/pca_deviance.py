@@ -0,0 +1,155 @@
+"""Deviance retained by PCA for every number of components, from one decomposition.
+
+The JMP workflow needs one PCA export per component count (2_, 3_, 5_,
+6_componenti_*.csv) and lost_deviance.py recomputes the SST of the z-scored
+features for each of them. Here the raw workload is z-scored once and the
+correlation matrix is eigen-decomposed once: the deviance of the first k
+principal components is the sum of the k largest eigenvalues, so the whole
+curve comes from a single decomposition.
+
+Inputs can be a JMP/CSV export (raw/homework_2_workload.csv), a JMeter JTL
+(hl/to_work/hl.csv) or a raw vmstat capture (ll/raw/vmstat.csv).
+
+Usage:
+    python pca_deviance.py raw/homework_2_workload.csv
+    python pca_deviance.py ../3.2_workload_characterization/data/ll/raw/vmstat.csv --drop swpd si so st gu
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from jmp_csv import read_jmp_csv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "3.1_capacity_test", "capacity_test"))
+from vmstat_parser import read_vmstat
+
+# Columns that are not workload features (vmstat and JTL), as removed in the
+# JMP analyses (operazioni.txt, 3.2_workload_characterization/operations.txt)
+UNUSED_COLS = ["swpd", "si", "so", "st", "gu", "time", "timeStamp", "allThreads", "IdleTime", "Cluster"]
+
+
+def load_workload(path, drop=UNUSED_COLS, skip_first=True):
+    """
+    Numeric feature columns of a raw workload file.
+
+    Args:
+        path (str): CSV/JTL export or raw vmstat capture
+        drop (list): Columns to leave out
+        skip_first (bool): Drop the first row (vmstat computes it since boot,
+                           and it was discarded in the JMP analyses too)
+
+    Returns:
+        DataFrame: Numeric features, one row per sample
+    """
+    with open(path, "r", errors="replace") as f:
+        is_vmstat = f.readline().lstrip().startswith("procs")
+    df = read_vmstat(path) if is_vmstat else read_jmp_csv(path)
+    df.columns = df.columns.str.strip().str.replace("'", "")
+    if skip_first:
+        df = df.iloc[1:]
+    # Empty columns (e.g. failureMessage of a JTL) are parsed as all-NaN numbers
+    features = [c for c in df.select_dtypes(include=["number"]).columns
+                if c not in drop and df[c].notna().any()]
+    return df[features].reset_index(drop=True)
+
+
+class PcaDecomposition:
+    """
+    PCA on the correlation matrix (z-scored features), as done in JMP.
+
+    Constant columns cannot be z-scored and are left out, as in
+    `DevianceDataset.original_deviance`. Rows with a NaN are dropped.
+
+    `ddof` is the one of the standard deviation used for the scores: JMP uses 1,
+    while the deviance of the original features counts n per column, so the
+    ratios of the JMP exports are (n - 1) / n times the eigenvalue ratios. The
+    default reproduces the JMP exports; ddof=0 gives the exact ratios.
+    """
+
+    def __init__(self, features, ddof=1):
+        if not isinstance(features, pd.DataFrame):
+            features = pd.DataFrame(np.asarray(features, dtype=float))
+        values = features.to_numpy(dtype=float)
+        values = values[~np.isnan(values).any(axis=1)]
+        if len(values) < 2:
+            raise ValueError("At least two complete rows are required for PCA.")
+
+        std = values.std(axis=0, ddof=ddof)
+        keep = std > 0
+        self.columns = [c for c, k in zip(features.columns, keep) if k]
+        self.dropped = [c for c, k in zip(features.columns, keep) if not k]
+        if not self.columns:
+            raise ValueError("All the feature columns are constant.")
+
+        self.n = len(values)
+        self.ddof = ddof
+        self.means = values[:, keep].mean(axis=0)
+        self.stds = std[keep]
+        self.z = (values[:, keep] - self.means) / self.stds
+
+        # Correlation matrix (z-scores with ddof=1 have unit sample variance)
+        corr = self.z.T @ self.z / (self.n - ddof)
+        eigenvalues, eigenvectors = np.linalg.eigh(corr)
+        order = np.argsort(eigenvalues)[::-1]
+        self.eigenvalues = np.clip(eigenvalues[order], 0, None)
+        self.eigenvectors = eigenvectors[:, order]
+
+    @property
+    def n_features(self):
+        return len(self.columns)
+
+    def scores(self, k):
+        """Principal component scores of the first k components (n x k)."""
+        return self.z @ self.eigenvectors[:, :k]
+
+    def deviance_retained(self, k):
+        """Share of the deviance of the z-scored features kept by k components."""
+        return float(self.eigenvalues[:k].sum() / self.n_features * (self.n - self.ddof) / self.n)
+
+    def curve(self):
+        """
+        Returns:
+            DataFrame: One row per component count k = 1..p with the eigenvalue
+                       of the k-th component, deviance_retained and deviance_lost
+        """
+        k = np.arange(1, self.n_features + 1)
+        retained = np.cumsum(self.eigenvalues) / self.n_features * (self.n - self.ddof) / self.n
+        return pd.DataFrame({
+            "PCA": k,
+            "eigenvalue": self.eigenvalues,
+            "deviance_retained": retained,
+            "deviance_lost": 1 - retained
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PCA deviance retained/lost for every number of components")
+    parser.add_argument("workload", help="Raw workload (CSV/JTL export or vmstat capture)")
+    parser.add_argument("--drop", nargs="*", default=UNUSED_COLS, help="Columns to leave out")
+    parser.add_argument("--keep-first", action="store_true", help="Keep the first row")
+    parser.add_argument("--ddof", type=int, default=1, help="ddof of the scores (1: as JMP, 0: exact ratios)")
+    parser.add_argument("--out", default=None, help="Output CSV (default: <workload>_pca_deviance.csv here)")
+    args = parser.parse_args(argv)
+
+    features = load_workload(args.workload, args.drop, not args.keep_first)
+    pca = PcaDecomposition(features, args.ddof)
+    curve = pca.curve()
+
+    print(f"Rows: {pca.n}, features: {pca.columns}")
+    if pca.dropped:
+        print(f"Constant columns left out: {pca.dropped}")
+    print(curve.to_string(index=False, float_format=lambda v: f"{v:.6f}"))
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    name = os.path.splitext(os.path.basename(args.workload))[0]
+    out_path = args.out or os.path.join(script_dir, f"{name}_pca_deviance.csv")
+    curve.to_csv(out_path, index=False, float_format="%.6f")
+    print(f"Saved to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Ward hierarchical clustering: intra-cluster deviance for every k in one run.
+
+Each file in csv/ holds one JMP clustering for one k. Ward's linkage merges,
+at every step, the two clusters whose union increases the within-cluster SST
+the least, and that increase is the merge cost
+
+    cost(A, B) = |A| |B| / (|A| + |B|) * ||mean(A) - mean(B)||^2
+
+so the intra_cluster_total of the k-cluster level of the dendrogram is the
+sum of the n - k cheapest merge costs. One dendrogram gives the whole
+total_dev_lost curve, k = 1..n, in the results_summary.csv format.
+
+The dendrogram is built with the nearest-neighbour chain algorithm (O(n^2)
+time). Clusters are kept as sizes and centroids (O(n d) memory instead of the
+n (n - 1) / 2 condensed distance matrix); the costs from the top of the chain
+to every active cluster are computed from the centroids in one NumPy step.
+
+Usage:
+    python ward_deviance.py csv/6_componenti_13_cluster.csv
+    python ward_deviance.py csv/2_componenti_8_cluster.csv csv/6_componenti_8_cluster.csv --max-clusters 0
+"""
+
+import os
+import re
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from lost_deviance import DevianceDataset
+
+
+def ward_linkage(X):
+    """
+    Ward agglomerative clustering with the nearest-neighbour chain algorithm.
+
+    Args:
+        X (array): n x d data (rows with a NaN are not allowed)
+
+    Returns:
+        array: (n - 1) x 3 merges in increasing cost order, columns: a, b, cost,
+               where a and b are rows of X representing the merged clusters
+    """
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X[:, None]
+    n = len(X)
+    if np.isnan(X).any():
+        raise ValueError("X must not contain NaN values.")
+
+    centers = X.copy()
+    sizes = np.ones(n)
+    active = np.ones(n, dtype=bool)
+    merges = np.empty((max(n - 1, 0), 3))
+    chain = []
+
+    for step in range(n - 1):
+        while True:
+            if not chain:
+                chain.append(int(np.flatnonzero(active)[0]))
+            a = chain[-1]
+            diff = centers - centers[a]
+            costs = np.einsum("ij,ij->i", diff, diff) * (sizes * sizes[a] / (sizes + sizes[a]))
+            costs[~active] = np.inf
+            costs[a] = np.inf
+            b = int(costs.argmin())
+            # On ties the previous cluster of the chain wins, so the chain ends
+            if len(chain) > 1 and costs[chain[-2]] <= costs[b]:
+                b = chain[-2]
+                break
+            chain.append(b)
+
+        # a and b are reciprocal nearest neighbours: merge b into a's slot
+        chain.pop()
+        chain.pop()
+        merges[step] = (a, b, costs[b])
+        total = sizes[a] + sizes[b]
+        centers[a] = (sizes[a] * centers[a] + sizes[b] * centers[b]) / total
+        sizes[a] = total
+        active[b] = False
+
+    # Ward is reducible: the chain merges, sorted, are the greedy merge sequence
+    return merges[np.argsort(merges[:, 2], kind="stable")]
+
+
+def intracluster_curve(merges, n):
+    """Within-cluster SST of the k-cluster level, for k = 1..n (array of n values)."""
+    costs = np.asarray(merges)[:, 2]
+    # k clusters: the n - k cheapest merges are done
+    done = np.concatenate([[0.0], np.cumsum(costs)])
+    return done[n - np.arange(1, n + 1)]
+
+
+def ward_labels(merges, n, k):
+    """Cluster labels 1..k of the k-cluster level of the dendrogram."""
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b, _ in merges[:n - k]:
+        parent[find(int(b))] = find(int(a))
+    roots = np.array([find(i) for i in range(n)])
+    return np.unique(roots, return_inverse=True)[1] + 1
+
+
+def ward_deviance(csv_path, max_clusters=None):
+    """
+    total_dev_lost curve of the Ward clustering of a PCA export.
+
+    Args:
+        csv_path (str): PCA export (Principale1..N columns), as read by
+                        lost_deviance.DevianceDataset
+        max_clusters (int): Largest k reported (None: every k up to n)
+
+    Returns:
+        DataFrame: Rows in the results_summary.csv format (PCA, Cluster,
+                   deviance_retained, deviance_lost, intra_cluster_total,
+                   total_dev_lost, error), one per k
+    """
+    dataset = DevianceDataset(csv_path)
+    pca_lost, pca_retained = dataset.deviance_lost_after_pca()
+    scores = dataset.pca[~np.isnan(dataset.pca).any(axis=1)]
+
+    merges = ward_linkage(scores)
+    intra = intracluster_curve(merges, len(scores))
+    total_pca_deviance = dataset.pca_deviance()
+
+    k = np.arange(1, len(scores) + 1)
+    if max_clusters is not None:
+        k, intra = k[:max_clusters], intra[:max_clusters]
+    # Same normalization as lost_deviance.py
+    normalized_intra = intra / total_pca_deviance if total_pca_deviance else np.zeros(len(intra))
+    return pd.DataFrame({
+        "PCA": len(dataset.pca_cols),
+        "Cluster": k,
+        "deviance_retained": pca_retained,
+        "deviance_lost": pca_lost,
+        "intra_cluster_total": intra,
+        "total_dev_lost": pca_lost + normalized_intra * pca_retained,
+        "error": ""
+    })
+
+
+def _default_inputs(csv_folder):
+    # One export per component count: the clusters of the file are not used
+    by_pca = {}
+    for f in sorted(os.listdir(csv_folder)):
+        m = re.search(r"(\d+)_componenti_(\d+)_cluster", f)
+        if m:
+            by_pca.setdefault(int(m.group(1)), os.path.join(csv_folder, f))
+    return [by_pca[c] for c in sorted(by_pca)]
+
+
+def main(argv=None):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Ward clustering deviance lost for every number of clusters")
+    parser.add_argument("csv", nargs="*", help="PCA exports (default: one per component count in csv/)")
+    parser.add_argument("--max-clusters", type=int, default=40, help="Largest k written (0: every k up to n)")
+    parser.add_argument("--out", default=None, help="Output CSV (default: ward_results_summary.csv here)")
+    args = parser.parse_args(argv)
+
+    csv_files = args.csv or _default_inputs(os.path.join(script_dir, "csv"))
+    max_clusters = args.max_clusters or None
+    tables = []
+    for csv_file in csv_files:
+        table = ward_deviance(csv_file, max_clusters)
+        tables.append(table)
+        levels = table.set_index("Cluster")["total_dev_lost"]
+        shown = ", ".join(f"k={k}: {levels[k]:.6f}" for k in (8, 13, 20, 33) if k in levels.index)
+        print(f"Processed: {os.path.basename(csv_file)} -> PCA={table['PCA'].iloc[0]}, {shown}")
+
+    out_path = args.out or os.path.join(script_dir, "ward_results_summary.csv")
+    pd.concat(tables, ignore_index=True).to_csv(out_path, index=False, float_format="%.6f")
+    print(f"Saved to: {out_path} (plot it with: python plot_lost_deviance.py --csv {out_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,8 @@ import matplotlib.pyplot as plt
 
 def plot_metrics(grouped_df, metrics, plot_dir, output_file_name, xLabel: str, yLabel: str, title: str, legend: bool = False, axvline_x = None, axvline_x2 = None):
     plt.figure(figsize=(8, 5))
-    # Plot each metric as a line
-    for col in [metrics]:
+    # Plot each metric as a line (one metric name or a list of them)
+    for col in (metrics if isinstance(metrics, list) else [metrics]):
         plt.plot(grouped_df["prefix"], grouped_df[col], marker="o", linestyle="-", label=col)
     plt.xlabel(xLabel)
     plt.ylabel(yLabel)
@@ -0,0 +1,73 @@
+import os
+import glob
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _run(process, file_path):
+    # Runs in the worker: exceptions are turned into messages so that one bad
+    # file never aborts the batch (and unpicklable exceptions are not an issue)
+    try:
+        return True, process(file_path)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+
+
+def process_files(process, files, workers=None):
+    """
+    Applies `process` to every file, fanning the work out over a process pool.
+
+    Results keep the order of `files`, whatever the order in which the workers
+    complete. A file whose processing raises is reported and skipped, the rest
+    of the batch goes on.
+
+    Args:
+        process (callable): Per-file function (module level, so it can be pickled)
+        files (list): Paths to process
+        workers (int): Number of worker processes (default: one per CPU, capped
+                       at the number of files). 1 runs everything in-process.
+
+    Returns:
+        tuple: (results, failures) where results is the list of values returned
+               by `process` for the files that succeeded and failures is a list
+               of (file, error message) pairs.
+    """
+    files = list(files)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(files)))
+
+    if workers == 1:
+        outcomes = [_run(process, f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run, process, f) for f in files]
+            outcomes = []
+            for f, future in zip(files, futures):
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    # The worker itself died (e.g. killed, out of memory)
+                    outcomes.append((False, f"{type(e).__name__}: {e}"))
+
+    results = []
+    failures = []
+    for f, (ok, value) in zip(files, outcomes):
+        if ok:
+            results.append(value)
+        else:
+            failures.append((f, value))
+            print(f"❌ {os.path.basename(f)}: {value.splitlines()[0]}")
+
+    if failures:
+        print(f"⚠️  {len(failures)}/{len(files)} files failed, {len(results)} processed")
+
+    return results, failures
+
+
+def process_glob(process, pattern, workers=None):
+    """
+    Same as `process_files` on the files matching `pattern`, sorted by name so
+    that the output order does not depend on the file system.
+    """
+    return process_files(process, sorted(glob.glob(pattern)), workers)
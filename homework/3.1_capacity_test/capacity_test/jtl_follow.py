@@ -0,0 +1,224 @@
+import io
+import os
+import time
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+from latency_histogram import LatencyHistogram
+
+
+class SlidingJtlWindow:
+    """
+    Capacity metrics over the last `window_sec` seconds of a JMeter run.
+
+    Samples are aggregated per second (OK count, error count, sum of response
+    times, and the LatencyHistogram counts and maximum of the response times
+    of the OK samples). The window totals
+    are kept up to date by adding the new rows and subtracting the seconds
+    that slide out, so every update costs O(new rows) and a snapshot costs
+    O(histogram buckets), whatever the length of the run.
+    """
+
+    def __init__(self, window_sec=30):
+        self.window_sec = window_sec
+        self.seconds = deque()          # ordered seconds currently in the window
+        self.per_second = {}            # second -> [ok, nok, elapsed_sum, histogram counts, max]
+        self.ok = 0
+        self.nok = 0
+        self.elapsed_sum = 0.0
+        self.hist = LatencyHistogram()
+        self.first_ts = None
+        self.last_ts = None
+
+    def update(self, chunk):
+        """Adds the new JTL rows (timeStamp, elapsed, responseMessage)."""
+        if chunk.empty:
+            return
+
+        ts = chunk["timeStamp"].to_numpy(dtype=np.int64)
+        elapsed = chunk["elapsed"].to_numpy(dtype=np.float64)
+        ok = (chunk["responseMessage"] == "OK").to_numpy()
+
+        if self.first_ts is None:
+            self.first_ts = int(ts.min())
+        self.last_ts = max(self.last_ts or 0, int(ts.max()))
+
+        # Rows of seconds already out of the window are dropped first
+        sec = ts // 1000
+        keep = sec > self.last_ts // 1000 - self.window_sec
+        if not keep.all():
+            sec, elapsed, ok = sec[keep], elapsed[keep], ok[keep]
+
+        if len(sec):
+            # One bincount per metric over the seconds of the chunk, and one over
+            # (second, bucket) pairs for the histograms: O(new rows)
+            secs, inv = np.unique(sec, return_inverse=True)
+            n = len(secs)
+            n_ok = np.bincount(inv, weights=ok, minlength=n).astype(np.int64)
+            n_nok = np.bincount(inv, minlength=n) - n_ok
+            el_sum = np.bincount(inv, weights=np.where(ok, elapsed, 0), minlength=n)
+            n_buckets = len(self.hist.counts)
+            hists = np.bincount(inv[ok] * n_buckets + self.hist.index_of(elapsed[ok]),
+                                minlength=n * n_buckets).reshape(n, n_buckets)
+            maxes = np.full(n, -np.inf)
+            np.maximum.at(maxes, inv[ok], elapsed[ok])
+
+            late = False
+            for i, s in enumerate(secs.tolist()):
+                bucket = self.per_second.get(s)
+                if bucket is None:
+                    bucket = [0, 0, 0.0, np.zeros(n_buckets, dtype=np.int64), -math.inf]
+                    self.per_second[s] = bucket
+                    late = late or bool(self.seconds and s < self.seconds[-1])
+                    self.seconds.append(s)
+                bucket[0] += int(n_ok[i])
+                bucket[1] += int(n_nok[i])
+                bucket[2] += float(el_sum[i])
+                bucket[3] += hists[i]
+                bucket[4] = max(bucket[4], float(maxes[i]))
+            if late:
+                # Samples of a second are written in completion order, so a
+                # late second may arrive after newer ones: keep the deque sorted
+                self.seconds = deque(sorted(self.seconds))
+
+            self.ok += int(n_ok.sum())
+            self.nok += int(n_nok.sum())
+            self.elapsed_sum += float(el_sum.sum())
+            if ok.any():
+                self.hist.record_counts(hists.sum(axis=0), elapsed[ok].max(), elapsed[ok].min())
+
+        self._expire()
+
+    def _expire(self):
+        horizon = self.last_ts // 1000 - self.window_sec
+        expired = False
+        while self.seconds and self.seconds[0] <= horizon:
+            n_ok, n_nok, el_sum, hist, _ = self.per_second.pop(self.seconds.popleft())
+            self.ok -= n_ok
+            self.nok -= n_nok
+            self.elapsed_sum -= el_sum
+            self.hist.remove_counts(hist)
+            expired = True
+        if expired:
+            # Maximum of the seconds still in the window
+            self.hist.max = max((b[4] for b in self.per_second.values()), default=-math.inf)
+
+    def percentile(self, q):
+        """Response time percentile (ms) of the OK samples in the window."""
+        return self.hist.percentile(q)
+
+    def snapshot(self, percentiles=(50, 90, 95, 99)):
+        """Current window metrics, in the units used by `test_capacity`."""
+        if self.last_ts is None:
+            span = float("nan")
+        else:
+            # During the first seconds of the run the window is not full yet
+            span = min(self.window_sec, max((self.last_ts - self.first_ts) / 1000, 1.0))
+
+        throughput = self.ok / span if span > 0 else float("nan")
+        avg_response_time = self.elapsed_sum / self.ok if self.ok else float("nan")
+        power = throughput / (avg_response_time / 1000) if avg_response_time > 0 else float("nan")
+
+        snap = {
+            "elapsed_sec": (self.last_ts - self.first_ts) / 1000 if self.last_ts is not None else 0.0,
+            "total_ok": self.ok,
+            "total_nok": self.nok,
+            "throughput": throughput,
+            "avg_response_time_ms": avg_response_time,
+            "power": power
+        }
+        for q in percentiles:
+            snap[f"p{q}_ms"] = self.percentile(q)
+        return snap
+
+
+class JtlTail:
+    """
+    Incremental reader of a JTL file that JMeter is still writing.
+
+    Every call to `read_new` parses only the complete lines appended since the
+    previous call; a trailing partial line is kept until it is completed.
+    """
+
+    def __init__(self, file_path, columns=("timeStamp", "elapsed", "responseMessage")):
+        self.file_path = file_path
+        self.columns = list(columns)
+        self.offset = 0
+        self.header = None
+        self.partial = b""
+
+    def read_new(self):
+        if not os.path.exists(self.file_path):
+            return None
+        size = os.path.getsize(self.file_path)
+        if size < self.offset:
+            # File truncated or replaced (new run): start over
+            self.offset, self.header, self.partial = 0, None, b""
+        if size == self.offset:
+            return None
+
+        with open(self.file_path, "rb") as f:
+            f.seek(self.offset)
+            data = self.partial + f.read(size - self.offset)
+        self.offset = size
+
+        lines_end = data.rfind(b"\n") + 1
+        self.partial = data[lines_end:]
+        data = data[:lines_end]
+
+        if self.header is None:
+            header_end = data.find(b"\n") + 1
+            if header_end == 0:
+                self.partial = data + self.partial
+                return None
+            self.header = data[:header_end]
+            data = data[header_end:]
+
+        if not data:
+            return None
+        return pd.read_csv(io.BytesIO(self.header + data), usecols=lambda c: c in self.columns)
+
+
+def format_snapshot(snap):
+    return (f"[{snap['elapsed_sec']:7.1f}s] "
+            f"X={snap['throughput']:7.2f} req/s  "
+            f"R={snap['avg_response_time_ms']:8.1f} ms  "
+            f"p50={snap['p50_ms']:7.0f}  p95={snap['p95_ms']:7.0f}  p99={snap['p99_ms']:7.0f}  "
+            f"err={snap['total_nok']:<5d} P={snap['power']:9.2f}")
+
+
+def follow(file_path, window_sec=30, interval=1.0, idle_timeout=None):
+    """
+    Tails a JTL file while JMeter writes it and prints the sliding-window
+    capacity metrics every `interval` seconds.
+
+    Stops on Ctrl+C or, when `idle_timeout` is set, once the file has not grown
+    for that many seconds (end of the run).
+
+    Returns:
+        dict: Last snapshot
+    """
+    tail = JtlTail(file_path)
+    window = SlidingJtlWindow(window_sec)
+    last_growth = time.monotonic()
+    snap = window.snapshot()
+
+    print(f"Following {file_path} (window {window_sec}s, Ctrl+C to stop)")
+    try:
+        while True:
+            started = time.monotonic()
+            chunk = tail.read_new()
+            if chunk is not None:
+                window.update(chunk)
+                last_growth = started
+            if window.last_ts is not None:
+                snap = window.snapshot()
+                print(format_snapshot(snap), flush=True)
+            if idle_timeout is not None and started - last_growth > idle_timeout:
+                break
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+
+    return snap
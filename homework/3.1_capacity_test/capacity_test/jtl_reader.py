@@ -0,0 +1,398 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+from result_cache import cached_chunks
+from latency_histogram import LatencyHistogram
+from steady_state import steady_state_summary
+
+# Columns of a JMeter result file (JTL) needed to compute the capacity metrics.
+# Everything else (URL, threadName, ...) is skipped at parse time.
+# grpThreads and intendedTimeStamp (written by load_generator.py in open-loop
+# mode) are used for the latency corrected for coordinated omission, label for
+# the per-label latency histograms and breakdown (with bytes).
+JTL_COLUMNS = ["timeStamp", "elapsed", "label", "responseMessage", "bytes", "Latency", "grpThreads",
+               "intendedTimeStamp"]
+
+# Page weight class of a label, from its suffix (e.g. "HTTP Img [h]")
+WEIGHT_CLASSES = {"l": "light", "m": "medium", "h": "heavy"}
+
+# Columns of the per-label and per-weight-class breakdown
+BREAKDOWN_METRICS = ["total_ok", "total_nok", "avg_response_time_ms", "throughput", "bytes_per_sec", "power"]
+
+# Rows parsed per chunk: keeps memory bounded regardless of the file size.
+CHUNK_SIZE = 200_000
+
+# Reuse the columnar cache of already parsed files (see result_cache.py)
+USE_CACHE = True
+
+
+class JtlAccumulator:
+    """
+    Single-pass accumulator of the capacity metrics of a JMeter result file.
+
+    Chunks are fed with `update` and only running sums, counts and min/max
+    timestamps are kept, so memory does not depend on the number of samples.
+    Metrics are computed both on the requests correctly served ("OK") and
+    on all the samples, since the analysis scripts use either of the two.
+
+    The response time of the OK samples is also corrected for coordinated
+    omission: a closed-loop thread waiting for a slow response does not send
+    the requests it was scheduled to, so their latency is never measured.
+    - Samples with an intendedTimeStamp (open-loop runs) are measured from
+      the time they were scheduled: timeStamp + elapsed - intendedTimeStamp.
+    - Otherwise, when the Constant Throughput Timer `ctt` (samples/minute,
+      shared by the thread group as in the test plans) is known, each sample
+      longer than the expected interval of its thread I = 60000 * grpThreads
+      / ctt is completed with the samples that would have been sent during it,
+      with response times elapsed - I, elapsed - 2I, ... down to I (as
+      HdrHistogram's recordValueWithExpectedInterval does).
+
+    The response times of the OK samples are also counted in a
+    LatencyHistogram of the whole file (`histogram`) and one per label
+    (`label_histograms`), for the percentiles, and the per-label sums of the
+    breakdown by label and page weight class are kept per bin in `label_sums`,
+    so that the breakdown can be restricted to the steady-state window.
+
+    Samples are also binned every `bin_sec` seconds of timeStamp (memory
+    depends on the length of the run) for the per-second series and the
+    steady-state metrics.
+
+    With `breakdown` False only the totals and the histogram of the whole file
+    are kept (no per-label histograms and sums, no bins), for the callers that
+    only need `summary` or `summary_all`.
+    """
+
+    def __init__(self, ctt=None, bin_sec=1, breakdown=True):
+        self.ctt = ctt
+        self.bin_sec = bin_sec
+        self.breakdown = breakdown
+        self.bin_sums = None
+        self.histogram = LatencyHistogram()
+        self.label_histograms = {}
+        self.label_sums = None
+        self.corrected_sum = 0.0
+        self.corrected_count = 0
+        self.total_ok = 0
+        self.total_nok = 0
+        self.ok_elapsed_sum = 0.0
+        self.ok_ts_min = math.inf
+        self.ok_ts_max = -math.inf
+
+        self.elapsed_sum = 0.0
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.ts_min = math.inf
+        self.ts_max = -math.inf
+
+    def update(self, chunk):
+        """
+        Adds a chunk of JTL rows (DataFrame with at least timeStamp, elapsed
+        and responseMessage) to the running totals.
+        """
+        missing = [c for c in ("timeStamp", "elapsed", "responseMessage") if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"Not a JMeter result file, missing columns: {missing}")
+        if chunk.empty:
+            return
+
+        ok = (chunk["responseMessage"] == "OK").to_numpy()
+        ts = chunk["timeStamp"].to_numpy()
+        elapsed = chunk["elapsed"].to_numpy(dtype="float64")
+
+        n_ok = int(ok.sum())
+        self.total_ok += n_ok
+        self.total_nok += len(chunk) - n_ok
+
+        if n_ok:
+            ok_ts = ts[ok]
+            self.ok_elapsed_sum += float(elapsed[ok].sum())
+            self.ok_ts_min = min(self.ok_ts_min, ok_ts.min())
+            self.ok_ts_max = max(self.ok_ts_max, ok_ts.max())
+            self._update_corrected(chunk[ok], elapsed[ok])
+            labels = chunk["label"][ok] if self.breakdown and "label" in chunk.columns else None
+            self._update_histograms(labels, elapsed[ok])
+
+        if self.breakdown:
+            if "label" in chunk.columns:
+                self._update_label_sums(ts, chunk["label"], ok, elapsed, chunk.get("bytes"))
+            self._update_bins(ts, ok, elapsed)
+
+        self.elapsed_sum += float(elapsed.sum())
+        self.ts_min = min(self.ts_min, ts.min())
+        self.ts_max = max(self.ts_max, ts.max())
+
+        if "Latency" in chunk.columns:
+            latency = chunk["Latency"].dropna()
+            self.latency_sum += float(latency.sum())
+            self.latency_count += len(latency)
+
+    def _update_corrected(self, ok_chunk, elapsed):
+        """Adds the OK samples to the sums of the corrected response time."""
+        if "intendedTimeStamp" in ok_chunk.columns:
+            intended = ok_chunk["intendedTimeStamp"].to_numpy(dtype="float64")
+        else:
+            intended = np.full(len(elapsed), np.nan)
+        scheduled = ~np.isnan(intended)
+        if scheduled.any():
+            ts = ok_chunk["timeStamp"].to_numpy(dtype="float64")[scheduled]
+            self.corrected_sum += float((ts + elapsed[scheduled] - intended[scheduled]).sum())
+            self.corrected_count += int(scheduled.sum())
+
+        if not self.ctt or "grpThreads" not in ok_chunk.columns or scheduled.all():
+            return
+        # Closed-loop samples: backfill the requests omitted while waiting
+        latency = elapsed[~scheduled]
+        interval = 60000.0 * ok_chunk["grpThreads"].to_numpy(dtype="float64")[~scheduled] / self.ctt
+        missed = np.maximum(np.floor(latency / interval) - 1, 0)
+        self.corrected_sum += float((latency + missed * latency - interval * missed * (missed + 1) / 2).sum())
+        self.corrected_count += int(len(latency) + missed.sum())
+
+    def _update_histograms(self, labels, elapsed):
+        """Adds the OK response times to the histogram of the file and of their labels."""
+        index = self.histogram.index_of(elapsed)
+        self.histogram.record_index(index, elapsed.max(), elapsed.min())
+        if labels is None:
+            return
+        # One bincount over (label, bucket) pairs for all the labels of the chunk
+        codes, uniques = pd.factorize(labels.to_numpy(), use_na_sentinel=False)
+        n_buckets = len(self.histogram.counts)
+        counts = np.bincount(codes * n_buckets + index, minlength=len(uniques) * n_buckets)
+        vmax = np.full(len(uniques), -np.inf)
+        vmin = np.full(len(uniques), np.inf)
+        np.maximum.at(vmax, codes, elapsed)
+        np.minimum.at(vmin, codes, elapsed)
+        for code, label in enumerate(uniques):
+            hist = self.label_histograms.get(label)
+            if hist is None:
+                hist = self.label_histograms[label] = LatencyHistogram()
+            hist.record_counts(counts[code * n_buckets:(code + 1) * n_buckets], vmax[code], vmin[code])
+
+    def _update_label_sums(self, ts, labels, ok, elapsed, received):
+        """Adds the chunk to the per-bin, per-label sums, in one groupby on the bins and categorical labels."""
+        received = np.zeros(len(ok)) if received is None else received.to_numpy(dtype="float64")
+        bins = ts.astype(np.int64) // int(self.bin_sec * 1000)
+        sums = pd.DataFrame({
+            "total_ok": ok.astype(np.int64),
+            "total_nok": (~ok).astype(np.int64),
+            "elapsed_sum": np.where(ok, elapsed, 0),
+            "bytes_sum": np.where(ok, received, 0)
+        }).groupby([bins, pd.Categorical(labels.to_numpy())], observed=True).sum()
+        sums.index = sums.index.set_levels(sums.index.levels[1].astype(object), level=1)
+        sums.index.names = ["bin", "label"]
+        self.label_sums = sums if self.label_sums is None else self.label_sums.add(sums, fill_value=0)
+
+    def _update_bins(self, ts, ok, elapsed):
+        """Adds the chunk to the per-bin sums, reduced with bincount."""
+        bins, idx = np.unique(ts.astype(np.int64) // int(self.bin_sec * 1000), return_inverse=True)
+        sums = pd.DataFrame({
+            "total_ok": np.bincount(idx, weights=ok, minlength=len(bins)),
+            "total_nok": np.bincount(idx, weights=~ok, minlength=len(bins)),
+            "elapsed_sum": np.bincount(idx, weights=np.where(ok, elapsed, 0), minlength=len(bins))
+        }, index=bins)
+        # The same bin may span two chunks
+        self.bin_sums = sums if self.bin_sums is None else self.bin_sums.add(sums, fill_value=0)
+
+    def per_second(self):
+        """
+        Series of the run binned every `bin_sec` seconds.
+
+        Returns:
+            DataFrame: One row per bin (empty bins included) with columns time,
+                       total_ok, total_nok, throughput, avg_response_time_ms.
+        """
+        columns = ["time", "total_ok", "total_nok", "throughput", "avg_response_time_ms"]
+        if self.bin_sums is None:
+            return pd.DataFrame(columns=columns)
+
+        bin_ms = int(self.bin_sec * 1000)
+        per_bin = self.bin_sums.reindex(np.arange(self.bin_sums.index.min(), self.bin_sums.index.max() + 1),
+                                        fill_value=0)
+        df = pd.DataFrame({
+            "time": pd.to_datetime(per_bin.index.to_numpy() * bin_ms, unit="ms").astype("datetime64[ns]"),
+            "total_ok": per_bin["total_ok"].to_numpy().astype(np.int64),
+            "total_nok": per_bin["total_nok"].to_numpy().astype(np.int64)
+        })
+        df["throughput"] = df["total_ok"] / self.bin_sec
+        with np.errstate(invalid="ignore", divide="ignore"):
+            df["avg_response_time_ms"] = per_bin["elapsed_sum"].to_numpy() / df["total_ok"].to_numpy()
+        return df[columns]
+
+    def steady_summary(self, batch=5, ramp_sec=None):
+        """
+        Capacity metrics of the steady-state window, detected with MSER-`batch`
+        on the per-bin throughput and cut at most a few batches after the
+        ramp-up `ramp_sec` (see steady_state.steady_state_summary).
+        """
+        return steady_state_summary(self.per_second(), self.bin_sec, batch, ramp_sec)
+
+    def window_ms(self, window):
+        """Timestamps [start_ms, end_ms) of `window` = (start_sec, end_sec) from the first bin."""
+        if self.bin_sums is None:
+            return 0, 0
+        first_ms = self.bin_sums.index.min() * int(self.bin_sec * 1000)
+        return first_ms + window[0] * 1000, first_ms + window[1] * 1000
+
+    def _window_label_sums(self, window):
+        """
+        Per-label sums of the bins in `window` = (start_sec, end_sec) from the
+        first bin, as steady_summary reports it (None: the whole run), and the
+        duration they are averaged over.
+        """
+        if window is None:
+            # Same duration as summary()
+            duration = (self.ok_ts_max - self.ok_ts_min) / 1000 if self.total_ok else float("nan")
+            return self.label_sums.groupby(level="label").sum(), duration
+
+        start_sec, end_sec = window
+        first = self.bin_sums.index.min()
+        offset = (self.label_sums.index.get_level_values("bin") - first) * self.bin_sec
+        inside = (offset >= start_sec) & (offset < end_sec)
+        return self.label_sums[inside].groupby(level="label").sum(), end_sec - start_sec
+
+    def _breakdown(self, sums, duration):
+        # Same definitions as summary(), over `duration`
+        out = sums[["total_ok", "total_nok"]].astype(np.int64)
+        out["avg_response_time_ms"] = sums["elapsed_sum"] / sums["total_ok"].where(sums["total_ok"] > 0)
+        out["throughput"] = sums["total_ok"] / duration if duration > 0 else float("nan")
+        out["bytes_per_sec"] = sums["bytes_sum"] / duration if duration > 0 else float("nan")
+        out["power"] = out["throughput"] / (out["avg_response_time_ms"] / 1000).where(out["avg_response_time_ms"] > 0)
+        return out.reset_index()
+
+    def label_summary(self, window=None):
+        """
+        Capacity metrics (BREAKDOWN_METRICS) of every label, with its page
+        weight class. Throughput and bytes/s are over the duration of the run,
+        or of `window` = (start_sec, end_sec) from the first bin (e.g. the
+        steady-state window of steady_summary) when given.
+        """
+        if self.label_sums is None:
+            return pd.DataFrame(columns=["label", "weight_class"] + BREAKDOWN_METRICS)
+        sums, duration = self._window_label_sums(window)
+        out = self._breakdown(sums, duration)
+        out.insert(1, "weight_class", weight_class(out["label"]))
+        return out
+
+    def class_summary(self, window=None):
+        """Capacity metrics (BREAKDOWN_METRICS) of every page weight class, over `window` as label_summary."""
+        if self.label_sums is None:
+            return pd.DataFrame(columns=["weight_class"] + BREAKDOWN_METRICS)
+        sums, duration = self._window_label_sums(window)
+        sums = sums.groupby(weight_class(sums.index).to_numpy()).sum()
+        return self._breakdown(sums.rename_axis("weight_class"), duration)
+
+    @property
+    def total(self):
+        return self.total_ok + self.total_nok
+
+    def summary(self):
+        """
+        Returns the capacity metrics computed on the OK requests, as reported by
+        `test_capacity.process_csv`.
+        """
+        duration = (self.ok_ts_max - self.ok_ts_min) / 1000 if self.total_ok else float("nan")
+        avg_response_time = self.ok_elapsed_sum / self.total_ok if self.total_ok else float("nan")
+        throughput = self.total_ok / duration if duration > 0 else float("nan")
+        power = throughput / (avg_response_time / 1000) if avg_response_time > 0 else float("nan")
+        corrected = self.corrected_sum / self.corrected_count if self.corrected_count else float("nan")
+
+        return {
+            "total_ok": self.total_ok,
+            "total_nok": self.total_nok,
+            "duration_sec": duration,
+            "avg_response_time_ms": avg_response_time,
+            "throughput": throughput,
+            "power": power,
+            "avg_corrected_response_time_ms": corrected,
+            **self.histogram.summary()
+        }
+
+    def summary_all(self):
+        """
+        Returns the metrics computed on every sample regardless of the response
+        message (mean elapsed, mean latency and throughput of all the samples).
+        """
+        duration = (self.ts_max - self.ts_min) / 1000 if self.total else float("nan")
+
+        return {
+            "total_samples": self.total,
+            "duration_sec": duration,
+            "avg_response_time_ms": self.elapsed_sum / self.total if self.total else float("nan"),
+            "avg_latency_ms": self.latency_sum / self.latency_count if self.latency_count else float("nan"),
+            "throughput": self.total / duration if duration > 0 else float("nan")
+        }
+
+
+def weight_class(labels):
+    """Page weight class (WEIGHT_CLASSES, "other" without a known suffix) of every label."""
+    suffix = pd.Series(labels, dtype=object).str.extract(r"\[(\w+)\]\s*$", expand=False)
+    return suffix.map(WEIGHT_CLASSES).fillna("other")
+
+
+def _parse_jtl_chunks(file_path, chunksize=CHUNK_SIZE):
+    return pd.read_csv(file_path, usecols=lambda c: c in JTL_COLUMNS, chunksize=chunksize)
+
+
+def iter_jtl_chunks(file_path, chunksize=CHUNK_SIZE, use_cache=None):
+    """
+    Yields the JTL file as DataFrame chunks holding only the JTL_COLUMNS present.
+    Already parsed files are read back from the columnar cache.
+    """
+    if not (USE_CACHE if use_cache is None else use_cache):
+        return _parse_jtl_chunks(file_path, chunksize)
+
+    namespace = "jtl-" + "-".join(JTL_COLUMNS)
+    return cached_chunks(file_path, namespace, lambda p: _parse_jtl_chunks(p, chunksize), chunksize)
+
+
+def read_jtl_stats(file_path, chunksize=CHUNK_SIZE, use_cache=None, ctt=None, bin_sec=1, breakdown=True):
+    """
+    Streams a JMeter result file once and returns the filled JtlAccumulator.
+
+    Args:
+        file_path (str): Path to the JTL/CSV file
+        chunksize (int): Number of rows parsed at a time
+        use_cache (bool): Go through the columnar cache (default: USE_CACHE)
+        ctt (float): Constant Throughput Timer of the run in samples/minute,
+                     for the coordinated omission correction of closed-loop runs
+        bin_sec (float): Length of the bins of the per-second series
+        breakdown (bool): Also keep the per-label histograms and sums and the
+                          bins (False: totals and histogram of the file only)
+
+    Returns:
+        JtlAccumulator: Accumulator with the totals of the whole file
+    """
+    acc = JtlAccumulator(ctt, bin_sec, breakdown)
+    for chunk in iter_jtl_chunks(file_path, chunksize, use_cache):
+        acc.update(chunk)
+    return acc
+
+
+def read_jtl_histograms(file_path, start_ms=-math.inf, end_ms=math.inf, chunksize=CHUNK_SIZE, use_cache=None):
+    """
+    Streams a JMeter result file again for the latency histograms of the OK
+    samples with timeStamp in [start_ms, end_ms), e.g. the steady-state window
+    (see JtlAccumulator.window_ms).
+
+    Returns:
+        tuple: (LatencyHistogram of all the labels, dict label -> LatencyHistogram)
+    """
+    acc = JtlAccumulator()
+    for chunk in iter_jtl_chunks(file_path, chunksize, use_cache):
+        ts = chunk["timeStamp"].to_numpy()
+        keep = (chunk["responseMessage"] == "OK").to_numpy() & (ts >= start_ms) & (ts < end_ms)
+        if keep.any():
+            acc._update_histograms(chunk["label"][keep] if "label" in chunk.columns else None,
+                                   chunk["elapsed"].to_numpy(dtype="float64")[keep])
+    return acc.histogram, acc.label_histograms
+
+
+def jtl_summary(file_path, chunksize=CHUNK_SIZE, use_cache=None, ctt=None):
+    """
+    Capacity metrics of a JMeter result file (total_ok, total_nok, duration,
+    mean response time, throughput, power, mean response time corrected for
+    coordinated omission and response time percentiles) computed with
+    bounded memory.
+    """
+    summary = read_jtl_stats(file_path, chunksize, use_cache, ctt, breakdown=False).summary()
+    return {"file": os.path.basename(file_path), **summary}
@@ -0,0 +1,132 @@
+"""HDR-style latency histogram: percentiles at a fixed relative error.
+
+Values (response times in ms) are counted in log-linear buckets, as in
+HdrHistogram: every power of two is split into the same number of linear
+sub-buckets, so any value is represented within 10^-significant_digits of
+its own magnitude. The bucket layout only depends on `significant_digits` and
+`highest_ms`, so the memory of a histogram does not depend on the number of
+samples and two histograms with the same layout merge exactly by adding
+their counts (e.g. the replications of the same CTT level).
+"""
+
+import math
+import numpy as np
+
+# Percentiles reported by LatencyHistogram.summary
+PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+def percentile_key(q):
+    """Column name of a percentile in the summaries, e.g. p99.9_response_time_ms."""
+    return f"p{q:g}_response_time_ms"
+
+
+class LatencyHistogram:
+    """
+    Mergeable histogram of integer latencies in [0, highest_ms].
+
+    Larger values are counted in the last bucket (the exact maximum is kept
+    aside). Percentiles are reported as the highest value equivalent to the
+    bucket they fall in, so they are never underestimated by more than the
+    bucket width and never exceed the recorded maximum.
+    """
+
+    def __init__(self, significant_digits=3, highest_ms=3_600_000):
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5.")
+        self.significant_digits = significant_digits
+        self.highest_ms = int(highest_ms)
+
+        # Linear sub-buckets per power of two: enough to tell apart values
+        # 10^-digits apart, the first half is shared with the previous bucket
+        self._sub_magnitude = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self._half_magnitude = self._sub_magnitude - 1
+        sub_count = 1 << self._sub_magnitude
+        buckets = 1
+        while (sub_count << (buckets - 1)) <= self.highest_ms:
+            buckets += 1
+        self.counts = np.zeros((buckets + 1) << self._half_magnitude, dtype=np.int64)
+
+        self.count = 0
+        self.max = -math.inf
+        self.min = math.inf
+
+    def _layout(self):
+        return self.significant_digits, self.highest_ms
+
+    def index_of(self, values):
+        """Bucket index of every value (array of int64)."""
+        v = np.clip(np.rint(np.asarray(values, dtype=np.float64)), 0, self.highest_ms).astype(np.int64)
+        # floor(log2(v | (sub_count - 1))) - sub_magnitude + 1, frexp is exact on these integers
+        bucket = np.frexp(v | ((1 << self._sub_magnitude) - 1))[1] - self._sub_magnitude
+        sub = v >> bucket
+        return ((bucket + 1) << self._half_magnitude) + sub - (1 << self._half_magnitude)
+
+    def _highest_equivalent(self, index):
+        bucket = (index >> self._half_magnitude) - 1
+        sub = (index & ((1 << self._half_magnitude) - 1)) + (1 << self._half_magnitude)
+        if bucket < 0:
+            bucket, sub = 0, sub - (1 << self._half_magnitude)
+        return ((sub + 1) << bucket) - 1
+
+    def record(self, values):
+        """Adds an array of latencies (NaN values are ignored)."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.record_index(self.index_of(values), values.max(), values.min())
+
+    def record_index(self, index, vmax, vmin):
+        """Adds values already mapped with `index_of`, with their max and min."""
+        self.record_counts(np.bincount(index, minlength=len(self.counts)), vmax, vmin)
+
+    def record_counts(self, counts, vmax, vmin):
+        """Adds per-bucket counts (same length as `counts`), with the max and min of their values."""
+        self.counts += counts
+        self.count += int(counts.sum())
+        self.max = max(self.max, float(vmax))
+        self.min = min(self.min, float(vmin))
+
+    def remove_counts(self, counts):
+        """
+        Subtracts per-bucket counts added before (e.g. the samples leaving a
+        sliding window). The max and min are left to the caller.
+        """
+        self.counts -= counts
+        self.count -= int(counts.sum())
+
+    def merge(self, other):
+        """Adds the counts of `other` (same layout) to this histogram."""
+        if self._layout() != other._layout():
+            raise ValueError("Histograms with a different layout cannot be merged.")
+        self.counts += other.counts
+        self.count += other.count
+        self.max = max(self.max, other.max)
+        self.min = min(self.min, other.min)
+        return self
+
+    def copy(self):
+        hist = LatencyHistogram(self.significant_digits, self.highest_ms)
+        return hist.merge(self)
+
+    def percentiles(self, qs):
+        """Values at or below which q% of the recorded latencies fall, for every q (NaN if empty)."""
+        if not self.count:
+            return [float("nan")] * len(qs)
+        cumulative = np.cumsum(self.counts)
+        out = []
+        for q in qs:
+            rank = max(1, math.ceil(q / 100 * self.count))
+            index = int(np.searchsorted(cumulative, rank))
+            out.append(float(min(self._highest_equivalent(index), self.max)))
+        return out
+
+    def percentile(self, q):
+        return self.percentiles([q])[0]
+
+    def summary(self):
+        """Percentiles in PERCENTILES and the maximum, keyed as in the capacity summaries."""
+        out = {percentile_key(q): v for q, v in zip(PERCENTILES, self.percentiles(PERCENTILES))}
+        out["max_response_time_ms"] = self.max if self.count else float("nan")
+        return out
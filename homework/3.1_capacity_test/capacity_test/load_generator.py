@@ -0,0 +1,554 @@
+"""Asyncio load generator for the JMeter test plans, without a JVM.
+
+Reads a .jmx plan (test_plan_capacity.jmx, test_plan_fairness.jmx,
+test_plan_eda.jmx, ...) and reproduces its enabled thread groups: number of
+threads, ramp-up, duration or loop count, Random Controller or in-order
+samplers, and the Constant Throughput Timer (samples per minute, with its
+calcMode). Every virtual user is a coroutine and HTTP/1.1 keep-alive
+connections are reused through a pool, so thousands of users run in a single
+process with a fraction of the memory and CPU of JMeter threads.
+
+Samples are written in the CSV layout of the JMeter Simple Data Writer
+(jmeter/*.csv), which `test_capacity.process_csv` and `jtl_follow.py` read
+unchanged. Only the standard library is imported, so it starts at once.
+
+Usage:
+    python load_generator.py test_plan_capacity.jmx --ctt 1200 --out jmeter/1200_CTT_1.csv
+    python load_generator.py ../fairness_index/test_plan_fairness.jmx --duration 60 --out fairness.csv
+    python load_generator.py ../../3.3_doe/jmeter/test_plan_eda.jmx --host 127.0.0.1 --port 8080 --ctt 4800
+"""
+
+import os
+import csv
+import ssl
+import time
+import random
+import asyncio
+import argparse
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+# Columns of the Simple Data Writer CSV (same order as the files in jmeter/),
+# plus the scheduled send time of open-loop samples, written like a JMeter
+# sample variable (last column, empty for closed-loop samples)
+JTL_HEADER = ["timeStamp", "elapsed", "label", "responseCode", "responseMessage", "threadName", "success",
+              "bytes", "sentBytes", "grpThreads", "allThreads", "URL", "Latency", "SampleCount", "ErrorCount",
+              "IdleTime", "Connect", "intendedTimeStamp"]
+
+Sampler = namedtuple("Sampler", ["label", "method", "path", "host", "port", "protocol"])
+
+ThreadGroupPlan = namedtuple("ThreadGroupPlan", [
+    "name", "threads", "ramp_time", "duration", "loops", "ctt", "calc_mode", "random_order", "samplers"
+])
+
+# Seconds between flushes of the output file (so that jtl_follow.py can tail it)
+_FLUSH_INTERVAL = 1.0
+
+
+# ---------------------------------------------------------------------------
+# Test plan
+# ---------------------------------------------------------------------------
+
+def _props(elem):
+    """Values of the properties of a test element (nested ones included)."""
+    props = {}
+    for p in elem.iter():
+        if p.tag in ("stringProp", "intProp", "longProp", "boolProp"):
+            props.setdefault(p.get("name"), (p.text or "").strip())
+        elif p.tag == "doubleProp":
+            props.setdefault(p.findtext("name"), (p.findtext("value") or "").strip())
+    return props
+
+
+def _children(tree):
+    # A hashTree lists each element followed by the hashTree of its children
+    items = list(tree)
+    for i, elem in enumerate(items):
+        if elem.tag != "hashTree":
+            sub = items[i + 1] if i + 1 < len(items) and items[i + 1].tag == "hashTree" else None
+            yield elem, sub
+
+
+def _enabled(elem):
+    return elem.get("enabled", "true") != "false"
+
+
+def _http_defaults(elem, defaults):
+    props = _props(elem)
+    out = dict(defaults)
+    for key, prop in (("host", "HTTPSampler.domain"), ("port", "HTTPSampler.port"), ("protocol", "HTTPSampler.protocol")):
+        if props.get(prop):
+            out[key] = props[prop]
+    return out
+
+
+def _collect(tree, defaults, state):
+    """Walks a thread group subtree: samplers (in order), CTT and controllers."""
+    # HTTP Request Defaults apply to their whole scope, wherever they appear
+    for elem, _ in _children(tree):
+        if elem.tag == "ConfigTestElement" and _enabled(elem):
+            defaults = _http_defaults(elem, defaults)
+
+    for elem, sub in _children(tree):
+        if not _enabled(elem):
+            continue
+        if elem.tag == "ConstantThroughputTimer":
+            props = _props(elem)
+            state["ctt"] = float(props.get("throughput") or 0)
+            state["calc_mode"] = int(props.get("calcMode") or 0)
+        elif elem.tag == "HTTPSamplerProxy":
+            http = _http_defaults(elem, defaults)
+            props = _props(elem)
+            state["samplers"].append(Sampler(elem.get("testname"), props.get("HTTPSampler.method") or "GET",
+                                             props.get("HTTPSampler.path", ""), http["host"],
+                                             int(http["port"] or (443 if http["protocol"] == "https" else 80)),
+                                             http["protocol"] or "http"))
+        elif sub is not None and elem.tag.endswith("Controller"):
+            state["random_order"] = state["random_order"] or elem.tag in ("RandomController", "RandomOrderController")
+            _collect(sub, defaults, state)
+
+
+def parse_jmx(path):
+    """
+    Enabled thread groups of a JMeter test plan.
+
+    Args:
+        path (str): .jmx file
+
+    Returns:
+        list: ThreadGroupPlan of every enabled thread group
+    """
+    root = ET.parse(path).getroot()
+    plan_tree = next(sub for elem, sub in _children(root.find("hashTree")) if elem.tag == "TestPlan")
+
+    defaults = {"host": "", "port": "", "protocol": ""}
+    for elem, _ in _children(plan_tree):
+        if elem.tag == "ConfigTestElement" and _enabled(elem):
+            defaults = _http_defaults(elem, defaults)
+
+    groups = []
+    for elem, sub in _children(plan_tree):
+        if elem.tag != "ThreadGroup" or not _enabled(elem) or sub is None:
+            continue
+        props = _props(elem)
+        state = {"ctt": None, "calc_mode": 0, "random_order": False, "samplers": []}
+        _collect(sub, defaults, state)
+        scheduler = props.get("ThreadGroup.scheduler") == "true"
+        groups.append(ThreadGroupPlan(
+            name=elem.get("testname"),
+            threads=int(props.get("ThreadGroup.num_threads") or 1),
+            ramp_time=float(props.get("ThreadGroup.ramp_time") or 0),
+            duration=float(props.get("ThreadGroup.duration") or 0) if scheduler else None,
+            loops=int(props.get("LoopController.loops") or 1),
+            ctt=state["ctt"],
+            calc_mode=state["calc_mode"],
+            random_order=state["random_order"],
+            samplers=state["samplers"]
+        ))
+    return groups
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one server, reused across users."""
+
+    def __init__(self, host, port, use_ssl=False, timeout=None):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if use_ssl else None
+        self.timeout = timeout
+        self.idle = []
+
+    async def acquire(self):
+        """Returns (reader, writer, connect_ms); connect_ms is 0 for a reused connection."""
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, 0
+            writer.close()
+        start = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl),
+                                                self.timeout)
+        return reader, writer, round((time.perf_counter() - start) * 1000)
+
+    def release(self, reader, writer, reusable):
+        if reusable:
+            self.idle.append((reader, writer))
+        else:
+            writer.close()
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+async def _read_response(reader):
+    """Reads one response: (status code, reason, received bytes, keep-alive, first byte time)."""
+    status = await reader.readline()
+    first_byte = time.perf_counter()
+    if not status:
+        raise ConnectionResetError("Connection closed by the server")
+    version, code, reason = (status.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+    received = len(status)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        received += len(line)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readline()
+            size = int(size_line.split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            received += len(size_line) + size + 2
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        length = int(headers["content-length"])
+        await reader.readexactly(length)
+        received += length
+    elif code not in ("204", "304"):
+        # No length: the body ends with the connection
+        received += len(await reader.read())
+        keep_alive = False
+    return code, reason, received, keep_alive, first_byte
+
+
+async def http_sample(pool, sampler, timeout=None):
+    """
+    One HTTP request, measured as JMeter does.
+
+    Returns:
+        tuple: (responseCode, responseMessage, success, bytes, sentBytes,
+                elapsed ms, Latency ms, Connect ms)
+    """
+    path = sampler.path if sampler.path.startswith("/") else "/" + sampler.path
+    request = (f"{sampler.method} {path} HTTP/1.1\r\nHost: {sampler.host}\r\n"
+               f"Connection: keep-alive\r\nUser-Agent: load_generator.py\r\n\r\n").encode("latin-1")
+    start = time.perf_counter()
+    connect_ms = 0
+    for attempt in range(2):
+        reader, writer, connect_ms = await pool.acquire()
+        try:
+            writer.write(request)
+            code, reason, received, keep_alive, first_byte = await asyncio.wait_for(_read_response(reader), timeout)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            pool.release(reader, writer, False)
+            # A reused connection may have been closed by the server: retry once
+            if attempt == 0 and connect_ms == 0:
+                continue
+            raise e
+        except BaseException:
+            pool.release(reader, writer, False)
+            raise
+        pool.release(reader, writer, keep_alive)
+        end = time.perf_counter()
+        return (code, reason, code.startswith(("2", "3")), received, len(request),
+                round((end - start) * 1000), round((first_byte - start) * 1000), connect_ms)
+
+
+# ---------------------------------------------------------------------------
+# Load
+# ---------------------------------------------------------------------------
+
+class ThroughputTimer:
+    """
+    Constant Throughput Timer of a thread group, in samples per minute.
+
+    calcMode as in JMeter: 0 this thread only, 1 all active threads,
+    2 all active threads in the thread group, 3 all active threads (shared),
+    4 all active threads in the thread group (shared).
+    """
+
+    def __init__(self, per_minute, calc_mode, group_state, run_state, shared=None):
+        self.ms_per_request = 60000.0 / per_minute if per_minute else 0.0
+        self.calc_mode = calc_mode
+        self.group_state = group_state
+        self.run_state = run_state
+        self.shared = shared if shared is not None else {"last": 0.0}
+
+    def delay(self, previous):
+        """Seconds to wait and the new previous time of the calling thread (JMeter's calculateDelay)."""
+        if not self.ms_per_request:
+            return 0.0, previous
+        now = time.time() * 1000
+        if self.calc_mode in (3, 4):
+            shared = self.shared
+            if not shared["last"]:
+                shared["last"] = now
+            shared["last"] = max(now, shared["last"] + self.ms_per_request)
+            return (shared["last"] - now) / 1000, previous
+
+        factor = {1: self.run_state["active"], 2: self.group_state["active"]}.get(self.calc_mode, 1)
+        target = previous + self.ms_per_request * factor
+        if now > target:
+            return 0.0, now
+        return (target - now) / 1000, target
+
+
+class JtlWriter:
+    """Appends samples to a CSV in the layout of the JMeter Simple Data Writer."""
+
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", buffering=1 << 16)
+        self.writer = csv.writer(self.file, lineterminator="\n")
+        self.writer.writerow(JTL_HEADER)
+        self.total = 0
+        self.ok = 0
+        self.elapsed_sum = 0
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.total += 1
+        self.elapsed_sum += row[1]
+        if row[4] == "OK":
+            self.ok += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _url(sampler):
+    port = "" if sampler.port in (80, 443) else f":{sampler.port}"
+    return f"{sampler.protocol}://{sampler.host}{port}/" + sampler.path.lstrip("/")
+
+
+async def _sample(pools, sampler, timeout):
+    """http_sample with the errors recorded as JMeter does; returns (timeStamp, results)."""
+    time_stamp = int(time.time() * 1000)
+    try:
+        return time_stamp, await http_sample(pools[(sampler.host, sampler.port, sampler.protocol)], sampler, timeout)
+    except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+        elapsed = int(time.time() * 1000) - time_stamp
+        return time_stamp, (f"Non HTTP response code: {type(e).__name__}", f"Non HTTP response message: {e}",
+                            False, 0, 0, elapsed, 0, 0)
+
+
+def _row(sampler, thread_name, time_stamp, results, grp_threads, all_threads, intended=""):
+    code, message, success, received, sent, elapsed, latency, connect = results
+    return [time_stamp, elapsed, sampler.label, code, message, thread_name, "true" if success else "false",
+            received, sent, grp_threads, all_threads, _url(sampler), latency, 1, 0 if success else 1, 0, connect,
+            intended]
+
+
+async def _virtual_user(group, index, pools, timer, writer, group_state, run_state, stop_at, timeout, rng):
+    if group.threads > 1 and group.ramp_time:
+        delay = group.ramp_time * index / group.threads
+        if stop_at is not None and time.time() + delay >= stop_at:
+            return
+        await asyncio.sleep(delay)
+
+    thread_name = f"{group.name} 1-{index + 1}"
+    group_state["active"] += 1
+    run_state["active"] += 1
+    previous = 0.0
+    try:
+        iteration = 0
+        while group.loops < 0 or iteration < group.loops:
+            iteration += 1
+            samplers = [rng.choice(group.samplers)] if group.random_order else group.samplers
+            for sampler in samplers:
+                if timer is not None:
+                    wait, previous = timer.delay(previous)
+                    if stop_at is not None and time.time() + wait >= stop_at:
+                        # The next sample would start after the end of the test
+                        await asyncio.sleep(max(0.0, stop_at - time.time()))
+                        return
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                if stop_at is not None and time.time() >= stop_at:
+                    return
+
+                time_stamp, results = await _sample(pools, sampler, timeout)
+                writer.write(_row(sampler, thread_name, time_stamp, results, group_state["active"], run_state["active"]))
+    finally:
+        group_state["active"] -= 1
+        run_state["active"] -= 1
+
+
+def arrival_times(rate, duration=None, count=None, ramp_time=0.0, process="poisson", rng=None):
+    """
+    Open-loop send times (seconds from the start of the group).
+
+    Args:
+        rate (float): Requests per second once the ramp-up is over
+        duration (float): Length of the schedule in seconds
+        count (int): Number of requests (when there is no duration)
+        ramp_time (float): The rate grows linearly from 0 during the ramp-up
+        process (str): "poisson" (exponential gaps) or "deterministic" (1/rate)
+        rng (Random): Generator of the Poisson gaps
+
+    Returns:
+        list: Send times in increasing order
+    """
+    rng = rng or random.Random()
+    times = []
+    work = 0.0
+    while count is None or len(times) < count:
+        # Arrivals of a unit-rate process, mapped through the inverse of the
+        # expected count: rate t^2 / (2 ramp) during the ramp-up, then linear
+        work += rng.expovariate(1.0) if process == "poisson" else 1.0
+        if ramp_time and work < rate * ramp_time / 2:
+            t = (2 * work * ramp_time / rate) ** 0.5
+        else:
+            t = work / rate + ramp_time / 2
+        if duration is not None and t >= duration:
+            break
+        times.append(t)
+    return times
+
+
+async def _open_loop_group(group, pools, writer, group_state, run_state, start, timeout, rng, process):
+    # Requests are fired at their scheduled times, whether or not the
+    # previous ones have completed; the CTT sets the rate of the whole group
+    rate = group.ctt / 60 * (group.threads if group.calc_mode == 0 else 1)
+    count = None if group.duration else max(group.loops, 1) * group.threads
+    schedule = arrival_times(rate, group.duration, count, group.ramp_time, process, rng)
+    thread_name = f"{group.name} open-loop"
+
+    async def fire(sampler, intended):
+        group_state["active"] += 1
+        run_state["active"] += 1
+        try:
+            time_stamp, results = await _sample(pools, sampler, timeout)
+            writer.write(_row(sampler, thread_name, time_stamp, results, group_state["active"],
+                              run_state["active"], round(intended * 1000)))
+        finally:
+            group_state["active"] -= 1
+            run_state["active"] -= 1
+
+    in_flight = set()
+    for i, t in enumerate(schedule):
+        wait = start + t - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        sampler = rng.choice(group.samplers) if group.random_order else group.samplers[i % len(group.samplers)]
+        task = asyncio.ensure_future(fire(sampler, start + t))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+async def _flusher(writer):
+    while True:
+        await asyncio.sleep(_FLUSH_INTERVAL)
+        writer.flush()
+
+
+async def run_plan(groups, out_path, timeout=None, seed=None, open_loop=None):
+    """
+    Runs the thread groups concurrently and writes the samples to `out_path`.
+
+    With `open_loop` ("poisson" or "deterministic") every thread group sends
+    its CTT rate on a precomputed arrival schedule instead of running
+    closed-loop threads, and every sample records its scheduled send time.
+
+    Returns:
+        JtlWriter: The (closed) writer, with the totals of the run
+    """
+    rng = random.Random(seed)
+    writer = JtlWriter(out_path)
+    run_state = {"active": 0}
+    shared_all = {"last": 0.0}
+    pools = {}
+    tasks = []
+    start = time.time()
+    for group in groups:
+        if not group.samplers:
+            continue
+        for s in group.samplers:
+            key = (s.host, s.port, s.protocol)
+            if key not in pools:
+                pools[key] = ConnectionPool(s.host, s.port, s.protocol == "https", timeout)
+        group_state = {"active": 0}
+        if open_loop:
+            if not group.ctt:
+                raise ValueError(f"{group.name}: the open-loop mode needs a Constant Throughput Timer (--ctt)")
+            tasks.append(_open_loop_group(group, pools, writer, group_state, run_state, start, timeout, rng,
+                                          open_loop))
+            continue
+        timer = None
+        if group.ctt:
+            timer = ThroughputTimer(group.ctt, group.calc_mode, group_state, run_state,
+                                    shared_all if group.calc_mode == 3 else None)
+        stop_at = start + group.duration if group.duration else None
+        tasks += [_virtual_user(group, i, pools, timer, writer, group_state, run_state, stop_at, timeout, rng)
+                  for i in range(group.threads)]
+
+    flusher = asyncio.ensure_future(_flusher(writer))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        flusher.cancel()
+        for pool in pools.values():
+            pool.close()
+        writer.close()
+    return writer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JMeter test plan with an asyncio load generator")
+    parser.add_argument("jmx", help="JMeter test plan (.jmx)")
+    parser.add_argument("--out", default=None, help="Output CSV (default: <CTT>_CTT.csv)")
+    parser.add_argument("--ctt", type=float, default=None, help="Constant Throughput Timer in samples/minute")
+    parser.add_argument("--threads", type=int, default=None, help="Threads of every thread group")
+    parser.add_argument("--ramp", type=float, default=None, help="Ramp-up in seconds")
+    parser.add_argument("--duration", type=float, default=None, help="Duration in seconds")
+    parser.add_argument("--loops", type=int, default=None, help="Loop count (-1: until the duration ends)")
+    parser.add_argument("--host", default=None, help="Server host (default: HTTP Request Defaults of the plan)")
+    parser.add_argument("--port", type=int, default=None, help="Server port")
+    parser.add_argument("--timeout", type=float, default=None, help="Connect/response timeout in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the Random Controller choices")
+    parser.add_argument("--open-loop", choices=["poisson", "deterministic"], default=None,
+                        help="Send the CTT rate on an arrival schedule, independent of the responses")
+    args = parser.parse_args(argv)
+
+    groups = parse_jmx(args.jmx)
+    if not groups:
+        parser.error(f"No enabled thread group in {args.jmx}")
+
+    overrides = {k: v for k, v in (("ctt", args.ctt), ("threads", args.threads), ("ramp_time", args.ramp),
+                                   ("duration", args.duration), ("loops", args.loops)) if v is not None}
+    groups = [g._replace(**overrides) for g in groups]
+    if args.host or args.port:
+        groups = [g._replace(samplers=[s._replace(host=args.host or s.host, port=args.port or s.port)
+                                       for s in g.samplers]) for g in groups]
+
+    out_path = args.out
+    if out_path is None:
+        out_path = f"{groups[0].ctt:.0f}_CTT.csv" if groups[0].ctt else "load_generator.csv"
+    for g in groups:
+        mode = ("random" if g.random_order else "in order") + (f", open loop ({args.open_loop})" if args.open_loop else "")
+        print(f"{g.name}: {g.threads} threads, ramp {g.ramp_time:g}s, "
+              f"{'duration ' + format(g.duration, 'g') + 's' if g.duration else 'loops ' + str(g.loops)}, "
+              f"CTT {g.ctt or 0:g}/min (calcMode {g.calc_mode}), {len(g.samplers)} samplers {mode}")
+
+    start = time.time()
+    try:
+        writer = asyncio.run(run_plan(groups, out_path, args.timeout, args.seed, args.open_loop))
+    except KeyboardInterrupt:
+        print("Interrupted")
+        return
+    elapsed = time.time() - start
+
+    print(f"Samples: {writer.total} ({writer.ok} OK) in {elapsed:.1f}s -> {writer.total / elapsed:.1f} req/s, "
+          f"mean elapsed {writer.elapsed_sum / max(writer.total, 1):.1f} ms")
+    print(f"✅ JTL written to: {os.path.abspath(out_path)}")
+
+
+if __name__ == "__main__":
+    main()
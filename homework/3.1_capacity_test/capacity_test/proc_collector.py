@@ -0,0 +1,288 @@
+"""Collect vmstat-compatible metrics straight from /proc.
+
+Samples /proc/stat, /proc/meminfo and /proc/vmstat at a configurable (also
+sub-second) interval and stores the same r/b/swpd/free/buff/cache/si/so/bi/bo/
+in/cs/us/sy/id/wa/st/gu columns printed by `vmstat`, with real timestamps, in
+a fixed-size binary ring buffer. The files are kept open and re-read from
+offset 0, so a sample costs three small reads and no process spawn.
+
+Usage:
+    python proc_collector.py --interval 0.5 --duration 300 --out stat.ring
+    python proc_collector.py --interval 1 --duration 300 --vmstat-out vmstat/stat_400_1.csv
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from vmstat_parser import VMSTAT_COLUMNS
+
+# Columns produced by the collector, in vmstat order
+COLUMNS = [c for c in VMSTAT_COLUMNS if c not in ("inact", "active")]
+
+RECORD_DTYPE = np.dtype([("time", "<f8")] + [(c, "<f8") for c in COLUMNS])
+
+# Ring buffer file: magic, capacity and number of records written, then records
+_MAGIC = 0x564D5354_52494E47  # "VMSTRING"
+_HEADER = np.dtype([("magic", "<u8"), ("capacity", "<i8"), ("count", "<i8")])
+
+_PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer of collector records, optionally backed by a file.
+
+    When `path` is given the buffer is a memory-mapped file, so another process
+    (or a later analysis) can open it with `RingBuffer.open` while the collector
+    is still writing. Once full, the oldest records are overwritten.
+    """
+
+    def __init__(self, capacity, path=None):
+        self.path = path
+        if path is None:
+            self.header = np.zeros(1, dtype=_HEADER)
+            self.records = np.zeros(capacity, dtype=RECORD_DTYPE)
+        else:
+            with open(path, "wb") as f:
+                f.truncate(_HEADER.itemsize + capacity * RECORD_DTYPE.itemsize)
+            self.header = np.memmap(path, dtype=_HEADER, mode="r+", shape=(1,))
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r+", offset=_HEADER.itemsize, shape=(capacity,))
+        self.header["magic"] = _MAGIC
+        self.header["capacity"] = capacity
+        self.header["count"] = 0
+
+    @classmethod
+    def open(cls, path):
+        """Opens (read-only) a ring buffer file written by the collector."""
+        self = cls.__new__(cls)
+        self.path = path
+        self.header = np.memmap(path, dtype=_HEADER, mode="r", shape=(1,))
+        if int(self.header["magic"][0]) != _MAGIC:
+            raise ValueError(f"{path} is not a collector ring buffer")
+        capacity = int(self.header["capacity"][0])
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=_HEADER.itemsize, shape=(capacity,))
+        return self
+
+    @property
+    def capacity(self):
+        return len(self.records)
+
+    @property
+    def count(self):
+        return int(self.header["count"][0])
+
+    def append(self, record):
+        count = self.count
+        self.records[count % self.capacity] = record
+        # Publish the record only after it has been written
+        self.header["count"] = count + 1
+
+    def to_array(self):
+        """Records currently held, oldest first."""
+        count = self.count
+        if count <= self.capacity:
+            return np.array(self.records[:count])
+        start = count % self.capacity
+        return np.concatenate([self.records[start:], self.records[:start]])
+
+    def to_frame(self):
+        """Records currently held as a DataFrame with a datetime `time` column."""
+        df = pd.DataFrame(self.to_array())
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+        return df
+
+    def flush(self):
+        if self.path is not None:
+            self.header.flush()
+            self.records.flush()
+
+
+class ProcSampler:
+    """
+    Reads the raw kernel counters behind vmstat and turns two consecutive
+    readings into one vmstat-like record.
+    """
+
+    def __init__(self, proc="/proc"):
+        self.fds = {name: os.open(os.path.join(proc, name), os.O_RDONLY) for name in ("stat", "meminfo", "vmstat")}
+        # Read buffer of every file, grown to fit it whole (the intr line of
+        # /proc/stat alone can exceed 64 KiB on hosts with many CPUs or IRQs)
+        self.sizes = dict.fromkeys(self.fds, 1 << 16)
+        self.prev = None
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+
+    def _read(self, name):
+        # Until end of file: proc files may be returned in several reads
+        fd, size = self.fds[name], self.sizes[name]
+        parts = []
+        offset = 0
+        while True:
+            data = os.pread(fd, size, offset)
+            if not data:
+                break
+            parts.append(data)
+            offset += len(data)
+        if offset >= size:
+            self.sizes[name] = 1 << offset.bit_length()
+        return b"".join(parts)
+
+    def read_counters(self):
+        counters = {"time": time.time()}
+
+        for line in self._read("stat").splitlines():
+            key, _, rest = line.partition(b" ")
+            if key == b"cpu":
+                # user nice system idle iowait irq softirq steal guest guest_nice
+                fields = [int(x) for x in rest.split()] + [0] * 10
+                counters["cpu"] = fields[:10]
+            elif key == b"intr":
+                counters["intr"] = int(rest.split(None, 1)[0])
+            elif key == b"ctxt":
+                counters["ctxt"] = int(rest)
+            elif key == b"procs_running":
+                counters["r"] = int(rest)
+            elif key == b"procs_blocked":
+                counters["b"] = int(rest)
+
+        mem = {}
+        for line in self._read("meminfo").splitlines():
+            key, _, rest = line.partition(b":")
+            mem[key] = int(rest.split()[0])
+        counters["swpd"] = mem.get(b"SwapTotal", 0) - mem.get(b"SwapFree", 0)
+        counters["free"] = mem.get(b"MemFree", 0)
+        counters["buff"] = mem.get(b"Buffers", 0)
+        # procps reports page cache plus reclaimable slab as "cache"
+        counters["cache"] = mem.get(b"Cached", 0) + mem.get(b"SReclaimable", 0)
+
+        vm = {}
+        for line in self._read("vmstat").splitlines():
+            key, _, rest = line.partition(b" ")
+            vm[key] = rest
+        for key in (b"pswpin", b"pswpout", b"pgpgin", b"pgpgout"):
+            counters[key.decode()] = int(vm.get(key, 0))
+
+        return counters
+
+    def sample(self):
+        """
+        Returns a record with the rates since the previous call, or None on the
+        first call (rates need two readings).
+        """
+        cur = self.read_counters()
+        prev, self.prev = self.prev, cur
+        if prev is None:
+            return None
+
+        dt = cur["time"] - prev["time"]
+        if dt <= 0:
+            return None
+
+        d = [c - p for c, p in zip(cur["cpu"], prev["cpu"])]
+        user, nice, system, idle, iowait, irq, softirq, steal, guest, guest_nice = d
+        total = sum(d[:8]) or 1
+        # The kernel also accounts guest time in user/nice
+        guest_all = guest + guest_nice
+
+        record = np.zeros((), dtype=RECORD_DTYPE)
+        record["time"] = cur["time"]
+        record["r"] = cur.get("r", 0)
+        record["b"] = cur.get("b", 0)
+        record["swpd"] = cur["swpd"]
+        record["free"] = cur["free"]
+        record["buff"] = cur["buff"]
+        record["cache"] = cur["cache"]
+        record["si"] = (cur["pswpin"] - prev["pswpin"]) * _PAGE_KB / dt
+        record["so"] = (cur["pswpout"] - prev["pswpout"]) * _PAGE_KB / dt
+        record["bi"] = (cur["pgpgin"] - prev["pgpgin"]) / dt
+        record["bo"] = (cur["pgpgout"] - prev["pgpgout"]) / dt
+        record["in"] = (cur["intr"] - prev["intr"]) / dt
+        record["cs"] = (cur["ctxt"] - prev["ctxt"]) / dt
+        record["us"] = 100 * max(user + nice - guest_all, 0) / total
+        record["sy"] = 100 * (system + irq + softirq) / total
+        record["id"] = 100 * idle / total
+        record["wa"] = 100 * iowait / total
+        record["st"] = 100 * steal / total
+        record["gu"] = 100 * guest_all / total
+        return record
+
+
+def collect(interval=1.0, duration=None, capacity=86400, path=None):
+    """
+    Samples /proc every `interval` seconds (for `duration` seconds, or until
+    Ctrl+C) into a RingBuffer, which is returned.
+    """
+    buffer = RingBuffer(capacity, path)
+    sampler = ProcSampler()
+    sampler.sample()
+
+    start = time.monotonic()
+    next_tick = start + interval
+    try:
+        while duration is None or time.monotonic() - start < duration:
+            # Sleep to an absolute schedule so the interval does not drift
+            time.sleep(max(0.0, next_tick - time.monotonic()))
+            next_tick += interval
+            record = sampler.sample()
+            if record is not None:
+                buffer.append(record)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sampler.close()
+        buffer.flush()
+
+    return buffer
+
+
+def write_vmstat_text(df, out_path):
+    """
+    Writes the records in the text layout of `vmstat -t`, so that the existing
+    vmstat pipeline (test_bottleneck.py, vmstat_parser.py) reads them unchanged.
+    """
+    header = " ".join(f"{c:>6}" for c in COLUMNS)
+    with open(out_path, "w") as f:
+        f.write("procs -----------memory---------- ---swap-- -----io---- -system-- -------cpu------- -----timestamp-----\n")
+        f.write(f"{header} {'UTC':>19}\n")
+        values = df[COLUMNS].round().astype(np.int64).to_numpy()
+        stamps = df["time"].dt.strftime("%Y-%m-%d %H:%M:%S").to_numpy()
+        for row, stamp in zip(values, stamps):
+            f.write(" ".join(f"{v:6d}" for v in row) + f" {stamp}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect vmstat-compatible metrics from /proc")
+    parser.add_argument("--interval", type=float, default=1.0, help="Sampling interval in seconds (default: 1)")
+    parser.add_argument("--duration", type=float, default=None, help="Collection length in seconds (default: until Ctrl+C)")
+    parser.add_argument("--capacity", type=int, default=86400, help="Ring buffer size in records (default: 86400)")
+    parser.add_argument("--out", default=None, help="Ring buffer file (default: in memory only)")
+    parser.add_argument("--vmstat-out", default=None, help="Also write the records as `vmstat -t` text")
+    parser.add_argument("--csv", default=None, help="Also write the records as CSV")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists("/proc/stat"):
+        print("/proc/stat not found: the collector only runs on Linux")
+        sys.exit(2)
+
+    buffer = collect(args.interval, args.duration, args.capacity, args.out)
+    df = buffer.to_frame()
+    print(f"Collected {len(df)} samples every {args.interval}s ({datetime.now():%Y-%m-%d %H:%M:%S})")
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"✅ CSV written to: {args.csv}")
+    if args.vmstat_out:
+        write_vmstat_text(df, args.vmstat_out)
+        print(f"✅ vmstat text written to: {args.vmstat_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Parsed files are cached in this folder, next to the raw file they come from
+CACHE_DIR_NAME = ".columnar_cache"
+
+# Bump to invalidate every cache written by a previous layout
+CACHE_VERSION = 1
+
+
+def file_key(file_path, namespace, content_hash=False):
+    """
+    Builds the cache key of a raw file.
+
+    The key depends on the absolute path, the size and the modification time of
+    the file (or on its content when `content_hash` is True) and on the parser
+    namespace, so that a different parser or column selection never reuses a
+    cache written by another one.
+    """
+    st = os.stat(file_path)
+    h = hashlib.sha1()
+    h.update(f"{CACHE_VERSION}|{os.path.abspath(file_path)}|{namespace}|{st.st_size}".encode())
+
+    if content_hash:
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    else:
+        h.update(str(st.st_mtime_ns).encode())
+
+    return h.hexdigest()[:16]
+
+
+def _entry_prefix(file_path, namespace):
+    safe_ns = "".join(c if c.isalnum() else "_" for c in namespace)
+    return f"{os.path.basename(file_path)}.{safe_ns}."
+
+
+def _entry_dir(file_path, namespace, cache_dir, content_hash):
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME)
+    key = file_key(file_path, namespace, content_hash)
+    return cache_dir, os.path.join(cache_dir, _entry_prefix(file_path, namespace) + key)
+
+
+class _ColumnWriter:
+    """
+    Appends DataFrame chunks to one binary file per column.
+
+    Numeric, boolean and datetime columns are written as raw typed arrays; any
+    other column is dictionary encoded (int32 codes, -1 for missing values)
+    with the dictionary kept in the metadata.
+    """
+
+    def __init__(self, tmp_dir):
+        self.tmp_dir = tmp_dir
+        self.rows = 0
+        self.columns = {}
+        self.files = {}
+
+    def _path(self, index):
+        return os.path.join(self.tmp_dir, f"{index}.bin")
+
+    def _promote(self, name, dtype):
+        # dtype changed between chunks (e.g. int column with a NaN later on):
+        # rewrite what has been written so far with the common dtype
+        meta = self.columns[name]
+        self.files[name].close()
+        path = self._path(meta["index"])
+        old = np.fromfile(path, dtype=meta["dtype"])
+        old.astype(dtype).tofile(path)
+        meta["dtype"] = np.dtype(dtype).str
+        self.files[name] = open(path, "ab")
+
+    def write(self, chunk):
+        if self.columns and set(chunk.columns) != set(self.columns):
+            raise ValueError("All the chunks of a cached file must have the same columns.")
+
+        for name in chunk.columns:
+            values = chunk[name]
+            if name not in self.columns:
+                numeric = (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)
+                           or pd.api.types.is_datetime64_dtype(values))
+                index = len(self.columns)
+                self.columns[name] = {
+                    "index": index,
+                    "kind": "numeric" if numeric else "dict",
+                    "dtype": values.dtype.str if numeric else np.dtype("int32").str,
+                    "categories": [],
+                    "lookup": {}
+                }
+                self.files[name] = open(self._path(index), "ab")
+
+            meta = self.columns[name]
+            if meta["kind"] == "numeric":
+                if values.dtype.str != meta["dtype"]:
+                    common = np.result_type(np.dtype(meta["dtype"]), values.dtype)
+                    if common.str != meta["dtype"]:
+                        self._promote(name, common)
+                arr = values.to_numpy(dtype=meta["dtype"])
+            else:
+                codes, uniques = pd.factorize(values, use_na_sentinel=True)
+                lookup = meta["lookup"]
+                mapping = np.empty(len(uniques), dtype="int32")
+                for i, u in enumerate(uniques):
+                    u = str(u)
+                    if u not in lookup:
+                        lookup[u] = len(meta["categories"])
+                        meta["categories"].append(u)
+                    mapping[i] = lookup[u]
+                arr = np.where(codes >= 0, mapping[codes] if len(mapping) else -1, -1).astype("int32")
+            arr.tofile(self.files[name])
+
+        self.rows += len(chunk)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        meta = {
+            "rows": self.rows,
+            "columns": {
+                name: {k: v for k, v in m.items() if k != "lookup"}
+                for name, m in self.columns.items()
+            }
+        }
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+
+def _open_entry(entry_dir):
+    """
+    Returns (rows, {column: (memmap, categories)}) of a cache entry or None.
+    """
+    meta_path = os.path.join(entry_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    rows = meta["rows"]
+    columns = {}
+    for name, m in meta["columns"].items():
+        path = os.path.join(entry_dir, f"{m['index']}.bin")
+        if rows:
+            arr = np.memmap(path, dtype=m["dtype"], mode="r", shape=(rows,))
+        else:
+            arr = np.empty(0, dtype=m["dtype"])
+        columns[name] = (arr, m["categories"] if m["kind"] == "dict" else None)
+    return rows, columns
+
+
+def _frame(columns, start, stop):
+    data = {}
+    for name, (arr, categories) in columns.items():
+        part = np.array(arr[start:stop])
+        if categories is None:
+            data[name] = part
+        else:
+            data[name] = pd.Categorical.from_codes(part, categories)
+    return pd.DataFrame(data)
+
+
+def cached_chunks(file_path, namespace, parse_chunks, chunksize=200_000, cache_dir=None, content_hash=False):
+    """
+    Yields the parsed content of `file_path` as DataFrame chunks, going through
+    the columnar cache.
+
+    On a cache hit the chunks are sliced from memory-mapped column files, so no
+    text is parsed. On a miss `parse_chunks(file_path)` is consumed (it must
+    return an iterable of DataFrames) and every chunk is written to the cache
+    while being yielded; the entry becomes visible only once complete.
+
+    Args:
+        file_path (str): Raw file to read
+        namespace (str): Identifier of the parser and its options
+        parse_chunks (callable): Parser used on a cache miss
+        chunksize (int): Rows per chunk yielded on a cache hit
+        cache_dir (str): Cache folder (default: CACHE_DIR_NAME next to the file)
+        content_hash (bool): Key on the file content instead of its mtime
+    """
+    cache_dir, entry_dir = _entry_dir(file_path, namespace, cache_dir, content_hash)
+
+    entry = _open_entry(entry_dir)
+    if entry is not None:
+        rows, columns = entry
+        if rows == 0:
+            yield _frame(columns, 0, 0)
+        for start in range(0, rows, chunksize):
+            yield _frame(columns, start, min(start + chunksize, rows))
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    writer = _ColumnWriter(tmp_dir)
+    try:
+        for chunk in parse_chunks(file_path):
+            writer.write(chunk)
+            yield chunk
+        writer.close()
+    except BaseException:
+        writer.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Drop stale entries of the same file/parser, then publish the new one
+    prefix = _entry_prefix(file_path, namespace)
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and os.path.join(cache_dir, name) != entry_dir:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    try:
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        # Another process published the same entry in the meantime
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def cached_frame(file_path, namespace, parse, cache_dir=None, content_hash=False):
+    """
+    Returns the whole parsed file as a single DataFrame, going through the
+    columnar cache. `parse(file_path)` must return a DataFrame.
+    """
+    chunks = list(cached_chunks(file_path, namespace, lambda p: [parse(p)],
+                                chunksize=2**62, cache_dir=cache_dir, content_hash=content_hash))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
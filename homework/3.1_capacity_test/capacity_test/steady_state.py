@@ -0,0 +1,161 @@
+"""Steady-state window of a run with the MSER-5 truncation rule.
+
+The per-second series of a JMeter run starts with a warm-up (threads
+ramping up, cold caches) and may end with a ramp-down, and both bias the
+capacity figures of the whole run. MSER-5 (Marginal Standard Error Rule on
+batch means of 5 observations) drops the first d batches that minimize
+
+    MSER(d) = sum_{i>d} (Y_i - mean_{i>d}(Y))^2 / (k - d)^2
+
+over d <= k / 2, i.e. the truncation after which the mean of the rest is
+known with the smallest standard error. With suffix sums of Y and Y^2 every
+d is evaluated in O(1), so the rule is O(n).
+
+The truncation is limited to the ramp-up of the test plan plus
+RAMP_MARGIN_BATCHES batches, and the partial first and last bins of the run
+are left out.
+
+Usage:
+    python steady_state.py jmeter/3800_CTT_1.csv
+    python steady_state.py jmeter/*.csv --bin-sec 2 --batch 5 --ramp 25
+"""
+
+import os
+import math
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Batches past the end of the ramp-up MSER may still drop (cold caches,
+# threads started at the end of the ramp-up still warming up)
+RAMP_MARGIN_BATCHES = 2
+
+
+def mser_truncation(series, batch=5, max_truncation=None):
+    """
+    Number of leading observations MSER-`batch` drops from `series`.
+
+    Args:
+        series (array): Observations in time order (NaN not allowed)
+        batch (int): Observations per batch mean (5 for MSER-5)
+        max_truncation (int): Largest truncation allowed, in observations
+                              (None: half the series, as in plain MSER)
+
+    Returns:
+        int: Truncation point, a multiple of `batch` (0 on fewer than 2 batches)
+    """
+    y = np.asarray(series, dtype=np.float64)
+    k = len(y) // batch
+    if k < 2:
+        return 0
+    means = y[:k * batch].reshape(k, batch).mean(axis=1)
+
+    # Suffix sums: s1[d], s2[d] are the sums of the batch means after d batches
+    s1 = np.cumsum(means[::-1])[::-1]
+    s2 = np.cumsum((means ** 2)[::-1])[::-1]
+    d_max = k // 2 if max_truncation is None else min(k // 2, int(max_truncation) // batch)
+    d = np.arange(d_max + 1)
+    n = k - d
+    sse = np.maximum(s2[d] - s1[d] ** 2 / n, 0)
+    return int(np.argmin(sse / n ** 2)) * batch
+
+
+def steady_state_window(series, batch=5, max_truncation=None):
+    """
+    Steady-state slice [start, end) of a binned run: the partial first and
+    last bins left out, then the warm-up dropped by MSER-`batch`, at most
+    `max_truncation` bins.
+    """
+    y = np.nan_to_num(np.asarray(series, dtype=np.float64))
+    if len(y) <= 2:
+        return 0, len(y)
+    return 1 + mser_truncation(y[1:-1], batch, max_truncation), len(y) - 1
+
+
+def steady_state_summary(per_second, bin_sec=1, batch=5, ramp_sec=None):
+    """
+    Capacity metrics of the steady-state window of a run.
+
+    The window is detected on the throughput series, the warm-up cut at most
+    RAMP_MARGIN_BATCHES batches after the ramp-up; throughput, mean response
+    time and power are then computed on the bins inside it, with the same
+    definitions as the whole-run metrics.
+
+    Args:
+        per_second (DataFrame): Binned run (total_ok, avg_response_time_ms per
+                                bin), as returned by JtlAccumulator.per_second
+        bin_sec (float): Length of a bin in seconds
+        batch (int): Bins per batch mean of MSER
+        ramp_sec (float): Ramp-up of the test plan in seconds (None: no limit
+                          other than half the run)
+
+    Returns:
+        dict: steady_start_sec, steady_end_sec (from the first bin),
+              steady_total_ok, steady_avg_response_time_ms, steady_throughput,
+              steady_power
+    """
+    if per_second.empty:
+        start = end = 0
+    else:
+        max_truncation = None if ramp_sec is None else math.ceil(ramp_sec / bin_sec) + RAMP_MARGIN_BATCHES * batch
+        start, end = steady_state_window(per_second["throughput"].to_numpy(), batch, max_truncation)
+    window = per_second.iloc[start:end]
+
+    total_ok = int(window["total_ok"].sum()) if len(window) else 0
+    elapsed_sum = float((window["avg_response_time_ms"].fillna(0) * window["total_ok"]).sum()) if len(window) else 0.0
+    duration = (end - start) * bin_sec
+    avg_response_time = elapsed_sum / total_ok if total_ok else float("nan")
+    throughput = total_ok / duration if duration > 0 else float("nan")
+    power = throughput / (avg_response_time / 1000) if avg_response_time > 0 else float("nan")
+
+    return {
+        "steady_start_sec": start * bin_sec,
+        "steady_end_sec": end * bin_sec,
+        "steady_total_ok": total_ok,
+        "steady_avg_response_time_ms": avg_response_time,
+        "steady_throughput": throughput,
+        "steady_power": power
+    }
+
+
+def plan_ramp_time(jmx_path=None):
+    """
+    Longest ramp-up (seconds) of the thread groups of a test plan, None when
+    the plan does not exist (default: test_plan_capacity.jmx next to this file).
+    """
+    # Imported here: the test plan parser comes with the load generator
+    from load_generator import parse_jmx
+
+    if jmx_path is None:
+        jmx_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_plan_capacity.jmx")
+    if not os.path.exists(jmx_path):
+        return None
+    return max((group.ramp_time for group in parse_jmx(jmx_path)), default=None)
+
+
+def main(argv=None):
+    # Imported here: jtl_reader uses this module for JtlAccumulator.steady_summary
+    from jtl_reader import read_jtl_stats
+
+    parser = argparse.ArgumentParser(description="Steady-state window (MSER) and capacity metrics of JMeter runs")
+    parser.add_argument("jtl", nargs="+", help="JMeter result files")
+    parser.add_argument("--bin-sec", type=float, default=1, help="Length of the bins in seconds (default: 1)")
+    parser.add_argument("--batch", type=int, default=5, help="Bins per batch mean (default: 5, MSER-5)")
+    parser.add_argument("--ramp", type=float, default=None,
+                        help="Ramp-up in seconds (default: the one of test_plan_capacity.jmx, if any)")
+    args = parser.parse_args(argv)
+
+    ramp_sec = args.ramp if args.ramp is not None else plan_ramp_time()
+    rows = []
+    for path in args.jtl:
+        stats = read_jtl_stats(path, bin_sec=args.bin_sec)
+        run = stats.summary()
+        steady = stats.steady_summary(args.batch, ramp_sec)
+        rows.append({"file": os.path.basename(path), "duration_sec": run["duration_sec"],
+                     "throughput": run["throughput"], "avg_response_time_ms": run["avg_response_time_ms"], **steady})
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,15 @@ import glob
 import os
 import matplotlib.pyplot as plt
 from common import plot_metrics
+from result_cache import cached_frame
+from vmstat_parser import read_vmstat
+from ingest import process_glob
 
 def process_csv(file_path):
-    df = pd.read_csv(file_path,  sep="\\s+", skiprows=1)
+    # Parsed vmstat files are reused from the columnar cache on later runs
+    df = cached_frame(file_path, "vmstat-raw", read_vmstat)
 
-    averages = df.mean().to_dict()
+    averages = df.mean(numeric_only=True).to_dict()
 
     # Add filename as column
     averages["file"] = os.path.basename(file_path)
@@ -94,12 +98,8 @@ if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
     vmstat = os.path.join(script_dir, "vmstat")
 
-    csv_files = glob.glob(os.path.join(vmstat, "*.csv"))
-
-    results = []
-    for file in csv_files:
-        metrics = process_csv(file)
-        results.append(metrics)
+    # Files are processed in parallel, results keep the sorted file order
+    results, failures = process_glob(process_csv, os.path.join(vmstat, "*.csv"))
 
     # Save results into a summary CSV
     results_df = pd.DataFrame(results)
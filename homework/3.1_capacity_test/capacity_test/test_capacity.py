@@ -1,39 +1,117 @@
 import pandas as pd
 import glob
 import os
+import re
+import sys
+import argparse
+from functools import partial
 import matplotlib.pyplot as plt
 from common import plot_metrics
+from jtl_reader import read_jtl_stats, read_jtl_histograms, BREAKDOWN_METRICS
+from latency_histogram import PERCENTILES, percentile_key
+from ingest import process_glob
+from jtl_follow import follow
+from steady_state import plan_ramp_time
 
-def process_csv(file_path):
-    # Read CSV file
-    df = pd.read_csv(file_path)
+# Label of the rows of the percentiles summary holding every label
+ALL_LABELS = "ALL"
 
-    # Total requests correctly served
-    total_ok = df[df['responseMessage'] == "OK"].shape[0]
-    total_nok = df[df['responseMessage'] != "OK"].shape[0]
-    
-    df = df[df["responseMessage"] == "OK"]
+def process_csv(file_path, bin_sec=1, ramp_sec=None, steady_state=False):
+    # Stream the JTL file in chunks: single pass, bounded memory. The CTT of
+    # the run (file name prefix, e.g. 1200_CTT_1.csv) gives the expected
+    # interval of the coordinated omission correction
+    m = re.match(r"(\d+)_CTT", os.path.basename(file_path))
+    stats = read_jtl_stats(file_path, ctt=float(m.group(1)) if m else None, bin_sec=bin_sec)
 
-    duration = (df['timeStamp'].max() - df['timeStamp'].min()) / 1000
-
-    avg_response_time = df['elapsed'].mean()    
-    
-    throughput = total_ok / duration
-    
-    power = throughput / (avg_response_time / 1000)
+    # The per-label/per-class breakdown and the percentiles cover the same
+    # window as the capacities: the steady-state one with steady_state (the
+    # histograms filled again on it), the whole run otherwise
+    steady = stats.steady_summary(ramp_sec=ramp_sec)
+    window = (steady["steady_start_sec"], steady["steady_end_sec"]) if steady_state else None
+    histogram, label_histograms = stats.histogram, stats.label_histograms
+    if window is not None:
+        histogram, label_histograms = read_jtl_histograms(file_path, *stats.window_ms(window))
 
+    # The latency histograms, the per-label/per-class breakdown and the
+    # per-second series go back with the summary, to be combined per CTT
     return {
         "file": os.path.basename(file_path),
-        "total_ok": total_ok,
-        "total_nok": total_nok,
-        "duration_sec": duration,
-        "avg_response_time_ms": avg_response_time,
-        "throughput": throughput,
-        "power": power
+        **stats.summary(),
+        **steady,
+        "per_second": stats.per_second(),
+        "histograms": {ALL_LABELS: histogram, **label_histograms},
+        "labels": stats.label_summary(window),
+        "classes": stats.class_summary(window)
     }
 
 
-def process_summary(summary_file="summary_results.csv"):
+def process_percentiles(histograms, summary_file="summary_results.csv"):
+    """
+    Merges the latency histograms of the replications of each CTT (exactly,
+    by adding their counts) and writes the percentiles per CTT and label.
+
+    Args:
+        histograms (dict): file name -> {label: LatencyHistogram} as returned
+                           by process_csv (ALL_LABELS for the whole file)
+        summary_file (str): Summary the output name is derived from
+
+    Returns:
+        DataFrame: One row per CTT group and label (group, label, samples and
+                   the percentile columns)
+    """
+    merged = {}
+    for file, by_label in histograms.items():
+        group = re.sub(r"_\d+\.csv$", "", file)
+        for label, hist in by_label.items():
+            if (group, label) in merged:
+                merged[(group, label)].merge(hist)
+            else:
+                merged[(group, label)] = hist.copy()
+
+    rows = [{"group": group, "label": label, "samples": hist.count, **hist.summary()}
+            for (group, label), hist in merged.items()]
+    percentiles = pd.DataFrame(rows)
+
+    output_file = os.path.splitext(summary_file)[0] + "_percentiles.csv"
+    percentiles.to_csv(output_file, index=False)
+
+    print(f"✅ Percentiles per CTT and label written to: {output_file}")
+    return percentiles
+
+
+def process_breakdown(labels, classes, summary_file="summary_results.csv"):
+    """
+    Writes the per-label metrics of every file and averages the per-label and
+    per-weight-class metrics of the replications of each CTT.
+
+    Args:
+        labels (dict): file name -> label_summary() DataFrame, as returned by process_csv
+        classes (dict): file name -> class_summary() DataFrame, as returned by process_csv
+        summary_file (str): Summary the output names are derived from
+
+    Returns:
+        tuple: (per-label, per-class) DataFrames with one row per CTT group and
+               label / weight class, BREAKDOWN_METRICS averaged
+    """
+    base = os.path.splitext(summary_file)[0]
+    grouped = []
+    for name, per_file, key in (("labels", labels, "label"), ("classes", classes, "weight_class")):
+        df = pd.concat([frame.assign(file=file) for file, frame in per_file.items()], ignore_index=True)
+        df["group"] = df["file"].str.replace(r"_\d+\.csv$", "", regex=True)
+        if name == "labels":
+            df[["file", "label", "weight_class"] + BREAKDOWN_METRICS].to_csv(f"{base}_labels.csv", index=False)
+
+        # Categorical keys: the groupby works on integer codes
+        df[key] = df[key].astype("category")
+        averaged = df.groupby(["group", key], observed=True)[BREAKDOWN_METRICS].mean().reset_index()
+        averaged.to_csv(f"{base}_{name}_grouped.csv", index=False)
+        grouped.append(averaged)
+
+    print(f"✅ Per-label and per-class summaries written to: {base}_labels*.csv, {base}_classes_grouped.csv")
+    return tuple(grouped)
+
+
+def process_summary(summary_file="summary_results.csv", percentiles=None, classes=None):
     # Read the summary file
     df = pd.read_csv(summary_file)
 
@@ -44,11 +122,27 @@ def process_summary(summary_file="summary_results.csv"):
     df["group"] = df["file"].str.replace(r"_\d+\.csv$", "", regex=True)
 
     # Group by prefix and average values
-    grouped = df.groupby("group").agg({
+    metrics = {
         "avg_response_time_ms": "mean",
         "throughput": "mean",
         "power": "mean"
-    }).reset_index()
+    }
+    for col in ("avg_corrected_response_time_ms", "steady_avg_response_time_ms", "steady_throughput", "steady_power"):
+        if col in df.columns:
+            metrics[col] = "mean"
+    grouped = df.groupby("group").agg(metrics).reset_index()
+
+    # Percentiles do not average: they come from the merged histograms
+    if percentiles is not None:
+        grouped = grouped.merge(percentiles[percentiles["label"] == ALL_LABELS].drop(columns=["label", "samples"]),
+                                on="group", how="left")
+
+    # One column per weight class and metric, e.g. throughput_heavy
+    if classes is not None:
+        wide = classes.pivot(index="group", columns="weight_class",
+                             values=["avg_response_time_ms", "throughput", "bytes_per_sec", "power"])
+        wide.columns = [f"{metric}_{cls}" for metric, cls in wide.columns]
+        grouped = grouped.merge(wide.reset_index(), on="group", how="left")
 
     # Save the grouped summary
     output_file = os.path.splitext(summary_file)[0] + "_grouped.csv"
@@ -58,8 +152,31 @@ def process_summary(summary_file="summary_results.csv"):
     return grouped
 
 
-def plot_grouped_summary(grouped_df, output_prefix="summary_plot"):
+def process_per_second(per_second, summary_file="summary_results.csv"):
+    # One row per file and bin, seconds counted from the first bin of the file
+    df = pd.concat([series.assign(file=file, second=(series["time"] - series["time"].iloc[0]).dt.total_seconds())
+                    for file, series in per_second.items() if not series.empty], ignore_index=True)
+    output_file = os.path.splitext(summary_file)[0] + "_per_second.csv"
+    df[["file", "second", "time", "total_ok", "total_nok", "throughput", "avg_response_time_ms"]].to_csv(
+        output_file, index=False)
+
+    print(f"✅ Per-second series written to: {output_file}")
+    return df
+
+
+def plot_grouped_summary(grouped_df, output_prefix="summary_plot", steady_state=False):
     plot_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plot")
+
+    # Capacity on the steady-state window of the runs (warm-up and partial
+    # bins left out, see steady_state.py); the whole-run values are kept aside
+    if steady_state and "steady_power" in grouped_df.columns:
+        grouped_df = grouped_df.assign(
+            run_throughput=grouped_df["throughput"],
+            run_avg_response_time_ms=grouped_df["avg_response_time_ms"],
+            throughput=grouped_df["steady_throughput"],
+            avg_response_time_ms=grouped_df["steady_avg_response_time_ms"],
+            power=grouped_df["steady_power"]
+        )
     
     # Extract numeric prefix from group name for sorting (e.g., "150_CTT" -> 150)
     grouped_df["prefix"] = grouped_df["group"].str.extract(r"^(\d+)")
@@ -126,44 +243,112 @@ def plot_grouped_summary(grouped_df, output_prefix="summary_plot"):
     print(f"  - Power: {usable_power:.4f}")
     print(f"  - Throughput: {usable_throughput:.2f} req/s")
     print(f"  - Avg Response Time: {usable_response_time:.2f} ms")
+
+    # Knee Capacity di ogni classe di peso: la prima a saturare e' quella col CTT piu' basso
+    classes = [c[len("power_"):] for c in grouped_df.columns if c.startswith("power_")]
+    if classes:
+        print(f"\nKnee Capacity per classe di peso:")
+        for cls in classes:
+            idx = grouped_df[f"power_{cls}"].idxmax()
+            print(f"  - {cls}: CTT {grouped_df.loc[idx, 'prefix']:.0f}, "
+                  f"{grouped_df.loc[idx, f'throughput_{cls}']:.2f} req/s, "
+                  f"{grouped_df.loc[idx, f'bytes_per_sec_{cls}'] / 1e6:.2f} MB/s, "
+                  f"{grouped_df.loc[idx, f'avg_response_time_ms_{cls}']:.2f} ms")
     print("="*60 + "\n")
 
     # --- Plot Average Response Time ---
     plot_metrics(grouped_df, "avg_response_time_ms", plot_dir, f"{output_prefix}_avg_response_time", "CTT", "Avg [ms]", "Response Time", axvline_x=knee_capacity, axvline_x2=usable_capacity_actual)
 
+    # --- Plot Response Time, measured vs corrected for coordinated omission ---
+    if "avg_corrected_response_time_ms" in grouped_df.columns and grouped_df["avg_corrected_response_time_ms"].notna().any():
+        plot_metrics(grouped_df, ["avg_response_time_ms", "avg_corrected_response_time_ms"], plot_dir, f"{output_prefix}_avg_response_time_corrected", "CTT", "Avg [ms]", "Response Time (measured vs coordinated omission corrected)", legend=True, axvline_x=knee_capacity, axvline_x2=usable_capacity_actual)
+
+    # --- Plot Response Time percentiles ---
+    percentile_cols = [percentile_key(q) for q in PERCENTILES if percentile_key(q) in grouped_df.columns]
+    if percentile_cols:
+        plot_metrics(grouped_df, percentile_cols, plot_dir, f"{output_prefix}_response_time_percentiles", "CTT", "[ms]", "Response Time percentiles", legend=True, axvline_x=knee_capacity, axvline_x2=usable_capacity_actual)
+
     # --- Plot Throughput ---
     plot_metrics(grouped_df, "throughput", plot_dir, f"{output_prefix}_throughput", "CTT", "Avg [req/s]", "Throughput", axvline_x=knee_capacity, axvline_x2=usable_capacity_actual)
 
+    # --- Plot Throughput, whole run vs steady state ---
+    whole_col, steady_col = ("run_throughput", "throughput") if "run_throughput" in grouped_df.columns else ("throughput", "steady_throughput")
+    if steady_col in grouped_df.columns:
+        plot_metrics(grouped_df, [whole_col, steady_col], plot_dir, f"{output_prefix}_throughput_steady_state", "CTT", "Avg [req/s]", "Throughput (whole run vs steady state)", legend=True, axvline_x=knee_capacity, axvline_x2=usable_capacity_actual)
+
     # --- Plot Power ---
     plot_metrics(grouped_df, "power", plot_dir, f"{output_prefix}_power", "CTT", "Avg [req/s²]", "Power", axvline_x=knee_capacity, axvline_x2=usable_capacity_actual)
 
+    # --- Plot per weight class series ---
+    if classes:
+        for metric, y_label, title in (("avg_response_time_ms", "Avg [ms]", "Response Time"),
+                                       ("throughput", "Avg [req/s]", "Throughput"),
+                                       ("bytes_per_sec", "Avg [B/s]", "Bytes/s"),
+                                       ("power", "Avg [req/s²]", "Power")):
+            plot_metrics(grouped_df, [f"{metric}_{cls}" for cls in classes], plot_dir, f"{output_prefix}_{metric}_per_class", "CTT", y_label, f"{title} per weight class", legend=True, axvline_x=knee_capacity, axvline_x2=usable_capacity_actual)
+
     print(f"✅ Line plots saved in {plot_dir}/")
     
     return knee_capacity, usable_capacity_actual
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Capacity test analysis of the JMeter result files")
+    parser.add_argument("--follow", metavar="JTL", default=None,
+                        help="Tail a JTL file while JMeter writes it and print live sliding-window metrics")
+    parser.add_argument("--window", type=int, default=30,
+                        help="Sliding window length in seconds for --follow (default: 30)")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="Refresh interval in seconds for --follow (default: 1)")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="Stop --follow once the file has not grown for this many seconds")
+    parser.add_argument("--bin-sec", type=float, default=1,
+                        help="Length in seconds of the bins of the per-second series (default: 1)")
+    parser.add_argument("--steady-state", action="store_true",
+                        help="Compute the capacities on the steady-state window of the runs instead of the whole runs")
+    parser.add_argument("--ramp", type=float, default=None,
+                        help="Ramp-up in seconds limiting the warm-up cut (default: the one of test_plan_capacity.jmx)")
+    args = parser.parse_args()
+
+    if args.follow:
+        # Live mode: no summary/plots, just the metrics of the running test
+        follow(args.follow, args.window, args.interval, args.idle_timeout)
+        sys.exit(0)
+
     # Get absolute path to the directory of this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     jmeter_dir = os.path.join(script_dir, "jmeter")
     
-    csv_files = glob.glob(os.path.join(jmeter_dir, "*.csv"))
-    print(f"Found {len(csv_files)} CSV files in jmeter directory")
-
-    results = []
-    for file in csv_files:
-        metrics = process_csv(file)
-        results.append(metrics)
+    # Files are processed in parallel, results keep the sorted file order
+    # The steady-state window never starts much after the ramp-up of the plan
+    ramp_sec = args.ramp if args.ramp is not None else plan_ramp_time()
+    results, failures = process_glob(partial(process_csv, bin_sec=args.bin_sec, ramp_sec=ramp_sec,
+                                             steady_state=args.steady_state),
+                                     os.path.join(jmeter_dir, "*.csv"))
+    print(f"Processed {len(results)} CSV files in jmeter directory")
 
     # Save results into a summary CSV in the script directory
     summary_path = os.path.join(script_dir, "summary_results.csv")
+    histograms = {r["file"]: r.pop("histograms") for r in results}
+    labels = {r["file"]: r.pop("labels") for r in results}
+    classes = {r["file"]: r.pop("classes") for r in results}
+    per_second = {r["file"]: r.pop("per_second") for r in results}
     results_df = pd.DataFrame(results)
     results_df.to_csv(summary_path, index=False)
 
     print(f"✅ Summary written to {summary_path}")
-    
+
+    # Throughput and response time series of every run
+    process_per_second(per_second, summary_path)
+
+    # Percentiles per CTT and label from the merged histograms of the repetitions
+    percentiles = process_percentiles(histograms, summary_path)
+
+    # Metrics per label and per page weight class, averaged per CTT
+    _, class_summary = process_breakdown(labels, classes, summary_path)
+
     # Process summary and group by CTT values (averaging the 3 repetitions)
-    to_plot = process_summary(summary_path)
+    to_plot = process_summary(summary_path, percentiles, class_summary)
     
     # Plot and calculate capacities
-    knee_capacity, usable_capacity = plot_grouped_summary(to_plot)
+    knee_capacity, usable_capacity = plot_grouped_summary(to_plot, steady_state=args.steady_state)
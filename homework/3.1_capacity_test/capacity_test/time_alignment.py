@@ -0,0 +1,153 @@
+"""Per-second alignment of JMeter samples and vmstat samples.
+
+JMeter samples are binned per second on `timeStamp` while streaming the JTL
+file, then joined as-of with the vmstat rows, whose timestamps are either
+recorded (`vmstat -t`, proc_collector.py) or inferred from the start of the
+run and the sampling interval. The result has one row per second of the run
+with throughput, response time and resource usage side by side.
+
+Usage:
+    python time_alignment.py jmeter/3800_CTT_1.csv vmstat/stat_3800_1.csv
+    python time_alignment.py jmeter/3800_CTT_1.csv vmstat/stat_3800_1.csv --out merged.csv --plot
+"""
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from jtl_reader import read_jtl_stats
+from vmstat_parser import read_vmstat
+
+
+def bin_jtl_per_second(file_path, bin_sec=1):
+    """
+    Bins the samples of a JTL file per `bin_sec` seconds of `timeStamp`.
+
+    The file is streamed: each chunk is reduced with bincount to per-bin sums,
+    so memory depends on the length of the run, not on the number of samples.
+
+    Returns:
+        DataFrame: One row per bin (empty bins included) with columns time,
+                   total_ok, total_nok, throughput, avg_response_time_ms.
+    """
+    return read_jtl_stats(file_path, bin_sec=bin_sec).per_second()
+
+
+def vmstat_timeline(file_path, start=None, interval=1.0, offset_sec=0.0):
+    """
+    Reads a vmstat capture and gives every row a timestamp.
+
+    Recorded timestamps (`vmstat -t`) are used when present, shifted by
+    `offset_sec` (e.g. to convert local time to UTC). Otherwise row i is placed
+    at `start` + i * `interval`; the first row, which vmstat computes since
+    boot and not over an interval, is dropped in that case.
+
+    Args:
+        file_path (str): vmstat capture
+        start (Timestamp): Start of the capture, required without timestamps
+        interval (float): vmstat sampling interval in seconds
+        offset_sec (float): Shift applied to the timestamps
+
+    Returns:
+        DataFrame: vmstat columns plus a datetime `time` column, sorted by time
+    """
+    df = read_vmstat(file_path)
+    if "time" not in df.columns:
+        if start is None:
+            raise ValueError(f"{os.path.basename(file_path)} has no timestamps: a start time is required")
+        df["time"] = pd.Timestamp(start) + pd.to_timedelta(np.arange(len(df)) * interval, unit="s")
+        df = df.iloc[1:]
+    df["time"] = pd.to_datetime(df["time"]).astype("datetime64[ns]") + pd.Timedelta(seconds=offset_sec)
+    return df.sort_values("time").reset_index(drop=True)
+
+
+def align_run(jtl_path, vmstat_path, bin_sec=1, interval=1.0, vmstat_start=None, offset_sec=0.0, tolerance=None):
+    """
+    Per-second merged frame of a JMeter run and the vmstat capture taken
+    during it.
+
+    When the vmstat capture has no timestamps it is assumed to start together
+    with the run (first JMeter sample) unless `vmstat_start` is given. Each
+    JMeter bin is joined with the latest vmstat row not after it (as-of join),
+    as long as it is at most `tolerance` seconds old (default: one interval).
+
+    Returns:
+        DataFrame: JMeter per-second metrics and vmstat columns on the same rows
+    """
+    jmeter = bin_jtl_per_second(jtl_path, bin_sec)
+    if jmeter.empty:
+        return jmeter
+
+    start = vmstat_start if vmstat_start is not None else jmeter["time"].iloc[0]
+    vmstat = vmstat_timeline(vmstat_path, start, interval, offset_sec)
+
+    tol = pd.Timedelta(seconds=tolerance if tolerance is not None else max(interval, bin_sec))
+    merged = pd.merge_asof(jmeter, vmstat, on="time", direction="backward", tolerance=tol)
+    merged.insert(1, "second", (merged["time"] - merged["time"].iloc[0]).dt.total_seconds())
+    return merged
+
+
+def plot_timeline(merged, out_path, title=None):
+    """
+    Response time, throughput and run queue over the run, on a shared time
+    axis, to see when resource usage and latency degrade.
+    """
+    fig, axes = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+    x = merged["second"]
+
+    axes[0].plot(x, merged["avg_response_time_ms"], color="#e74c3c", linewidth=1)
+    axes[0].set_ylabel("Avg resp. time [ms]")
+    axes[1].plot(x, merged["throughput"], color="#3498db", linewidth=1)
+    axes[1].set_ylabel("Throughput [req/s]")
+    if "r" in merged.columns:
+        axes[2].plot(x, merged["r"], color="#2c3e50", linewidth=1, label="r (run queue)")
+    if "id" in merged.columns:
+        ax_cpu = axes[2].twinx()
+        ax_cpu.plot(x, merged["id"], color="#27ae60", linewidth=1, alpha=0.7, label="id (idle %)")
+        ax_cpu.set_ylabel("CPU idle [%]")
+    axes[2].set_ylabel("Run queue")
+    axes[2].set_xlabel("Time [s]")
+
+    for ax in axes:
+        ax.grid(True, linestyle="--", alpha=0.6)
+    if title:
+        axes[0].set_title(title)
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    plt.tight_layout()
+    plt.savefig(out_path)
+    plt.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-second join of a JMeter result file and a vmstat capture")
+    parser.add_argument("jtl", help="JMeter result file (JTL/CSV)")
+    parser.add_argument("vmstat", help="vmstat capture taken during the run")
+    parser.add_argument("--bin", type=float, default=1, help="JMeter bin width in seconds (default: 1)")
+    parser.add_argument("--interval", type=float, default=1.0, help="vmstat sampling interval in seconds (default: 1)")
+    parser.add_argument("--vmstat-start", default=None, help="Start time of a vmstat capture without timestamps (default: first JMeter sample)")
+    parser.add_argument("--offset", type=float, default=0.0, help="Seconds added to the vmstat timestamps (e.g. local time to UTC)")
+    parser.add_argument("--out", default=None, help="Output CSV (default: plot/timeline/<jtl>_timeline.csv)")
+    parser.add_argument("--plot", action="store_true", help="Also save a timeline plot next to the CSV")
+    args = parser.parse_args(argv)
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    name = os.path.splitext(os.path.basename(args.jtl))[0]
+    out_path = args.out or os.path.join(script_dir, "plot", "timeline", f"{name}_timeline.csv")
+
+    merged = align_run(args.jtl, args.vmstat, args.bin, args.interval, args.vmstat_start, args.offset)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    merged.to_csv(out_path, index=False)
+    print(f"✅ Per-second timeline ({len(merged)} rows) written to: {out_path}")
+
+    if args.plot:
+        plot_path = os.path.splitext(out_path)[0] + ".png"
+        plot_timeline(merged, plot_path, title=name)
+        print(f"✅ Timeline plot saved to: {plot_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Column names printed by `vmstat` (procps). `gu` only exists in recent
+# versions, `inact`/`active` only with `vmstat -a`.
+VMSTAT_COLUMNS = ["r", "b", "swpd", "free", "buff", "cache", "inact", "active",
+                  "si", "so", "bi", "bo", "in", "cs", "us", "sy", "id", "wa", "st", "gu"]
+
+# A data row starts with a number, every header line starts with a letter
+_DATA_LINE = re.compile(rb"^[ \t]*\d[^\n]*", re.MULTILINE)
+_HEADER_LINE = re.compile(rb"^[ \t]*r[ \t,]+b[ \t,][^\n]*", re.MULTILINE)
+_SEPARATORS = bytes.maketrans(b",-:", b"   ")
+
+
+def parse_vmstat(file_path):
+    """
+    Tokenizes the raw output of `vmstat` straight into NumPy arrays.
+
+    The group header ("procs ---memory--- ...") and the column header are
+    recognised wherever they appear, so captures with repeated headers are
+    fine. The columns are taken from the header, hence outputs with or without
+    `gu` (or with `-a`) are handled the same way. With `vmstat -t` the two
+    trailing date/time tokens of each row are returned as timestamps.
+    Comma-separated rewrites of the output are accepted too.
+
+    Args:
+        file_path (str): Path to the vmstat capture
+
+    Returns:
+        tuple: (columns, values, timestamps) where values is an int64 matrix
+               with one column per name in `columns` and timestamps is a
+               datetime64 array or None when the capture has no timestamps.
+    """
+    with open(file_path, "rb") as f:
+        raw = f.read().replace(b"\r", b"")
+
+    header = _HEADER_LINE.search(raw)
+    if header is None:
+        raise ValueError(f"No vmstat column header found in {file_path}")
+    tokens = header.group(0).replace(b",", b" ").split()
+    columns = [t.decode() for t in tokens if t.decode() in VMSTAT_COLUMNS]
+    # `vmstat -t` adds the timezone name to the header and "date time" to each row
+    has_time = len(columns) < len(tokens)
+
+    n_cols = len(columns)
+    # "YYYY-MM-DD hh:mm:ss" becomes six integer fields once '-' and ':' are blanked
+    width = n_cols + 6 if has_time else n_cols
+
+    rows = _DATA_LINE.findall(raw)
+    text = b" ".join(rows).translate(_SEPARATORS)
+
+    # Single C-level conversion of every data row, then a fixed-width reshape
+    cells = np.fromstring(text.decode("ascii"), dtype=np.int64, sep=" ") if rows else np.empty(0, dtype=np.int64)
+    if cells.size % width:
+        raise ValueError(f"Malformed vmstat rows in {file_path}: expected {width} fields per row")
+    cells = cells.reshape(-1, width)
+
+    values = cells[:, :n_cols]
+
+    timestamps = None
+    if has_time:
+        year, month, day, hour, minute, second = cells[:, n_cols:].T
+        timestamps = ((year - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+                      + (month - 1).astype("timedelta64[M]")).astype("datetime64[D]")
+        timestamps = (timestamps + (day - 1).astype("timedelta64[D]")
+                      + (hour * 3600 + minute * 60 + second).astype("timedelta64[s]"))
+
+    return columns, values, timestamps
+
+
+def read_vmstat(file_path):
+    """
+    Reads a raw vmstat capture into a DataFrame (one column per vmstat field,
+    plus a `time` column when the capture was taken with `vmstat -t`).
+    """
+    columns, values, timestamps = parse_vmstat(file_path)
+    df = pd.DataFrame(values, columns=columns)
+    if timestamps is not None:
+        df["time"] = timestamps
+    return df
@@ -1,28 +1,23 @@
 import pandas as pd
 import glob
 import os
+import sys
 import matplotlib.pyplot as plt
 
-def process_csv(file_path):
-    df = pd.read_csv(file_path)
-
-    total_ok = df[df['responseMessage'] == "OK"].shape[0]
-    total_nok = df[df['responseMessage'] != "OK"].shape[0]
-    
-    df = df[df["responseMessage"] == "OK"]
+# Shared JMeter result reader lives next to the capacity test scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "capacity_test"))
+from jtl_reader import read_jtl_stats
+from ingest import process_glob
 
-    duration = (df['timeStamp'].max() - df['timeStamp'].min()) / 1000
+def process_csv(file_path):
+    summary = read_jtl_stats(file_path, breakdown=False).summary()
 
-    avg_response_time = df['elapsed'].mean()    
-    
-    throughput = total_ok / duration
-    
     return {
         "file": os.path.basename(file_path),
-        "response_time_ms": avg_response_time,
-        "throughput": throughput,
-        "total_ok": total_ok,
-        "total_nok": total_nok
+        "response_time_ms": summary["avg_response_time_ms"],
+        "throughput": summary["throughput"],
+        "total_ok": summary["total_ok"],
+        "total_nok": summary["total_nok"]
     }
 
 
@@ -75,12 +70,8 @@ if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
     summary_dir = os.path.join(script_dir, "summary")
     
-    csv_files = glob.glob(os.path.join(summary_dir, "*.csv"))
-
-    results = []
-    for file in csv_files:
-        metrics = process_csv(file)
-        results.append(metrics)
+    # Files are processed in parallel, results keep the sorted file order
+    results, failures = process_glob(process_csv, os.path.join(summary_dir, "*.csv"))
 
     results_df = pd.DataFrame(results)
     results_df.to_csv(os.path.join(script_dir, "avg.csv"), index=False)
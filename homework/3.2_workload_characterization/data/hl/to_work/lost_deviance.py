@@ -1,7 +1,12 @@
 import os
 import pandas as pd
+import sys
 import numpy as np
 
+# JMP export reader shared with the PCA/clustering homework
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "2_pca_clustering"))
+from jmp_csv import read_jmp_csv
+
 
 PCA_COLS = ["Principale1", "Principale2", "Principale3", "Principale4", "Principale5"]
 UNUSED_COLS = ["responseCode", "responseMessage", "threadName", "dataType", "success", "failureMessage", "URL", "timeStamp", "label", "Cluster"]
@@ -11,10 +16,9 @@ def deviance_lost_after_pca(csv_path):
     Returns:
         deviance_lost, deviance_retained
     """
-    # Try to read CSV using comma as field separator and comma as decimal
-    # inside quoted numeric fields (European format). Use skipinitialspace
-    # to tolerate a space after delimiters.
-    df = pd.read_csv(csv_path, sep=',', quotechar='"', decimal=',', skipinitialspace=True, engine='c')
+    # Delimiter and decimal convention (e.g. comma decimal inside quoted
+    # fields) are detected once, numeric columns are converted in bulk
+    df = read_jmp_csv(csv_path)
 
     # If a Cluster column exists, drop rows without a cluster (NaN or empty string)
     if 'Cluster' in df.columns:
@@ -25,15 +29,6 @@ def deviance_lost_after_pca(csv_path):
     # Clean column names (strip whitespace and remove stray apostrophes)
     df.columns = df.columns.str.strip().str.replace("'", "")
 
-    # Ensure PCA columns are numeric; some imports may still produce strings
-    # (if quoting/decimal detection failed). Coerce explicitly as a fallback.
-    for col in PCA_COLS:
-        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
-            # Remove surrounding quotes, convert decimal comma to dot and coerce
-            s = df[col].astype(str).str.strip().str.replace('"', '').str.replace("'", "")
-            s = s.str.replace(',', '.', regex=False)
-            df[col] = pd.to_numeric(s, errors='coerce')
-
     # Select numeric columns after coercion
     numeric_cols = df.select_dtypes(include=["number"]).columns
 
@@ -83,9 +78,8 @@ def intracluster_deviance(csv_path: str):
               "total" contains the sum of all cluster deviances.
     """
 
-    # Load dataset. Expect comma-separated fields and comma decimal inside
-    # quoted numeric fields. Use skipinitialspace to tolerate spaces after commas.
-    df = pd.read_csv(csv_path, sep=',', quotechar='"', decimal=',', skipinitialspace=True, engine='c')
+    # Load dataset (delimiter and comma decimal separator are detected)
+    df = read_jmp_csv(csv_path)
 
     # Ensure "Cluster" column exists
     if "Cluster" not in df.columns:
@@ -162,7 +156,7 @@ if __name__ == "__main__":
             # Compute total PCA deviance to normalize intracluster total (matching previous logic)
             total_pca_deviance = 0
             try:
-                df_main = pd.read_csv(csv_file, sep=',', quotechar='"', decimal=',', skipinitialspace=True, engine='c')
+                df_main = read_jmp_csv(csv_file)
                 # If a Cluster column exists, drop rows without a cluster
                 if 'Cluster' in df_main.columns:
                     df_main = df_main[df_main['Cluster'].notna() & (df_main['Cluster'].astype(str).str.strip() != '')]
@@ -1,24 +1,35 @@
-﻿import pandas as pd
+﻿import os
+import sys
+
+# Shared JMeter result reader lives next to the capacity test scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "3.1_capacity_test", "capacity_test"))
+from jtl_reader import read_jtl_stats
 
 csv_path = "Test_results/Results/2400_CTT_Heavy_4.csv"
 
-df = pd.read_csv(csv_path)
+# Lettura in streaming (un solo passaggio, memoria costante)
+acc = read_jtl_stats(csv_path, breakdown=False)
+stats = acc.summary_all()
+# Percentili del response time delle richieste OK (istogramma HDR)
+percentiles = acc.histogram.summary()
 
 # 1) Response time medio (ms)
-avg_response_ms = df["elapsed"].mean()
+avg_response_ms = stats["avg_response_time_ms"]
 
 # 2) Latency media (ms)
-avg_latency_ms = df["Latency"].mean()
+avg_latency_ms = stats["avg_latency_ms"]
 
 # 3) Throughput (req/s)
-start_ts = df["timeStamp"].min()
-end_ts   = df["timeStamp"].max()
-
-test_duration_sec = (end_ts - start_ts) / 1000.0  # da ms a secondi
-num_samples = len(df)
+throughput_rps = stats["throughput"]
 
-throughput_rps = num_samples / test_duration_sec
-
-print(f"Response time medio: {avg_response_ms:.2f} ms")
+print(f"Response time medio: {avg_response_ms:.2f} ms (tutti i campioni)")
 print(f"Latency media:       {avg_latency_ms:.2f} ms")
 print(f"Throughput:          {throughput_rps:.2f} req/s")
+
+# Media, latency e throughput sono su tutti i campioni, i percentili solo sulle richieste OK
+print("Percentili del response time (solo richieste OK):")
+print(f"  p50:   {percentiles['p50_response_time_ms']:.0f} ms")
+print(f"  p95:   {percentiles['p95_response_time_ms']:.0f} ms")
+print(f"  p99:   {percentiles['p99_response_time_ms']:.0f} ms")
+print(f"  p99.9: {percentiles['p99.9_response_time_ms']:.0f} ms")
+print(f"  max:   {percentiles['max_response_time_ms']:.0f} ms")
@@ -0,0 +1,175 @@
+"""Online failure prediction of heap growth (software aging).
+
+vmres_theil_sen_all.py estimates the time to saturate the heap once, from a
+whole sheet. Here the (time, allocated heap) samples arrive one at a time, e.g.
+from a long-running JVM, and the Theil-Sen trend and the time to exhaustion
+are kept up to date over a sliding window of the most recent samples.
+
+The slope is refitted (theil_sen.py, O(n log n)) only after the window has
+changed by a fraction 1/`refit_fraction` of its size, so the amortized cost
+per sample is O(refit_fraction * log n); in between, every sample updates
+the predicted level and the remaining time with the current fit in O(1).
+
+Usage:
+    python aging_monitor.py ..\\homework_regression.xls --sheet VMres3 --window 86400
+    jstat -gc <pid> 60s | awk 'NR > 1 {print systime(), ($1+$2+$5+$7)*1024; fflush()}' | python aging_monitor.py -
+"""
+
+import sys
+import math
+import argparse
+from collections import deque, namedtuple
+
+import numpy as np
+
+from theil_sen import theilslopes
+from workbook_cache import load_sheet
+
+# Default heap limit, as in vmres_theil_sen_all.py
+LIMIT_1GB = 1 * 1024 * 1024 * 1024
+
+Prediction = namedtuple("Prediction", [
+    "time", "n", "slope", "low_slope", "high_slope", "level",
+    "time_to_exhaustion", "tte_min", "tte_max"
+])
+
+
+class HeapExhaustionPredictor:
+    """
+    Time to exhaustion of a growing resource, from a sliding window of samples.
+
+    The window keeps the samples of the last `window_sec` seconds and at most
+    `max_samples` of them (None: no limit). The remaining time and its bounds
+    use the Theil-Sen slope and its confidence interval, as the offline
+    analysis does: (limit - level) / slope, / high_slope and / low_slope.
+    """
+
+    def __init__(self, limit=LIMIT_1GB, window_sec=None, max_samples=None, alpha=0.95,
+                 refit_fraction=32, min_samples=10):
+        self.limit = limit
+        self.window_sec = window_sec
+        self.max_samples = max_samples
+        self.alpha = alpha
+        self.refit_fraction = refit_fraction
+        self.min_samples = max(min_samples, 2)
+        self.samples = deque()
+        self.changed = 0                # samples added or expired since the last fit
+        self.fit = None                 # (slope, intercept, low_slope, high_slope)
+        self.n_fits = 0
+
+    def _expire(self, now):
+        while self.window_sec is not None and self.samples and now - self.samples[0][0] > self.window_sec:
+            self.samples.popleft()
+            self.changed += 1
+        while self.max_samples is not None and len(self.samples) > self.max_samples:
+            self.samples.popleft()
+            self.changed += 1
+
+    def refit(self):
+        """Fits the trend on the current window (done automatically by `update`)."""
+        if len(self.samples) < self.min_samples:
+            return
+        t, y = np.array(self.samples, dtype=float).T
+        slope, intercept, low, high = theilslopes(y, t, self.alpha)
+        if not math.isnan(slope):
+            self.fit = (slope, intercept, low, high)
+        self.changed = 0
+        self.n_fits += 1
+
+    def update(self, t, value):
+        """
+        Adds a sample (time in seconds, resource usage) and returns the current
+        Prediction, or None while there are not enough samples for a fit.
+        """
+        if self.samples and t < self.samples[-1][0]:
+            raise ValueError(f"Samples must arrive in time order ({t} < {self.samples[-1][0]})")
+        self.samples.append((t, value))
+        self.changed += 1
+        self._expire(t)
+
+        if self.fit is None or self.changed * self.refit_fraction >= len(self.samples):
+            self.refit()
+        return self.prediction()
+
+    def prediction(self, t=None):
+        """Prediction at time `t` (default: the last sample) with the current fit."""
+        if self.fit is None:
+            return None
+        if t is None:
+            t = self.samples[-1][0]
+        slope, intercept, low, high = self.fit
+        level = intercept + slope * t
+        headroom = max(self.limit - level, 0.0)
+
+        tte = headroom / slope if slope > 0 else math.inf
+        tte_min = headroom / high if high > 0 else (0.0 if headroom == 0 else math.inf)
+        tte_max = headroom / low if low > 0 else math.inf
+        return Prediction(t, len(self.samples), slope, low, high, level, tte, tte_min, tte_max)
+
+
+def format_prediction(p):
+    def years(sec):
+        return "   inf" if math.isinf(sec) else f"{sec / (3600 * 24 * 365.25):6.2f}"
+
+    return (f"[t={p.time:>10.0f}s n={p.n:>6d}] slope={p.slope:10.4f} B/s "
+            f"[{p.low_slope:.4f}, {p.high_slope:.4f}]  heap={p.level / 2 ** 20:8.1f} MB  "
+            f"saturazione tra {years(p.time_to_exhaustion)} anni "
+            f"[{years(p.tte_min)}, {years(p.tte_max)}]")
+
+
+def _read_sheet(workbook, sheet):
+    df = load_sheet(workbook, sheet)
+    x_col = next(c for c in df.columns if "T" in c and "s" in c)
+    y_col = next(c for c in df.columns if "heap" in c.lower())
+    df = df[[x_col, y_col]].dropna()
+    return zip(df[x_col].to_numpy(dtype=float), df[y_col].to_numpy(dtype=float))
+
+
+def _read_stream(stream):
+    # "time value" per line, blanks or commas as separators; other lines are skipped
+    for line in stream:
+        fields = line.replace(",", " ").split()
+        try:
+            yield float(fields[0]), float(fields[1])
+        except (IndexError, ValueError):
+            continue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online time-to-exhaustion prediction of heap growth")
+    parser.add_argument("source", help="Workbook to replay (with --sheet) or - for 'time value' lines on stdin")
+    parser.add_argument("--sheet", default=None, help="Sheet of the workbook (e.g. VMres1)")
+    parser.add_argument("--limit", type=float, default=LIMIT_1GB, help="Resource limit (default: 1 GB in byte)")
+    parser.add_argument("--window", type=float, default=None, help="Sliding window in seconds (default: whole history)")
+    parser.add_argument("--max-samples", type=int, default=None, help="Maximum samples in the window")
+    parser.add_argument("--every", type=int, default=None,
+                        help="Print every N samples (default: 1 for stdin, 500 for a sheet)")
+    args = parser.parse_args(argv)
+
+    if args.source == "-":
+        samples = _read_stream(sys.stdin)
+        every = args.every or 1
+    else:
+        if args.sheet is None:
+            parser.error("--sheet is required to replay a workbook")
+        samples = _read_sheet(args.source, args.sheet)
+        every = args.every or 500
+
+    predictor = HeapExhaustionPredictor(args.limit, args.window, args.max_samples)
+    prediction = None
+    try:
+        for i, (t, value) in enumerate(samples, 1):
+            prediction = predictor.update(t, value)
+            if prediction is not None and i % every == 0:
+                print(format_prediction(prediction), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+    if prediction is not None:
+        predictor.refit()
+        print(f"\nFinale ({predictor.n_fits} fit):")
+        print(format_prediction(predictor.prediction()))
+
+
+if __name__ == "__main__":
+    main()
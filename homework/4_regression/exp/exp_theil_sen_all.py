@@ -1,7 +1,11 @@
 import numpy as np
 import pandas as pd
-from scipy.stats.mstats import theilslopes
 from tabulate import tabulate
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from workbook_cache import load_sheets
+from theil_sen import theilslopes
 
 def main():
     file_name = "..\\homework_regression.xls"
@@ -12,8 +16,7 @@ def main():
     x_column = "observation"
     y_column = ["nmail", "byte rec", "byte sent"]
 
-    df1 = pd.read_excel(file_name, sheet_name = sheet_name_1)
-    df2 = pd.read_excel(file_name, sheet_name = sheet_name_2)
+    df1, df2 = load_sheets(file_name, [sheet_name_1, sheet_name_2]).values()
 
     dfs = [df1, df2]
     sheet_names = [sheet_name_1, sheet_name_2]
@@ -1,14 +1,18 @@
 import pandas as pd
 import numpy as np
-from scipy.stats.mstats import theilslopes
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from workbook_cache import load_sheet
+from theil_sen import theilslopes
 
 # Configurazione
 file_name = "..\\homework_regression.xls"
 sheet = "EXP1"  # Cambia in "EXP2" per il secondo homework
 
 # Leggi dati
-df = pd.read_excel(file_name, sheet_name=sheet)
+df = load_sheet(file_name, sheet)
 
 # Variabili da analizzare
 variables = ["nmail", "byte rec", "byte sent"]
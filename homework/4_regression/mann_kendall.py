@@ -0,0 +1,118 @@
+"""Mann-Kendall trend test (Kendall tau-b) in O(n log n).
+
+Same statistics as reference/ktaub.m (tau, tau-b, S, sigma with the tie
+corrections of both the time index and the observations, Z with continuity
+correction, two-tailed p-value), without the n x n matrices of pair signs:
+S is computed with Knight's algorithm.
+
+- the points are sorted by (x, y), so the pairs tied in x are never discordant;
+- the discordant pairs are the inversions of y in that order;
+- S = n0 - n1 - n2 + n3 - 2 * discordant, where n0 is the number of pairs and
+  n1, n2, n3 those tied in x, in y and in both.
+
+Usage:
+    from mann_kendall import mann_kendall
+    taub, tau, h, p_value, z, s, sigma, n = mann_kendall(y, x, 0.05)
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from theil_sen import _count_inversions, _dense_rank
+
+MannKendallResult = namedtuple("MannKendallResult", ["taub", "tau", "h", "p_value", "z", "s", "sigma", "n"])
+
+
+def _tie_sums(sorted_values):
+    """Sums over the tie groups of t(t-1), t(t-1)(t-2) and t(t-1)(2t+5)."""
+    new = np.append(True, sorted_values[1:] != sorted_values[:-1])
+    t = np.diff(np.append(np.flatnonzero(new), len(sorted_values))).astype(np.float64)
+    return (t * (t - 1)).sum(), (t * (t - 1) * (t - 2)).sum(), (t * (t - 1) * (2 * t + 5)).sum()
+
+
+def mann_kendall(y, x=None, alpha=0.05, continuity=True):
+    """
+    Mann-Kendall test of a monotonic trend of y over x.
+
+    Args:
+        y (array): Observations
+        x (array): Time index (default: 0, 1, 2, ...); repeated values allowed
+        alpha (float): Significance level of the two-tailed test
+        continuity (bool): Continuity correction of S (ktaub.m); without it the
+                           p-value is the asymptotic one of scipy.stats.kendalltau
+
+    Returns:
+        MannKendallResult: (taub, tau, h, p_value, z, s, sigma, n) where h is
+            True when the trend is significant at `alpha` and n is the number of
+            points used (pairs with a NaN are dropped)
+    """
+    y = np.asarray(y, dtype=float).ravel()
+    x = np.arange(len(y), dtype=float) if x is None else np.asarray(x, dtype=float).ravel()
+    if len(x) != len(y):
+        raise ValueError(f"Incompatible lengths ! ({len(y)}<>{len(x)})")
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    n = len(x)
+    if n < 3:
+        raise ValueError("`x` and `y` must have length at least 3.")
+
+    order = np.lexsort((y, x))
+    x, y = x[order], y[order]
+
+    n0 = n * (n - 1) // 2
+    x_pairs, x_triples, x_var = _tie_sums(x)
+    y_pairs, y_triples, y_var = _tie_sums(np.sort(y))
+    same_point = np.append(True, (x[1:] != x[:-1]) | (y[1:] != y[:-1]))
+    t = np.diff(np.append(np.flatnonzero(same_point), n))
+    n1, n2, n3 = int(x_pairs) // 2, int(y_pairs) // 2, int((t * (t - 1)).sum()) // 2
+
+    discordant = _count_inversions(_dense_rank(y))
+    s = n0 - n1 - n2 + n3 - 2 * discordant
+
+    tau = s / n0
+    denominator = np.sqrt(float(n0 - n1) * float(n0 - n2))
+    taub = s / denominator if denominator > 0 else np.nan
+
+    # Variance with ties in the time index and in the observations
+    sigma = np.sqrt((n * (n - 1) * (2 * n + 5) - x_var - y_var) / 18
+                    + x_triples * y_triples / (9 * n * (n - 1) * (n - 2))
+                    + x_pairs * y_pairs / (2 * n * (n - 1)))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if continuity:
+            # As in ktaub.m: with S = 0 after the correction the p-value is
+            # computed for S = 1, as a p-value of 1 is not possible
+            s_corr = s - np.sign(s)
+            z = s_corr / sigma
+            p_value = 2 * norm.sf(abs(s_corr if s_corr != 0 else 1) / sigma)
+        else:
+            z = s / sigma
+            p_value = 2 * norm.sf(abs(z))
+
+    return MannKendallResult(float(taub), float(tau), bool(p_value < alpha), float(p_value),
+                             float(z), int(s), float(sigma), n)
+
+
+def mann_kendall_many(x, Y, alpha=0.05, continuity=True):
+    """
+    Mann-Kendall test of every column of Y against the same x.
+
+    Returns:
+        DataFrame: One row per column of Y (index: column names) with the
+                   fields of MannKendallResult; columns with fewer than 3
+                   points have NaN statistics.
+    """
+    if not isinstance(Y, pd.DataFrame):
+        Y = pd.DataFrame(np.asarray(Y, dtype=float).reshape(len(x), -1))
+    x = np.asarray(x, dtype=float)
+    rows = {}
+    for column in Y.columns:
+        y = Y[column].to_numpy(dtype=float)
+        if (~(np.isnan(x) | np.isnan(y))).sum() < 3:
+            rows[column] = (np.nan, np.nan, False, np.nan, np.nan, np.nan, np.nan, 0)
+        else:
+            rows[column] = tuple(mann_kendall(y, x, alpha, continuity))
+    return pd.DataFrame.from_dict(rows, orient="index", columns=MannKendallResult._fields)
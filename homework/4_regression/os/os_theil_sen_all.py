@@ -1,7 +1,12 @@
 import numpy as np
 import pandas as pd
-from scipy.stats.mstats import theilslopes
 from tabulate import tabulate
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from workbook_cache import load_sheets
+from theil_sen import theilslopes_many
+from mann_kendall import mann_kendall_many
 
 def main():
     file_name = "..\\homework_regression.xls"
@@ -13,9 +18,7 @@ def main():
     x_column = "TIME"
     
     # Leggi i dataframe
-    df1 = pd.read_excel(file_name, sheet_name = sheet_name_1)
-    df2 = pd.read_excel(file_name, sheet_name = sheet_name_2)
-    df3 = pd.read_excel(file_name, sheet_name = sheet_name_3)
+    df1, df2, df3 = load_sheets(file_name, [sheet_name_1, sheet_name_2, sheet_name_3]).values()
 
     dfs = [df1, df2, df3]
     sheet_names = [sheet_name_1, sheet_name_2, sheet_name_3]
@@ -26,6 +29,7 @@ def main():
     
     # Lista per raccogliere i risultati
     results = []
+    checks = []
     
     print(f"\n{'='*80}")
     print("ANALISI os1, os2, os3 - TABELLA RISULTATI THEIL-SEN")
@@ -39,23 +43,42 @@ def main():
         print(f"\n--- Analisi {sheet} ---")
         print(f"Metriche trovate: {', '.join(y_columns)}")
         
-        for element in y_columns:
-            # Crea un dataframe temporaneo e rimuovi righe con NaN
-            temp_df = df[[x_column, element]].dropna()
-            x = np.array(temp_df[x_column])
-            y = np.array(temp_df[element])
-            slope, intercept, low, up = theilslopes(y, x, 0.95)
+        # Tutte le metriche in una chiamata (le righe con NaN sono escluse per colonna)
+        fits = theilslopes_many(df[x_column], df[y_columns], 0.95)
+        # Mann-Kendall (tau-b) sulle stesse serie, p-value asintotico senza correzione di continuità
+        mk = mann_kendall_many(df[x_column], df[y_columns], 0.05, continuity=False)
+        
+        for element, fit in fits.iterrows():
+            slope, intercept, low, up = fit["slope"], fit["intercept"], fit["low_slope"], fit["high_slope"]
+            trend, trend_symbol = fit["trend"], fit["trend_symbol"]
             
-            # Determina il trend
-            if low <= 0 <= up:
-                trend = "Non significativo"
-                trend_symbol = "⚠️"
-            elif slope > 0:
-                trend = "Crescente"
-                trend_symbol = "↗"
+            # Confronto tra i due test
+            mk_signif = bool(mk.loc[element, "h"])
+            ts_signif = not (low <= 0 <= up)
+            if mk_signif and ts_signif:
+                if np.sign(mk.loc[element, "taub"]) == np.sign(slope):
+                    coherence, note = "✓ COERENTI", "Entrambi rilevano trend significativo"
+                else:
+                    coherence, note = "❌ DISCORDANTI", "Trend significativi di segno opposto"
+            elif not mk_signif and not ts_signif:
+                coherence, note = "✓ COERENTI", "Entrambi indicano trend non significativo"
+            elif mk_signif:
+                coherence, note = "⚠️  BORDERLINE", "MK significativo ma TS intervallo include 0"
             else:
-                trend = "Decrescente"
-                trend_symbol = "↘"
+                coherence, note = "⚠️  BORDERLINE", "TS significativo ma MK non significativo"
+            
+            checks.append({
+                "Sheet": sheet,
+                "Metric": element,
+                "MK_Tau": f"{mk.loc[element, 'taub']:.6f}",
+                "MK_p-value": f"{mk.loc[element, 'p_value']:.6f}",
+                "MK_Signif": "SÌ" if mk_signif else "NO",
+                "TS_Slope": f"{slope:.6f}",
+                "TS_Interval": f"[{low:.6f}, {up:.6f}]",
+                "TS_Signif": "SÌ" if ts_signif else "NO",
+                "Coherence": coherence,
+                "Note": note
+            })
             
             # Aggiungi ai risultati
             results.append({
@@ -114,6 +137,19 @@ def main():
                    headers=['Sheet', 'Metric', 'Slope', 'Interval (95%)', 'Trend'],
                    tablefmt='pipe'))
     
+    # Confronto Mann-Kendall / Theil-Sen
+    print(f"\n{'='*80}")
+    print("CONFRONTO MANN-KENDALL vs THEIL-SEN")
+    print(f"{'='*80}\n")
+    
+    df_checks = pd.DataFrame(checks)
+    print(tabulate(df_checks[['Sheet', 'Metric', 'MK_Tau', 'MK_p-value', 'TS_Slope', 'Coherence']],
+                   headers='keys', tablefmt='pipe', showindex=False, disable_numparse=True))
+    
+    check_file = "mann_kendall_vs_theil_sen_check.csv"
+    df_checks.to_csv(check_file, index=False)
+    print(f"\n✓ Tabella salvata in: {check_file}")
+    
     # CONFRONTO TRA DATASET (parte fondamentale)
     print(f"\n{'='*80}")
     print("CONFRONTO TRA OS1, OS2, OS3 PER TIPO DI METRICA")
@@ -1,8 +1,11 @@
 import sys
 import numpy as np
 import pandas as pd
-from scipy.stats.mstats import theilslopes
 import matplotlib.pyplot as plt
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from workbook_cache import load_sheets
+from theil_sen import theilslopes
 
 def main():
     file_name = "HomeWork_Regression_2024_v1.xlsx"
@@ -14,9 +17,7 @@ def main():
     x_column = "TIME"
     y_column = ["LIN_VmSize", "LIN_VmData", "LIN_RSS", "LIN_byte_letti__sec", "LIN_byte_scritti__sec"]
 
-    df1 = pd.read_excel(file_name, sheet_name = os1)
-    df2 = pd.read_excel(file_name, sheet_name = os2)
-    df3 = pd.read_excel(file_name, sheet_name = os3)
+    df1, df2, df3 = load_sheets(file_name, [os1, os2, os3]).values()
 
     dfs = [df1, df2, df3]
     i = 1
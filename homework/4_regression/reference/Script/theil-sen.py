@@ -1,15 +1,18 @@
 import sys
 import numpy as np
 import pandas as pd
-from scipy.stats.mstats import theilslopes
 import matplotlib.pyplot as plt
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from workbook_cache import load_sheet
+from theil_sen import theilslopes
 
 def main():
     file_name = "HomeWork_Regression_2024_v1.xlsx"
     spreed_sheet = "VMres3"
     x_column = "T(s)"
     y_column = "allocated heap"
-    df = pd.read_excel(file_name, sheet_name = spreed_sheet)
+    df = load_sheet(file_name, spreed_sheet)
     x = np.array(df[x_column])
     y = np.array(df[y_column])
     slope, intercept, low, up = theilslopes(y, x, 0.95)
@@ -0,0 +1,246 @@
+"""Bootstrap distribution of the time to saturate a resource.
+
+vmres_theil_sen_all.py gives the uncertainty of the saturation time as half
+the gap between (limit - intercept) / low_slope and / high_slope, for one
+limit. Here the whole distribution is estimated with a moving block
+bootstrap of the residuals of the Theil-Sen fit (blocks keep the
+autocorrelation of the series), for any number of limits at once.
+
+Refitting Theil-Sen from scratch on every replicate would dominate the cost,
+so every replicate uses the same set of pairs (all of them for short series,
+`max_pairs` sampled ones otherwise). Since a replicate is the fitted line plus
+resampled residuals, its slope is the fitted slope plus the median over those
+pairs of the residual slopes (e_j - e_i) / (x_j - x_i), and its intercept is
+median(y* - slope* x) as in theilslopes; the residuals are centred on their
+median first. Chunks of replicates are computed as index arrays in NumPy and
+spread over a process pool.
+
+Usage:
+    python saturation_bootstrap.py ..\\homework_regression.xls --sheet VMres1
+    python saturation_bootstrap.py ..\\homework_regression.xls --sheet VMres3 --limits 512M 1G 2G --boot 10000
+    python saturation_bootstrap.py --check
+"""
+
+import os
+import argparse
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from theil_sen import theilslopes
+from workbook_cache import load_sheet
+
+# Replicates per task (and per array block inside a task)
+_CHUNK = 256
+
+BootstrapResult = namedtuple("BootstrapResult", ["summary", "times", "slopes", "intercepts"])
+
+
+def _pair_set(x, max_pairs, rng):
+    """Pairs i < j with x_i != x_j: all of them, or `max_pairs` sampled uniformly."""
+    n = len(x)
+    if n * (n - 1) // 2 <= max_pairs:
+        i, j = np.triu_indices(n, 1)
+    else:
+        i = rng.integers(0, n, max_pairs)
+        j = rng.integers(0, n - 1, max_pairs)
+        j += j >= i
+        i, j = np.minimum(i, j), np.maximum(i, j)
+    keep = x[i] != x[j]
+    return i[keep], j[keep]
+
+
+def _block_indices(n, block, count, rng):
+    """Row indices of `count` moving block bootstrap series of length n."""
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n - block + 1, (count, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)).reshape(count, -1)
+    return idx[:, :n]
+
+
+def _replicates(residuals, x, pairs, block, count, seed):
+    # Runs in the worker: slope and intercept offsets of `count` replicates
+    # y* = fitted + e*, where e* are the residuals resampled in blocks
+    rng = np.random.default_rng(seed)
+    i, j = pairs
+    inv_dx = 1 / (x[j] - x[i])
+    n = len(residuals)
+    d_slope = np.empty(count)
+    d_intercept = np.empty(count)
+    for start in range(0, count, _CHUNK):
+        c = min(_CHUNK, count - start)
+        e = residuals[_block_indices(n, block, c, rng)]
+        # Medians by in-place partition: np.median would copy the arrays
+        d = np.take(e, j, axis=1)
+        d -= np.take(e, i, axis=1)
+        d *= inv_dx
+        d_slope[start:start + c] = _median_rows(d)
+        # median(y* - slope* x) - intercept = median(e* - (slope* - slope) x)
+        e -= d_slope[start:start + c, None] * x
+        d_intercept[start:start + c] = _median_rows(e)
+    return d_slope, d_intercept
+
+
+def _median_rows(a):
+    # Median of every row, partitioning `a` in place
+    m = a.shape[1]
+    if m % 2:
+        a.partition(m // 2, axis=1)
+        return a[:, m // 2].copy()
+    a.partition([m // 2 - 1, m // 2], axis=1)
+    return (a[:, m // 2 - 1] + a[:, m // 2]) / 2
+
+
+def bootstrap_saturation(x, y, limits, n_boot=10000, block=None, max_pairs=20000, alpha=0.95,
+                         percentiles=(2.5, 5, 50, 95, 97.5), workers=None, seed=0):
+    """
+    Moving block bootstrap of the time at which the Theil-Sen trend of y
+    reaches each of `limits`.
+
+    Args:
+        x (array): Time in seconds
+        y (array): Resource usage (NaN rows are dropped)
+        limits (list): Resource limits, same unit as y
+        n_boot (int): Number of bootstrap replicates
+        block (int): Block length in samples (default: n ** (1/3))
+        max_pairs (int): Pairs used for the slope of a replicate; fewer pairs are
+                         faster and widen the percentiles slightly (conservative)
+        alpha (float): Confidence degree of the Theil-Sen fit of the data
+        percentiles (tuple): Percentiles of the saturation time to report
+        workers (int): Number of worker processes (default: one per CPU)
+        seed (int): Seed of the resampling
+
+    Returns:
+        BootstrapResult: summary (DataFrame, one row per limit with the point
+            estimate, the percentiles and the probability that the replicate
+            trend never saturates), times (n_boot x len(limits) saturation
+            times, inf when the replicate slope is not positive), slopes and
+            intercepts of the replicates
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    limits = np.atleast_1d(np.asarray(limits, dtype=float))
+    n = len(x)
+
+    slope, intercept, low, high = theilslopes(y, x, alpha)
+    # Residuals centred on their median, so that the replicates are centred
+    # on the fitted line
+    residuals = y - (intercept + slope * x)
+    residuals -= np.median(residuals)
+    if block is None:
+        block = max(1, round(n ** (1 / 3)))
+    block = min(block, n)
+
+    seeds = np.random.SeedSequence(seed)
+    pairs = _pair_set(x, max_pairs, np.random.default_rng(seeds.spawn(1)[0]))
+    counts = [min(_CHUNK * 4, n_boot - s) for s in range(0, n_boot, _CHUNK * 4)]
+    task_seeds = seeds.spawn(len(counts))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(counts)))
+    if workers == 1:
+        parts = [_replicates(residuals, x, pairs, block, c, s) for c, s in zip(counts, task_seeds)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_replicates, residuals, x, pairs, block, c, s)
+                       for c, s in zip(counts, task_seeds)]
+            parts = [f.result() for f in futures]
+
+    slopes = slope + np.concatenate([p[0] for p in parts])
+    intercepts = intercept + np.concatenate([p[1] for p in parts])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        times = (limits[None, :] - intercepts[:, None]) / slopes[:, None]
+    times[slopes <= 0] = np.inf
+
+    rows = []
+    for k, limit in enumerate(limits):
+        row = {
+            "limit": limit,
+            "time_seconds": (limit - intercept) / slope if slope > 0 else np.inf,
+            # Interval of the analytic approximation, for comparison
+            "time_min_ci": (limit - intercept) / high if high > 0 else 0.0,
+            "time_max_ci": (limit - intercept) / low if low > 0 else np.inf,
+        }
+        for q, v in zip(percentiles, np.percentile(times[:, k], percentiles)):
+            row[f"p{q:g}"] = v
+        row["p_never"] = float(np.mean(slopes <= 0))
+        rows.append(row)
+
+    return BootstrapResult(pd.DataFrame(rows), times, slopes, intercepts)
+
+
+def check_noise_only(n=5000, n_boot=2000, seed=0, tolerance=0.05):
+    """
+    Checks that the bootstrap is centred: on a line plus white noise the
+    median of the replicates must match the point estimate within `tolerance`
+    of the width of the 95% interval.
+
+    Returns:
+        Series: Summary row of the synthetic series (raises ValueError if off)
+    """
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float)
+    y = 5e7 + 2600 * x + rng.normal(0, 2e6, n)
+    row = bootstrap_saturation(x, y, [2 ** 30], n_boot, workers=1, seed=seed).summary.iloc[0]
+    if abs(row["p50"] - row["time_seconds"]) > tolerance * (row["p97.5"] - row["p2.5"]):
+        raise ValueError(f"Bootstrap median {row['p50']:.0f} s off the point estimate {row['time_seconds']:.0f} s")
+    return row
+
+
+def parse_size(text):
+    """Byte size such as 1073741824, 512M or 1G (binary multiples)."""
+    units = {"K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30, "T": 2 ** 40}
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Block bootstrap of the time to saturate the heap")
+    parser.add_argument("workbook", nargs="?", help="Excel workbook (.xls/.xlsx)")
+    parser.add_argument("--sheet", help="Sheet with time and heap columns (e.g. VMres1)")
+    parser.add_argument("--limits", nargs="+", default=["1G"], help="Heap limits, e.g. 512M 1G 2G (default: 1G)")
+    parser.add_argument("--boot", type=int, default=10000, help="Bootstrap replicates (default: 10000)")
+    parser.add_argument("--block", type=int, default=None, help="Block length in samples (default: n^(1/3))")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--check", action="store_true",
+                        help="Only check that the bootstrap median matches the point estimate on a noise-only series")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        row = check_noise_only()
+        print(f"Serie sintetica: stima {row['time_seconds']:,.0f} s, mediana bootstrap {row['p50']:,.0f} s "
+              f"[{row['p2.5']:,.0f}, {row['p97.5']:,.0f}]")
+        return
+    if args.workbook is None or args.sheet is None:
+        parser.error("the workbook and --sheet are required")
+
+    df = load_sheet(args.workbook, args.sheet)
+    # Same column lookup as vmres_theil_sen_all.py
+    x_col = next(c for c in df.columns if "T" in c and "s" in c)
+    y_col = next(c for c in df.columns if "heap" in c.lower())
+    limits = [parse_size(s) for s in args.limits]
+
+    result = bootstrap_saturation(df[x_col], df[y_col], limits, args.boot, args.block, workers=args.workers)
+
+    years = 3600 * 24 * 365.25
+    print(f"\n{args.sheet}: {args.boot} replicate block bootstrap ({len(df)} campioni)")
+    for _, row in result.summary.iterrows():
+        print(f"\nLimite {row['limit'] / 2 ** 20:,.0f} MB:")
+        print(f"  Stima Theil-Sen:        {row['time_seconds'] / years:8.2f} anni")
+        print(f"  Intervallo slope (95%): [{row['time_min_ci'] / years:.2f}, {row['time_max_ci'] / years:.2f}] anni")
+        print(f"  Bootstrap p2.5-p97.5:   [{row['p2.5'] / years:.2f}, {row['p97.5'] / years:.2f}] anni "
+              f"(mediana {row['p50'] / years:.2f})")
+        if row["p_never"] > 0:
+            print(f"  Probabilità di non saturare mai: {row['p_never']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,524 @@
+"""Theil-Sen estimator without enumerating every pair of points.
+
+`scipy.stats.mstats.theilslopes` materializes all the n(n-1)/2 pairwise
+slopes, which does not fit in memory beyond a few tens of thousands of points.
+Here the order statistics of the slopes (median and confidence bounds) are
+found by randomized selection instead:
+
+- the number of slopes below a value t is the number of inversions of
+  y - t*x taken in x order, counted in O(n log n);
+- slopes sampled uniformly between two bounds narrow the bounds around the
+  wanted rank, until only O(n) pairs are left and they are listed explicitly.
+
+Integral data (as in the homework sheets) are compared in exact integer
+arithmetic, so the result is the same as scipy's, ties included.
+
+Usage:
+    from theil_sen import theilslopes, theilslopes_many
+    slope, intercept, low, up = theilslopes(y, x, 0.95)
+    fits = theilslopes_many(df["TIME"], df[metric_columns], 0.95)
+"""
+
+import os
+import math
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+TheilSenResult = namedtuple("TheilSenResult", ["slope", "intercept", "low_slope", "high_slope"])
+
+# Rounds of sampling before giving up (each one shrinks the candidates by ~sqrt(n))
+_MAX_ROUNDS = 64
+
+
+def _dense_rank(*keys):
+    """Dense rank of the rows ordered by `keys` (last key is the primary one, as in np.lexsort)."""
+    order = np.lexsort(keys) if len(keys) > 1 else np.argsort(keys[0])
+    new = np.zeros(len(order), dtype=bool)
+    if len(order):
+        new[0] = True
+        for key in keys:
+            k = key[order]
+            new[1:] |= k[1:] != k[:-1]
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.cumsum(new) - 1
+    return ranks
+
+
+def _inversion_levels(values, detail=True):
+    """
+    Walks the strict inversions {a < b : values[a] > values[b]} of an integer
+    sequence one bit at a time, from the most significant bit.
+
+    At each level the elements are grouped by their higher bits, keeping the
+    original order inside a group (a stable radix partition), and every
+    inversion is found exactly once: at the first bit where the two values
+    differ, as a 1 followed by a 0 in the same group. Yields per level the
+    number of inversions found or, with `detail`:
+        pos:   position in `values` of the element in each slot
+        bits:  current bit of each slot
+        zeros: slots holding a 0 preceded by some 1 of their group
+        count: number of those 1s, i.e. inversions ending in each zero
+        first: index (among the slots holding a 1) of the first 1 of the group
+    The partners of zeros[i] are the slots flatnonzero(bits)[first[i]:first[i] + count[i]].
+    """
+    n = len(values)
+    if n == 0:
+        return
+    r = np.asarray(values, dtype=np.int64) - int(np.min(values))
+    # Work arrays are allocated once: fresh temporaries at every step would
+    # cost more (page faults) than the arithmetic itself
+    dtype = np.int32 if max(n, int(r.max())) < 2 ** 31 - 1 else np.int64
+    r = r.astype(dtype)
+    slot = np.arange(n, dtype=dtype)
+    pos = np.arange(n, dtype=dtype)
+    prefix, b, ones_incl, first, before, end, at_end, new_slot, tmp, r_next = (
+        np.empty(n, dtype=dtype) for _ in range(10))
+    new_group = np.empty(n, dtype=bool)
+    last_of_group = np.empty(n, dtype=bool)
+
+    for bit in range(int(r.max()).bit_length() - 1, -1, -1):
+        # Groups are the runs of equal higher bits
+        np.right_shift(r, bit + 1, out=prefix)
+        new_group[0] = last_of_group[-1] = True
+        np.not_equal(prefix[1:], prefix[:-1], out=new_group[1:])
+        last_of_group[:-1] = new_group[1:]
+
+        np.right_shift(r, bit, out=b)
+        np.bitwise_and(b, 1, out=b)
+        np.cumsum(b, out=ones_incl)
+        # Running counts are non-decreasing, so the value at the start (end)
+        # of each group is spread with a forward max (backward min) scan
+        np.subtract(ones_incl, b, out=before)
+        np.multiply(before, new_group, out=first)
+        np.maximum.accumulate(first, out=first)
+        np.subtract(before, first, out=before)
+        if detail:
+            zeros = np.flatnonzero((b == 0) & (before > 0))
+            yield pos, b, zeros, before[zeros], first[zeros]
+        else:
+            np.multiply(before, b, out=tmp)
+            yield int(before.sum(dtype=np.int64)) - int(tmp.sum(dtype=np.int64))
+
+        for src_values, out in ((slot, end), (ones_incl, at_end)):
+            np.subtract(src_values, n, out=out)
+            np.multiply(out, last_of_group, out=out)
+            np.add(out, n, out=out)
+            np.minimum.accumulate(out[::-1], out=out[::-1])
+
+        # Stable partition of every group: its 0s first (slot - before), then
+        # its 1s, packed at the end of the group (end - ones after them)
+        np.subtract(slot, before, out=new_slot)
+        np.subtract(at_end, ones_incl, out=tmp)
+        np.subtract(end, tmp, out=tmp)
+        np.subtract(tmp, new_slot, out=tmp)
+        np.multiply(tmp, b, out=tmp)
+        np.add(new_slot, tmp, out=new_slot)
+        r_next[new_slot] = r
+        r, r_next = r_next, r
+        if detail:
+            pos_next = np.empty_like(pos)
+            pos_next[new_slot] = pos
+            pos = pos_next
+
+
+def _count_inversions(values):
+    return sum(_inversion_levels(values, detail=False))
+
+
+class _SlopeSelector:
+    """
+    Order statistics of the slopes (y_j - y_i) / (x_j - x_i) over the pairs
+    with x_i < x_j, without building them all.
+
+    A pivot is a slope value t taken from an actual pair (dy, dx): the points
+    are ranked by u = y*dx - dy*x (exact for integral data) or y - t*x. A band
+    (lo, hi) of slopes is the set of pairs whose order under lo and under hi
+    differ, so it can be counted, sampled and listed through its inversions.
+    """
+
+    def __init__(self, x, y, rng):
+        # A time axis is usually sorted with distinct values already: then the
+        # points need no sorting and the ranks at t -> +-inf are known
+        self.distinct_x = bool(np.all(x[1:] > x[:-1]))
+        if self.distinct_x:
+            self.x, self.y = x, y
+        else:
+            order = np.lexsort((y, x))
+            self.x, self.y = x[order], y[order]
+        self.n = len(x)
+        self.rng = rng
+
+        span = float(self.x[-1] - self.x[0]) * float(np.ptp(self.y))
+        self.exact = bool(np.all(self.x == np.round(self.x)) and np.all(self.y == np.round(self.y))
+                          and span < 2.0 ** 60)
+        if self.exact:
+            self.xi = (self.x - self.x[0]).astype(np.int64)
+            self.yi = (self.y - self.y.min()).astype(np.int64)
+        else:
+            self.xc = self.x - np.median(self.x)
+            self.yc = self.y - np.median(self.y)
+
+        # Order at t -> -inf (x ascending) and t -> +inf (x descending)
+        if self.distinct_x:
+            self.rank_low = np.arange(self.n, dtype=np.int64)
+            self.rank_high = self.rank_low[::-1].copy()
+            same_x = same_point = 0
+        else:
+            self.rank_low = _dense_rank(self.y, self.x)
+            self.rank_high = _dense_rank(self.y, -self.x)
+
+            _, x_counts = np.unique(self.x, return_counts=True)
+            same_x = int((x_counts * (x_counts - 1) // 2).sum())
+            point_counts = np.diff(np.flatnonzero(np.append(np.diff(self.rank_low) != 0, True)), prepend=-1)
+            same_point = int((point_counts * (point_counts - 1) // 2).sum())
+        self.n_pairs = self.n * (self.n - 1) // 2 - same_x
+        # Pairs with the same x and different y, always "ascending" in u
+        self.same_x_distinct = same_x - same_point
+
+        self.sample_size = 2 * self.n + 1024
+        self.enum_limit = 4 * self.n + 65536
+
+    def _slopes(self, a, b):
+        return (self.y[b] - self.y[a]) / (self.x[b] - self.x[a])
+
+    def _pivot(self, a, b):
+        value = float((self.y[b] - self.y[a]) / (self.x[b] - self.x[a]))
+        if not self.exact:
+            return value, None, None
+        dx, dy = int(self.xi[b] - self.xi[a]), int(self.yi[b] - self.yi[a])
+        return (value, dy, dx) if dx > 0 else (value, -dy, -dx)
+
+    def _rank(self, pivot):
+        value, dy, dx = pivot
+        if self.exact:
+            return _dense_rank(self.yi * dx - dy * self.xi)
+        return _dense_rank(self.yc - value * self.xc)
+
+    def count(self, pivot):
+        """Returns (#slopes < t, #slopes <= t) for the pivot t."""
+        r = self._rank(pivot)
+        below = _count_inversions(r)
+        ties = np.bincount(r)
+        ascending = self.n * (self.n - 1) // 2 - int((ties * (ties - 1) // 2).sum()) - below
+        above = ascending - self.same_x_distinct
+        return below, self.n_pairs - above
+
+    def band_pairs(self, lo, lo_open, hi, n_samples=None, total=None):
+        """
+        Pairs with slope in [lo, hi) (or (lo, hi) when `lo_open`); None bounds
+        are infinite. With `n_samples`, returns that many pairs drawn uniformly
+        (with replacement) from the band of `total` pairs instead of all of them.
+        """
+        r_lo = self.rank_low if lo is None else self._rank(lo)
+        r_hi = self.rank_high if hi is None else self._rank(hi)
+        # Pairs tied at lo (slope == lo) count as inversions only for a closed bound
+        arrangement = np.lexsort((r_hi if lo_open else -r_hi, r_lo))
+        values = r_hi[arrangement]
+
+        samples = None
+        if n_samples is not None:
+            samples = np.sort(self.rng.integers(0, total, n_samples))
+
+        out_a, out_b = [], []
+        offset = 0
+        for pos, bits, zeros, count, first in _inversion_levels(values):
+            level_total = int(count.sum())
+            if level_total == 0:
+                continue
+            if samples is None:
+                which = np.repeat(np.arange(len(zeros)), count)
+                k = np.arange(level_total) - np.repeat(np.cumsum(count) - count, count)
+            else:
+                lo_i, hi_i = np.searchsorted(samples, [offset, offset + level_total])
+                local = samples[lo_i:hi_i] - offset
+                cum = np.cumsum(count)
+                which = np.searchsorted(cum, local, side="right")
+                k = local - (cum[which] - count[which])
+            ones = np.flatnonzero(bits)
+            out_a.append(arrangement[pos[ones[first[which] + k]]])
+            out_b.append(arrangement[pos[zeros[which]]])
+            offset += level_total
+
+        if not out_a:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(out_a), np.concatenate(out_b)
+
+    def select(self, ranks, first_sample=None):
+        """Slopes of the given (sorted, close together) 0-based ranks."""
+        ranks = list(ranks)
+        lo = hi = None
+        lo_open = False
+        c_lo, c_hi = 0, self.n_pairs
+        sample = first_sample
+
+        for _ in range(_MAX_ROUNDS):
+            total = c_hi - c_lo
+            if total <= self.enum_limit:
+                slopes = np.sort(self._slopes(*self.band_pairs(lo, lo_open, hi)))
+                idx = np.clip(np.asarray(ranks) - c_lo, 0, len(slopes) - 1)
+                return slopes[idx]
+
+            if sample is None:
+                sample = self.band_pairs(lo, lo_open, hi, self.sample_size, total)
+            a, b = sample
+            sample = None
+            order = np.argsort(self._slopes(a, b), kind="stable")
+            m = len(order)
+            if m == 0:
+                continue
+
+            # Sample positions bracketing the wanted ranks with a 3 sigma
+            # margin (binomial sd of the sample position of a rank)
+            p = min(max((ranks[0] - c_lo) / total, 1 / m), 1 - 1 / m)
+            margin = 3 * math.sqrt(m * p * (1 - p)) + 1
+            i_lo = math.floor((ranks[0] - c_lo) / total * m - margin)
+            i_hi = math.ceil((ranks[-1] + 1 - c_lo) / total * m + margin)
+            piv_lo = self._pivot(a[order[i_lo]], b[order[i_lo]]) if i_lo >= 0 else None
+            piv_hi = self._pivot(a[order[i_hi]], b[order[i_hi]]) if i_hi < m else None
+
+            bounds = (c_lo, c_hi)
+            for pivot in (piv_lo, piv_hi):
+                if pivot is None:
+                    continue
+                below, below_eq = self.count(pivot)
+                if below <= ranks[0] and ranks[-1] < below_eq:
+                    return np.full(len(ranks), pivot[0])
+                if pivot is piv_lo:
+                    if below_eq <= ranks[0] and below_eq > c_lo:
+                        lo, lo_open, c_lo = pivot, True, below_eq
+                    elif below <= ranks[0] and below > c_lo:
+                        lo, lo_open, c_lo = pivot, False, below
+                elif ranks[-1] < below < c_hi:
+                    hi, c_hi = pivot, below
+
+            if (c_lo, c_hi) == bounds and not self.exact:
+                # Without exact arithmetic, slopes equal up to rounding fall on
+                # either side of a pivot and the band stops shrinking: what is
+                # left differs only by rounding, so the sample is conclusive
+                idx = np.clip(np.round((np.asarray(ranks) - c_lo + 0.5) / total * m).astype(int), 0, m - 1)
+                return self._slopes(a, b)[order[idx]]
+
+        raise RuntimeError("Theil-Sen slope selection did not converge")
+
+
+class _SharedPairs:
+    """
+    Pairs of n points with distinct x, in x order: every i < j is a pair
+    whatever y is, so the full list and the uniform first sample of the
+    selection are computed once and reused by all the metrics on that x.
+    """
+
+    def __init__(self, n, rng):
+        self.n = n
+        self.rng = rng
+        self._all = None
+        self._samples = {}
+
+    def all(self):
+        if self._all is None:
+            self._all = np.triu_indices(self.n, 1)
+        return self._all
+
+    def sample(self, m):
+        """m pairs drawn uniformly, with replacement."""
+        if m not in self._samples:
+            a = self.rng.integers(0, self.n, m)
+            b = self.rng.integers(0, self.n - 1, m)
+            b += b >= a
+            self._samples[m] = (np.minimum(a, b), np.maximum(a, b))
+        return self._samples[m]
+
+
+def _tie_term(values):
+    _, counts = np.unique(values, return_counts=True)
+    return sum(int(k) * (int(k) - 1) * (2 * int(k) + 5) for k in counts[counts > 1])
+
+
+def theilslopes(y, x=None, alpha=0.95, method="separate", seed=0):
+    """
+    Theil-Sen estimator with the confidence interval of the slope, same
+    results and signature as `scipy.stats.mstats.theilslopes`, in O(n log n)
+    expected time and O(n) memory.
+
+    Args:
+        y (array): Dependent variable
+        x (array): Independent variable (default: 0, 1, 2, ...)
+        alpha (float): Confidence degree (0.95 and 0.05 both mean 95%)
+        method (str): Intercept as median(y) - slope*median(x) ("separate")
+                      or median(y - slope*x) ("joint")
+        seed (int): Seed of the sampling (the result does not depend on it)
+
+    Returns:
+        TheilSenResult: (slope, intercept, low_slope, high_slope)
+    """
+    if method not in ("joint", "separate"):
+        raise ValueError(f"method must be either 'joint' or 'separate'.'{method}' is invalid.")
+
+    # Masked values and NaN are ignored, together with the other coordinate
+    y = np.ma.filled(np.ma.asarray(y, dtype=float), np.nan).ravel()
+    if x is None:
+        x = np.arange(len(y), dtype=float)
+    else:
+        x = np.ma.filled(np.ma.asarray(x, dtype=float), np.nan).ravel()
+        if len(x) != len(y):
+            raise ValueError(f"Incompatible lengths ! ({len(y)}<>{len(x)})")
+    keep = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[keep], y[keep]
+    if len(x) < 2:
+        raise ValueError("`x` and `y` must have length at least 2.")
+
+    return _fit(x, y, alpha, method, np.random.default_rng(seed))
+
+
+def _fit(x, y, alpha, method, rng, shared=None):
+    """Theil-Sen fit of clean (no NaN) data; `shared` are the _SharedPairs of x, if any."""
+    selector = _SlopeSelector(x, y, rng)
+    if shared is not None and not selector.distinct_x:
+        shared = None
+    nt = selector.n_pairs
+    ny = len(y)
+    if nt == 0:
+        warnings.warn("All `x` coordinates are identical.", RuntimeWarning, stacklevel=3)
+        return TheilSenResult(np.nan, np.nan, np.nan, np.nan)
+
+    if alpha > 0.5:
+        alpha = 1. - alpha
+    z = norm.ppf(alpha / 2.)
+    # Equation 2.6 in Sen (1968), as in scipy
+    sigsq = 1 / 18. * (ny * (ny - 1) * (2 * ny + 5) - _tie_term(x) - _tie_term(y))
+
+    median_ranks = [nt // 2] if nt % 2 else [nt // 2 - 1, nt // 2]
+    groups = [median_ranks]
+    try:
+        sigma = np.sqrt(sigsq)
+        ru = min(int(np.round((nt - z * sigma) / 2.)), nt - 1)
+        rl = max(int(np.round((nt + z * sigma) / 2.)) - 1, 0)
+        groups += [[rl], [ru]]
+    except (ValueError, OverflowError):
+        rl = ru = None
+
+    if nt <= selector.enum_limit:
+        pairs = shared.all() if shared is not None else selector.band_pairs(None, False, None)
+        slopes = np.sort(selector._slopes(*pairs))
+        values = [slopes[g] for g in groups]
+    else:
+        if shared is not None:
+            first = shared.sample(selector.sample_size)
+        else:
+            first = selector.band_pairs(None, False, None, selector.sample_size, nt)
+        values = [selector.select(g, first) for g in groups]
+
+    medslope = float(np.mean(values[0]))
+    low, high = (float(values[1][0]), float(values[2][0])) if rl is not None else (np.nan, np.nan)
+
+    if method == "joint":
+        medinter = float(np.median(y - medslope * x))
+    else:
+        medinter = float(np.median(y) - medslope * np.median(x))
+
+    return TheilSenResult(medslope, medinter, low, high)
+
+
+def trend_class(slope, low, high):
+    """
+    Trend of a fit as reported in the homework tables: not significant when
+    the confidence interval contains 0, otherwise increasing or decreasing.
+
+    Returns:
+        tuple: (label, symbol), e.g. ("Crescente", "↗")
+    """
+    if low <= 0 <= high:
+        return "Non significativo", "⚠️"
+    elif slope > 0:
+        return "Crescente", "↗"
+    else:
+        return "Decrescente", "↘"
+
+
+def _fit_block(x, Y, alpha, method, seed):
+    # Runs in the worker: x is sorted, the columns of Y share it
+    rng = np.random.default_rng(seed)
+    shared = _SharedPairs(len(x), rng) if np.all(x[1:] > x[:-1]) else None
+    rows = []
+    for y in Y.T:
+        keep = ~np.isnan(y)
+        if keep.sum() < 2:
+            rows.append((np.nan, np.nan, np.nan, np.nan, int(keep.sum())))
+            continue
+        if keep.all():
+            fit = _fit(x, y, alpha, method, rng, shared)
+        else:
+            # Dropping rows keeps x sorted, but the pairs are no longer the shared ones
+            fit = _fit(x[keep], y[keep], alpha, method, rng)
+        rows.append((*fit, int(keep.sum())))
+    return rows
+
+
+def theilslopes_many(x, Y, alpha=0.95, method="separate", workers=None, seed=0):
+    """
+    Theil-Sen fits of many metrics against the same x (e.g. every column of a
+    sheet against TIME) in one call.
+
+    x is sorted once for all the columns and, where x has distinct values,
+    the pairs enumerated or sampled by the estimator are shared by the
+    columns without missing values. Blocks of columns are fitted in parallel
+    on a process pool. Each column gives the same result as `theilslopes` on
+    its non-NaN rows.
+
+    Args:
+        x (array): Independent variable, one value per row
+        Y (DataFrame or 2D array): One metric per column
+        alpha (float): Confidence degree (0.95 and 0.05 both mean 95%)
+        method (str): Intercept method, as in `theilslopes`
+        workers (int): Number of worker processes (default: one per CPU, capped
+                       at the number of columns). 1 runs everything in-process.
+        seed (int): Seed of the sampling (the result does not depend on it)
+
+    Returns:
+        DataFrame: One row per column of Y (index: column names) with slope,
+                   intercept, low_slope, high_slope, n (points used), trend and
+                   trend_symbol (see `trend_class`). Columns with fewer than 2
+                   points have NaN estimates and no trend.
+    """
+    if method not in ("joint", "separate"):
+        raise ValueError(f"method must be either 'joint' or 'separate'.'{method}' is invalid.")
+
+    names = list(Y.columns) if isinstance(Y, pd.DataFrame) else None
+    Y = np.ma.filled(np.ma.asarray(Y, dtype=float), np.nan)
+    if Y.ndim == 1:
+        Y = Y[:, None]
+    if names is None:
+        names = list(range(Y.shape[1]))
+    x = np.ma.filled(np.ma.asarray(x, dtype=float), np.nan).ravel()
+    if len(x) != len(Y):
+        raise ValueError(f"Incompatible lengths ! ({len(Y)}<>{len(x)})")
+
+    valid = ~np.isnan(x)
+    order = np.flatnonzero(valid)[np.argsort(x[valid], kind="stable")]
+    x, Y = x[order], Y[order]
+
+    n_cols = Y.shape[1]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, n_cols))
+    blocks = [b for b in np.array_split(np.arange(n_cols), workers) if len(b)]
+
+    if workers == 1:
+        rows = [row for b in blocks for row in _fit_block(x, Y[:, b], alpha, method, seed)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_fit_block, x, np.ascontiguousarray(Y[:, b]), alpha, method, seed)
+                       for b in blocks]
+            rows = [row for future in futures for row in future.result()]
+
+    result = pd.DataFrame(rows, index=names, columns=["slope", "intercept", "low_slope", "high_slope", "n"])
+    trends = [trend_class(slope, low, high) if not np.isnan(slope) else (None, None)
+              for slope, low, high in zip(result["slope"], result["low_slope"], result["high_slope"])]
+    result["trend"] = [t for t, _ in trends]
+    result["trend_symbol"] = [s for _, s in trends]
+    return result
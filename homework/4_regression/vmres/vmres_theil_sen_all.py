@@ -1,8 +1,14 @@
 import numpy as np
 import pandas as pd
-from scipy.stats.mstats import theilslopes
 from tabulate import tabulate
 import matplotlib.pyplot as plt
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from workbook_cache import load_sheets
+from theil_sen import theilslopes
+from mann_kendall import mann_kendall
+from saturation_bootstrap import bootstrap_saturation
 
 def main():
     file_name = "..\\homework_regression.xls"
@@ -14,9 +20,7 @@ def main():
     # Limite 1 GB in byte
     LIMIT_1GB = 1 * 1024 * 1024 * 1024  # 1,073,741,824 byte
 
-    df1 = pd.read_excel(file_name, sheet_name = sheet_name_1)
-    df2 = pd.read_excel(file_name, sheet_name = sheet_name_2)
-    df3 = pd.read_excel(file_name, sheet_name = sheet_name_3)
+    df1, df2, df3 = load_sheets(file_name, [sheet_name_1, sheet_name_2, sheet_name_3]).values()
 
     dfs = [df1, df2, df3]
     sheet_names = [sheet_name_1, sheet_name_2, sheet_name_3]
@@ -89,6 +93,12 @@ def main():
         
         print(f"  Trend: {trend_symbol} {trend}")
         
+        # Test di Mann-Kendall sulla stessa serie
+        mk = mann_kendall(y, x, 0.05)
+        print(f"\nTest Mann-Kendall:")
+        print(f"  Tau-b: {mk.taub:.6f}")
+        print(f"  p-value: {mk.p_value:.6f} ({'significativo' if mk.h else 'non significativo'})")
+        
         # Calcolo tempo saturazione solo se slope > 0
         if slope <= 0:
             print(f"\n⚠️  ATTENZIONE: Slope negativo o nullo!")
@@ -103,7 +113,9 @@ def main():
                 "Trend": f"{trend_symbol} {trend}",
                 "Time_seconds": "N/A",
                 "Time_years": "N/A",
-                "Uncertainty_years": "N/A"
+                "Uncertainty_years": "N/A",
+                "Time_p2.5_years": "N/A",
+                "Time_p97.5_years": "N/A"
             })
             continue
         
@@ -111,13 +123,12 @@ def main():
         # Formula: T = (Limit - intercept) / slope
         time_saturate = (LIMIT_1GB - intercept) / slope
         
-        # Calcolo incertezza usando intervallo confidenza slope
-        # Tempo massimo (con slope minimo)
-        time_max = (LIMIT_1GB - intercept) / low if low > 0 else float('inf')
-        # Tempo minimo (con slope massimo)
-        time_min = (LIMIT_1GB - intercept) / up if up > 0 else 0
+        # Incertezza: intervallo al 95% del block bootstrap dei residui
+        # (asimmetrico, tiene conto dell'autocorrelazione della serie)
+        boot = bootstrap_saturation(x, y, [LIMIT_1GB]).summary.iloc[0]
+        time_min, time_max = boot['p2.5'], boot['p97.5']
         
-        # Incertezza
+        # Incertezza: semiampiezza dell'intervallo bootstrap
         uncertainty = abs(time_max - time_min) / 2
         
         # Conversioni temporali
@@ -127,6 +138,8 @@ def main():
         sec_to_years = time_saturate / (3600 * 24 * 365.25)
         
         unc_years = uncertainty / (3600 * 24 * 365.25)
+        min_years = time_min / (3600 * 24 * 365.25)
+        max_years = time_max / (3600 * 24 * 365.25)
         
         print(f"\n⏱️  TEMPO STIMATO PER SATURARE 1 GB:")
         print(f"  {time_saturate:,.0f} ± {uncertainty:,.0f} secondi")
@@ -134,6 +147,7 @@ def main():
         print(f"  {sec_to_hours:,.1f} ore")
         print(f"  {sec_to_days:,.1f} giorni")
         print(f"  {sec_to_years:.1f} ± {unc_years:.1f} anni")
+        print(f"  Bootstrap 95%: [{min_years:.1f}, {max_years:.1f}] anni")
         
         # Salva risultati
         results.append({
@@ -145,7 +159,9 @@ def main():
             "Trend": f"{trend_symbol} {trend}",
             "Time_seconds": f"{time_saturate:.0f}",
             "Time_years": f"{sec_to_years:.2f}",
-            "Uncertainty_years": f"{unc_years:.2f}"
+            "Uncertainty_years": f"{unc_years:.2f}",
+            "Time_p2.5_years": f"{min_years:.2f}",
+            "Time_p97.5_years": f"{max_years:.2f}"
         })
         
         # Plot
@@ -0,0 +1,102 @@
+"""Binary cache of the sheets of the regression workbook.
+
+Parsing HomeWork_Regression.xls dominates the runtime of the Theil-Sen
+scripts. Every sheet is converted once into a columnar binary table (see
+3.1_capacity_test/capacity_test/result_cache.py) keyed on the hash of the
+workbook content, so later runs memory-map the columns instead of parsing the
+xls, and a modified workbook is reparsed automatically.
+
+Usage (one-time conversion, optional: the loaders convert on first use):
+    python workbook_cache.py HomeWork_Regression.xls
+
+In a script:
+    from workbook_cache import load_sheet, load_sheets
+    df = load_sheet(file_name, "VMres1")
+"""
+
+import os
+import sys
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "3.1_capacity_test", "capacity_test"))
+from result_cache import cached_frame
+
+# Namespace of the entry listing the sheets of a workbook
+_SHEETS_NAMESPACE = "xls-sheets"
+
+
+def _sheet_namespace(sheet_name):
+    return f"xls-sheet-{sheet_name}"
+
+
+class _Workbook:
+    """Parses the whole workbook at most once, on the first cache miss."""
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.sheets = None
+
+    def parse(self):
+        if self.sheets is None:
+            self.sheets = pd.read_excel(self.file_name, sheet_name=None)
+            for df in self.sheets.values():
+                # Column names are stored as text in the cache metadata
+                df.columns = [str(c) for c in df.columns]
+        return self.sheets
+
+    def sheet(self, sheet_name):
+        sheets = self.parse()
+        if sheet_name not in sheets:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found in {self.file_name}")
+        return sheets[sheet_name]
+
+
+def sheet_names(file_name, _workbook=None):
+    """Names of the sheets of the workbook, in workbook order."""
+    workbook = _workbook or _Workbook(file_name)
+    names = cached_frame(file_name, _SHEETS_NAMESPACE,
+                         lambda p: pd.DataFrame({"sheet": list(workbook.parse())}),
+                         content_hash=True)
+    return [str(s) for s in names["sheet"]]
+
+
+def load_sheets(file_name, sheets=None):
+    """
+    Loads sheets of an Excel workbook through the binary cache.
+
+    Args:
+        file_name (str): Path to the .xls/.xlsx workbook
+        sheets (list): Sheet names to load (default: all the sheets)
+
+    Returns:
+        dict: sheet name -> DataFrame, in the requested order
+    """
+    workbook = _Workbook(file_name)
+    if sheets is None:
+        sheets = sheet_names(file_name, workbook)
+
+    return {
+        sheet: cached_frame(file_name, _sheet_namespace(sheet), lambda p, s=sheet: workbook.sheet(s),
+                            content_hash=True)
+        for sheet in sheets
+    }
+
+
+def load_sheet(file_name, sheet_name):
+    """Drop-in replacement of `pd.read_excel(file_name, sheet_name=sheet_name)`."""
+    return load_sheets(file_name, [sheet_name])[sheet_name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert every sheet of a workbook into the binary cache")
+    parser.add_argument("workbook", help="Excel workbook (.xls/.xlsx)")
+    args = parser.parse_args(argv)
+
+    frames = load_sheets(args.workbook)
+    for sheet, df in frames.items():
+        print(f"✅ {sheet}: {df.shape[0]} rows x {df.shape[1]} columns")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import os
 import pandas as pd
+import sys
 import numpy as np
 
+# JMP export reader shared with the PCA/clustering homework
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "2_pca_clustering"))
+from jmp_csv import read_jmp_csv
+
 
 PCA_COLS = ["Principale1", "Principale2", "Principale3", "Principale4"]
 UNUSED_COLS = ["AnonPages", "VmPTE", "Slab", "Colonna 25", "Cluster"]
@@ -12,23 +17,13 @@ def deviance_lost_after_pca(csv_path):
     Returns:
         deviance_lost, deviance_retained
     """
-    df = pd.read_csv(csv_path, sep=r"[;,]", engine="python")
+    # Delimiter (comma or semicolon) and decimal comma are detected once,
+    # numeric columns are converted in bulk
+    df = read_jmp_csv(csv_path)
 
     # Clean column names
     df.columns = df.columns.str.strip().str.replace("'", "")
 
-    # Some CSVs (e.g. exported from JMP) use comma as decimal separator;
-    # quoted numeric fields like "2,3401579252" will be parsed as strings.
-    # Coerce known PCA columns to numeric by replacing decimal comma with dot.
-    for col in PCA_COLS:
-        if col in df.columns:
-            # remove surrounding quotes and stray apostrophes, strip spaces
-            s = df[col].astype(str).str.strip().str.replace('"', '').str.replace("'", "")
-            # replace decimal comma with dot — safe for JMP-style exports where
-            # the decimal separator is a comma inside quoted fields
-            s = s.str.replace(',', '.')
-            df[col] = pd.to_numeric(s, errors='coerce')
-
     # Select numeric columns
     numeric_cols = df.select_dtypes(include=["number"]).columns
 
@@ -79,7 +74,7 @@ def intracluster_deviance(csv_path: str):
     """
 
     # Load dataset
-    df = pd.read_csv(csv_path, sep=r"[;,]", engine="python")  # handles commas or semicolons
+    df = read_jmp_csv(csv_path)  # handles commas or semicolons
 
     # Ensure "Cluster" column exists
     if "Cluster" not in df.columns:
@@ -122,7 +117,7 @@ if __name__ == "__main__":
             print(f"Cluster {cluster}: {dev:.4f}")
 
     # Compute total PCA deviance (SST) to normalize intra-cluster total so units match.
-    df_main = pd.read_csv(csv_file, sep=r"[;,]", engine="python")
+    df_main = read_jmp_csv(csv_file)
     pca_feature_cols = [c for c in PCA_COLS if c in df_main.columns]
     total_pca_deviance = 0
     if pca_feature_cols:
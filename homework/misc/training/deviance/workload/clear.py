@@ -1,15 +1,14 @@
-import re
-csv_file = "Q:\\Marcello\\University\\impianti\\impianti-di-elaborazione\\homework\\workload\\vmstat.csv"  
-csv_out = "Q:\\Marcello\\University\\impianti\\impianti-di-elaborazione\\homework\\workload\\vmstat_clear.csv"  
+import os
+import sys
 
-with open(csv_file, "r") as f:
-    lines = f.readlines()
+# vmstat parser shared with the capacity test scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "..", "3.1_capacity_test", "capacity_test"))
+from vmstat_parser import read_vmstat
 
-clean_lines = []
-for line in lines:
-    # Replace multiple spaces within each line with a comma
-    clean_line = re.sub(r' +', ',', line.strip())  # ' +' matches one or more spaces
-    clean_lines.append(clean_line)
-    
-with open(csv_out, "w") as f:
-    f.write("\n".join(clean_lines))
+csv_file = "Q:\\Marcello\\University\\impianti\\impianti-di-elaborazione\\homework\\workload\\vmstat.csv"
+csv_out = "Q:\\Marcello\\University\\impianti\\impianti-di-elaborazione\\homework\\workload\\vmstat_clear.csv"
+
+# Parse the raw vmstat output directly (headers, repeated headers and
+# timestamps are handled by the parser) and write it comma-separated
+df = read_vmstat(csv_file)
+df.to_csv(csv_out, index=False)